@@ -0,0 +1,202 @@
+"""
+Static complexity and anti-pattern analyzer.
+
+Walks the AST of a script and reports quadratic patterns and blocking calls with line numbers and
+an estimated complexity. The findings are sent to the LLM to point it at the real hot spots.
+"""
+import ast
+from functools import lru_cache
+from typing import Any, Dict, List, Set
+
+
+def loaded_names(node: ast.AST) -> Set[str]:
+    """Names read in an expression."""
+    return {child.id for child in ast.walk(node) if isinstance(child, ast.Name) and isinstance(child.ctx, ast.Load)}
+
+
+def target_names(node: ast.AST) -> Set[str]:
+    """Names bound by a loop target."""
+    return {child.id for child in ast.walk(node) if isinstance(child, ast.Name)}
+
+
+def call_name(node: ast.Call) -> str:
+    """Dotted name of the called function, e.g. 'time.sleep' or 'sorted', '' for other callees."""
+    parts = []
+    func = node.func
+    while isinstance(func, ast.Attribute):
+        parts.append(func.attr)
+        func = func.value
+    if not isinstance(func, ast.Name):
+        return ''
+    parts.append(func.id)
+    return '.'.join(reversed(parts))
+
+
+def complexity(depth: int, factor: str = '') -> str:
+    """Big-O estimate of code executed in depth nested loops, times factor."""
+    loops = 'n' if depth == 1 else f'n^{depth}' if depth else '1'
+    if not factor:
+        return f"O({loops})"
+    return f"O({factor})" if not depth else f"O({loops} * {factor})"
+
+
+class PatternFinder(ast.NodeVisitor):
+    """Collect the findings of one script, see analyze()."""
+    def __init__(self) -> None:
+        self.findings: List[Dict[str, Any]] = []
+        # Every active loop: the names its iterable (or while test) depends on and the names it binds.
+        self.loops: List[Dict[str, Set[str]]] = []
+        # Names bound to lists in the current scope.
+        self.lists: List[Set[str]] = [set()]
+        self.sleep_names = {'time.sleep'}
+        self.datetime_calls: Dict[str, List[int]] = {}
+
+    def report(self, node: ast.AST, kind: str, message: str, estimate: str) -> None:
+        self.findings.append({"line": node.lineno, "kind": kind, "message": message, "complexity": estimate})
+
+    def visit_ImportFrom(self, node: ast.ImportFrom) -> None:
+        if node.module == 'time':
+            self.sleep_names.update(alias.asname or alias.name for alias in node.names if alias.name == 'sleep')
+
+    def visit_Import(self, node: ast.Import) -> None:
+        for alias in node.names:
+            if alias.name == 'time' and alias.asname:
+                self.sleep_names.add(f"{alias.asname}.sleep")
+
+    def _visit_scope(self, node: ast.AST) -> None:
+        loops, self.loops = self.loops, []
+        self.lists.append(set())
+        self.generic_visit(node)
+        self.lists.pop()
+        self.loops = loops
+
+    visit_FunctionDef = visit_AsyncFunctionDef = visit_Lambda = _visit_scope
+
+    def _collection(self, iterable: ast.AST) -> Set[str]:
+        """Names the size of a loop depends on, without the variables of the enclosing loops."""
+        bound = set().union(*(loop["targets"] for loop in self.loops)) if self.loops else set()
+        return loaded_names(iterable) - bound - {'range', 'len', 'enumerate', 'zip', 'reversed'}
+
+    def _enter_loop(self, node: ast.AST, iterable: ast.AST, target: ast.AST) -> None:
+        collection = self._collection(iterable)
+        for outer in self.loops:
+            shared = collection & outer["collection"]
+            if shared:
+                self.report(node, 'nested_loops',
+                            f"nested loop over the same collection as the loop on line {outer['line']} "
+                            f"({', '.join(sorted(shared))})", complexity(len(self.loops) + 1))
+                break
+        self.loops.append({"collection": collection, "targets": target_names(target) if target else set(),
+                           "line": node.lineno})
+
+    def visit_For(self, node: ast.For) -> None:
+        self.visit(node.iter)
+        self._enter_loop(node, node.iter, node.target)
+        for child in node.body + node.orelse:
+            self.visit(child)
+        self.loops.pop()
+
+    visit_AsyncFor = visit_For
+
+    def visit_While(self, node: ast.While) -> None:
+        self._enter_loop(node, node.test, None)
+        self.generic_visit(node)
+        self.loops.pop()
+
+    def _visit_comprehension(self, node: ast.AST) -> None:
+        entered = 0
+        for generator in node.generators:
+            self.visit(generator.iter)
+            self._enter_loop(generator.iter, generator.iter, generator.target)
+            entered += 1
+            for condition in generator.ifs:
+                self.visit(condition)
+        for field in ('elt', 'key', 'value'):
+            if hasattr(node, field):
+                self.visit(getattr(node, field))
+        del self.loops[len(self.loops) - entered:]
+
+    visit_ListComp = visit_SetComp = visit_DictComp = visit_GeneratorExp = _visit_comprehension
+
+    def visit_Assign(self, node: ast.Assign) -> None:
+        is_list = isinstance(node.value, (ast.List, ast.ListComp)) or \
+            (isinstance(node.value, ast.Call) and call_name(node.value) in ('list', 'sorted'))
+        for target in node.targets:
+            if isinstance(target, ast.Name):
+                if is_list:
+                    self.lists[-1].add(target.id)
+                else:
+                    self.lists[-1].discard(target.id)
+        self.generic_visit(node)
+
+    def visit_Compare(self, node: ast.Compare) -> None:
+        if self.loops:
+            for op, comparator in zip(node.ops, node.comparators):
+                if isinstance(op, (ast.In, ast.NotIn)) and isinstance(comparator, ast.Name) \
+                        and comparator.id in self.lists[-1]:
+                    self.report(node, 'list_membership',
+                                f"'in' test on the list {comparator.id} inside a loop, a set/dict lookup is O(1)",
+                                complexity(len(self.loops), 'len(list)'))
+        self.generic_visit(node)
+
+    def visit_Call(self, node: ast.Call) -> None:
+        name = call_name(node)
+        if self.loops and (name == 'sorted' or name.endswith('.sort')):
+            self.report(node, 'sort_in_loop', f"{name}() inside a loop re-sorts on every iteration",
+                        complexity(len(self.loops), 'm log m'))
+        elif name in self.sleep_names:
+            where = ' inside a loop, the delay is paid on every iteration' if self.loops else ''
+            self.report(node, 'blocking_sleep', f"blocking {name}(){where}", f"{complexity(len(self.loops))} sleeps")
+        elif name.endswith('.to_datetime') and node.args:
+            self.datetime_calls.setdefault(ast.dump(node.args[0]), []).append(node.lineno)
+        self.generic_visit(node)
+
+    def finish(self, tree: ast.Module) -> None:
+        """Report the conversions that were done more than once."""
+        for dumped, lines in self.datetime_calls.items():
+            if len(lines) > 1:
+                source = next((ast.unparse(node.args[0]) for node in ast.walk(tree) if isinstance(node, ast.Call)
+                               and node.args and ast.dump(node.args[0]) == dumped), '?')
+                self.findings.append({
+                    "line": lines[0], "kind": 'repeated_to_datetime',
+                    "message": f"to_datetime({source}) is computed {len(lines)} times (lines "
+                               f"{', '.join(map(str, lines))}), convert once and reuse the result",
+                    "complexity": f"O({len(lines)} * n)"
+                })
+
+
+@lru_cache(maxsize=64)
+def analyze(code: str) -> List[Dict[str, Any]]:
+    """
+    Find quadratic patterns and blocking calls in a script.
+
+    Args:
+        code (str): The script.
+
+    Returns:
+        List[Dict[str, Any]]: Findings sorted by line, each with "line", "kind", "message" and "complexity".
+            Empty if the script can't be parsed.
+    """
+    try:
+        tree = ast.parse(code)
+    except (SyntaxError, ValueError):
+        return []
+    finder = PatternFinder()
+    finder.visit(tree)
+    finder.finish(tree)
+    return sorted(finder.findings, key=lambda finding: finding["line"])
+
+
+def format_findings(findings: List[Dict[str, Any]]) -> str:
+    """
+    Render the findings for the prompt.
+
+    Args:
+        findings (List[Dict[str, Any]]): Output of analyze().
+
+    Returns:
+        str: One finding per line, 'None' if there are none.
+    """
+    if not findings:
+        return 'None'
+    return '\n'.join(f"line {finding['line']}: {finding['message']} - {finding['complexity']}" for finding in findings)
@@ -0,0 +1,447 @@
+"""
+Deterministic rule-based optimizer.
+
+Applies a catalog of mechanical rewrites the LLM rediscovers on every run. Every rule is an
+ast.NodeTransformer; apply_rules() applies them one by one and keeps a rule only if the rewritten
+script passes the check (the output checker of the optimizer).
+"""
+import ast
+from typing import Callable, Dict, List, Optional, Set, Tuple
+
+# re functions whose first argument is the pattern: number of positional arguments before flags and whether
+# flags may be passed positionally (split, sub and subn take maxsplit/count there).
+REGEX_FUNCTIONS = {"search": (2, True), "match": (2, True), "fullmatch": (2, True), "findall": (2, True),
+                   "finditer": (2, True), "split": (2, False), "sub": (3, False), "subn": (3, False),
+                   "compile": (1, True)}
+LOOP_NODES = (ast.For, ast.AsyncFor, ast.While)
+SCOPE_NODES = (ast.FunctionDef, ast.AsyncFunctionDef, ast.Lambda, ast.ClassDef)
+
+
+def bound_names(tree: ast.AST) -> Set[str]:
+    """
+    Collect every name the code binds or reads, used to avoid collisions with generated names.
+
+    Args:
+        tree (ast.AST): The parsed script.
+
+    Returns:
+        Set[str]: The names.
+    """
+    names = set()
+    for node in ast.walk(tree):
+        if isinstance(node, ast.Name):
+            names.add(node.id)
+        elif isinstance(node, (ast.FunctionDef, ast.AsyncFunctionDef, ast.ClassDef)):
+            names.add(node.name)
+        elif isinstance(node, ast.arg):
+            names.add(node.arg)
+        elif isinstance(node, ast.alias):
+            names.add((node.asname or node.name).split('.')[0])
+    return names
+
+
+def imported_modules(tree: ast.Module) -> Dict[str, int]:
+    """
+    Find the modules imported with a top-level `import module` whose name is never rebound.
+
+    Args:
+        tree (ast.Module): The parsed script.
+
+    Returns:
+        Dict[str, int]: Local module name -> index of the import statement in the module body.
+    """
+    modules = {}
+    for index, node in enumerate(tree.body):
+        if isinstance(node, ast.Import):
+            for alias in node.names:
+                if '.' not in alias.name or alias.asname:
+                    modules.setdefault(alias.asname or alias.name, index)
+    rebound = set()
+    for node in ast.walk(tree):
+        if isinstance(node, ast.Name) and not isinstance(node.ctx, ast.Load):
+            rebound.add(node.id)
+        elif isinstance(node, (ast.FunctionDef, ast.AsyncFunctionDef, ast.ClassDef)):
+            rebound.add(node.name)
+        elif isinstance(node, ast.arg):
+            rebound.add(node.arg)
+        elif isinstance(node, (ast.Global, ast.Nonlocal)):
+            rebound.update(node.names)
+        elif isinstance(node, ast.ImportFrom):
+            rebound.update(alias.asname or alias.name for alias in node.names)
+    for node in tree.body:
+        if isinstance(node, ast.Import):
+            continue
+        for child in ast.walk(node):
+            if isinstance(child, ast.Import):
+                rebound.update((alias.asname or alias.name).split('.')[0] for alias in child.names)
+    return {name: index for name, index in modules.items() if name not in rebound}
+
+
+def unique_name(base: str, taken: Set[str]) -> str:
+    """
+    Make a name that doesn't collide with the taken ones and reserve it.
+
+    Args:
+        base (str): Preferred name.
+        taken (Set[str]): Names already in use, the new name is added.
+
+    Returns:
+        str: The unique name.
+    """
+    name = base
+    number = 1
+    while name in taken:
+        name = f"{base}_{number}"
+        number += 1
+    taken.add(name)
+    return name
+
+
+def stores(nodes: List[ast.AST]) -> Set[str]:
+    """Names assigned anywhere in the nodes."""
+    names = set()
+    for root in nodes:
+        for node in ast.walk(root):
+            if isinstance(node, ast.Name) and not isinstance(node.ctx, ast.Load):
+                names.add(node.id)
+            elif isinstance(node, (ast.FunctionDef, ast.AsyncFunctionDef, ast.ClassDef)):
+                names.add(node.name)
+            elif isinstance(node, (ast.Import, ast.ImportFrom)):
+                names.update((alias.asname or alias.name).split('.')[0] for alias in node.names)
+    return names
+
+
+class Rule(ast.NodeTransformer):
+    """Base class of the rewrites: name, description and apply()."""
+    name = ''
+    description = ''
+
+    def __init__(self) -> None:
+        self.changed = False
+
+    def apply(self, tree: ast.Module) -> bool:
+        """
+        Rewrite the tree in place.
+
+        Args:
+            tree (ast.Module): The parsed script.
+
+        Returns:
+            bool: True if anything was rewritten.
+        """
+        self.prepare(tree)
+        self.visit(tree)
+        ast.fix_missing_locations(tree)
+        return self.changed
+
+    def prepare(self, tree: ast.Module) -> None:
+        """Collect module level facts before the rewrite."""
+
+
+class HoistRegex(Rule):
+    """`re.search(r'literal', s)` in a loop or function -> module level `re.compile` and a method call."""
+    name = 'hoist_regex'
+    description = 're calls with a literal pattern inside loops and functions use a precompiled module level pattern'
+
+    def prepare(self, tree: ast.Module) -> None:
+        self.re_index = imported_modules(tree).get('re')
+        self.taken = bound_names(tree)
+        self.patterns: Dict[str, str] = {}
+        self.assignments: List[ast.Assign] = []
+        self.depth = 0
+
+    def apply(self, tree: ast.Module) -> bool:
+        self.prepare(tree)
+        if self.re_index is None:
+            return False
+        self.visit(tree)
+        tree.body[self.re_index + 1:self.re_index + 1] = self.assignments
+        ast.fix_missing_locations(tree)
+        return self.changed
+
+    def _nested(self, node: ast.AST) -> ast.AST:
+        self.depth += 1
+        self.generic_visit(node)
+        self.depth -= 1
+        return node
+
+    visit_For = visit_AsyncFor = visit_While = _nested
+    visit_FunctionDef = visit_AsyncFunctionDef = visit_Lambda = _nested
+    visit_ListComp = visit_SetComp = visit_DictComp = visit_GeneratorExp = _nested
+
+    def _is_static(self, node: ast.AST) -> bool:
+        """A flags expression built of constants and re.FLAG attributes."""
+        if isinstance(node, ast.Constant):
+            return isinstance(node.value, int)
+        if isinstance(node, ast.Attribute):
+            return isinstance(node.value, ast.Name) and node.value.id == 're' and node.attr.isupper()
+        if isinstance(node, ast.BinOp) and isinstance(node.op, ast.BitOr):
+            return self._is_static(node.left) and self._is_static(node.right)
+        return False
+
+    def visit_Call(self, node: ast.Call) -> ast.AST:
+        self.generic_visit(node)
+        func = node.func
+        if not (self.depth and isinstance(func, ast.Attribute) and isinstance(func.value, ast.Name)
+                and func.value.id == 're' and func.attr in REGEX_FUNCTIONS):
+            return node
+        arity, positional_flags = REGEX_FUNCTIONS[func.attr]
+        if not node.args or not isinstance(node.args[0], ast.Constant) \
+                or not isinstance(node.args[0].value, (str, bytes)) \
+                or any(isinstance(arg, ast.Starred) for arg in node.args) \
+                or any(keyword.arg is None for keyword in node.keywords):
+            return node
+        keywords = [keyword for keyword in node.keywords if keyword.arg != 'flags']
+        flags = [keyword.value for keyword in node.keywords if keyword.arg == 'flags']
+        if len(node.args) == arity + 1 and positional_flags and not flags:
+            flags = [node.args[-1]]
+        elif len(node.args) != arity or (func.attr == 'compile' and keywords):
+            return node
+        if not all(self._is_static(flag) for flag in flags):
+            return node
+        compile_args = [node.args[0]] + flags
+        key = ast.dump(ast.Tuple(elts=compile_args, ctx=ast.Load()))
+        if key not in self.patterns:
+            self.patterns[key] = unique_name(f"_RE_PATTERN_{len(self.patterns)}", self.taken)
+            self.assignments.append(ast.Assign(
+                targets=[ast.Name(id=self.patterns[key], ctx=ast.Store())],
+                value=ast.Call(func=ast.Attribute(value=ast.Name(id='re', ctx=ast.Load()), attr='compile',
+                                                  ctx=ast.Load()), args=compile_args, keywords=[])
+            ))
+        self.changed = True
+        pattern = ast.Name(id=self.patterns[key], ctx=ast.Load())
+        if func.attr == 'compile':
+            return ast.copy_location(pattern, node)
+        method = ast.Attribute(value=pattern, attr=func.attr, ctx=ast.Load())
+        return ast.copy_location(ast.Call(func=method, args=node.args[1:arity], keywords=keywords), node)
+
+
+class DictCounting(Rule):
+    """`if k in d: d[k] += n else: d[k] = n` -> `d[k] = d.get(k, 0) + n`."""
+    name = 'dict_counting'
+    description = 'membership test + increment/initialize branches become a single dict.get update'
+
+    @staticmethod
+    def _simple(node: ast.AST) -> bool:
+        return isinstance(node, ast.Name) or (isinstance(node, ast.Constant) and isinstance(node.value, (str, int)))
+
+    @staticmethod
+    def _subscript_of(node: ast.AST, container: str, key: str) -> bool:
+        return isinstance(node, ast.Subscript) and isinstance(node.value, ast.Name) \
+            and node.value.id == container and ast.dump(node.slice) == key
+
+    def visit_If(self, node: ast.If) -> ast.AST:
+        self.generic_visit(node)
+        test = node.test
+        if not (isinstance(test, ast.Compare) and len(test.ops) == 1 and isinstance(test.ops[0], (ast.In, ast.NotIn))
+                and self._simple(test.left) and isinstance(test.comparators[0], ast.Name)
+                and len(node.body) == 1 and len(node.orelse) == 1):
+            return node
+        increment, initialize = node.body[0], node.orelse[0]
+        if isinstance(test.ops[0], ast.NotIn):
+            increment, initialize = initialize, increment
+        container, key = test.comparators[0].id, ast.dump(test.left)
+        if not (isinstance(increment, ast.AugAssign) and isinstance(increment.op, ast.Add)
+                and self._subscript_of(increment.target, container, key)
+                and isinstance(initialize, ast.Assign) and len(initialize.targets) == 1
+                and self._subscript_of(initialize.targets[0], container, key)
+                and isinstance(increment.value, ast.Constant) and isinstance(initialize.value, ast.Constant)
+                and type(increment.value.value) is int and increment.value.value == initialize.value.value):
+            return node
+        self.changed = True
+        get = ast.Call(func=ast.Attribute(value=ast.Name(id=container, ctx=ast.Load()), attr='get', ctx=ast.Load()),
+                       args=[test.left, ast.Constant(value=0)], keywords=[])
+        return ast.copy_location(ast.Assign(
+            targets=[ast.Subscript(value=ast.Name(id=container, ctx=ast.Load()), slice=test.left, ctx=ast.Store())],
+            value=ast.BinOp(left=get, op=ast.Add(), right=increment.value)
+        ), node)
+
+
+class MembershipSet(Rule):
+    """`x in [1, 2, 3]` -> `x in {1, 2, 3}` (a constant frozenset) for literals of hashable constants."""
+    name = 'membership_set'
+    description = 'membership tests against list/tuple literals of constants use a set literal'
+
+    def visit_Compare(self, node: ast.Compare) -> ast.AST:
+        self.generic_visit(node)
+        for index, (op, comparator) in enumerate(zip(node.ops, node.comparators)):
+            if isinstance(op, (ast.In, ast.NotIn)) and isinstance(comparator, (ast.List, ast.Tuple)) \
+                    and len(comparator.elts) > 2 \
+                    and all(isinstance(elt, ast.Constant) and isinstance(elt.value, (str, bytes, int))
+                            and not isinstance(elt.value, bool) for elt in comparator.elts):
+                node.comparators[index] = ast.copy_location(ast.Set(elts=comparator.elts), comparator)
+                self.changed = True
+        return node
+
+
+class CacheModuleAttributes(Rule):
+    """`math.sqrt(x)` inside a loop -> `_math_sqrt = math.sqrt` before the loop and `_math_sqrt(x)` inside."""
+    name = 'cache_attributes'
+    description = 'module attribute lookups inside loops are cached into local names before the loop'
+
+    def prepare(self, tree: ast.Module) -> None:
+        self.modules = set(imported_modules(tree))
+        self.taken = bound_names(tree)
+
+    def _rewrite_body(self, body: List[ast.stmt]) -> List[ast.stmt]:
+        new_body = []
+        for stmt in body:
+            if isinstance(stmt, LOOP_NODES):
+                new_body.extend(self._cache_loop(stmt))
+            else:
+                self.visit(stmt)
+                new_body.append(stmt)
+        return new_body
+
+    def _cache_loop(self, loop: ast.stmt) -> List[ast.stmt]:
+        """Replace module attribute calls in the loop (outside nested scopes) with cached locals."""
+        cached: Dict[Tuple[str, str], str] = {}
+        assigned = stores([loop])
+
+        def replace(node: ast.AST) -> None:
+            for field, value in ast.iter_fields(node):
+                children = value if isinstance(value, list) else [value]
+                for position, child in enumerate(children):
+                    if not isinstance(child, ast.AST) or isinstance(child, SCOPE_NODES):
+                        continue
+                    if isinstance(child, ast.Call) and isinstance(child.func, ast.Attribute) \
+                            and isinstance(child.func.value, ast.Name) and child.func.value.id in self.modules \
+                            and child.func.value.id not in assigned:
+                        key = (child.func.value.id, child.func.attr)
+                        if key not in cached:
+                            cached[key] = unique_name(f"_{key[0]}_{key[1]}", self.taken)
+                        child.func = ast.copy_location(ast.Name(id=cached[key], ctx=ast.Load()), child.func)
+                    replace(child)
+
+        # The iterable of a for loop is evaluated once, only the body and the while test repeat.
+        for field in ('body', 'orelse', 'test'):
+            if hasattr(loop, field):
+                replace(ast.Module(body=[getattr(loop, field)], type_ignores=[])
+                        if field == 'test' else ast.Module(body=getattr(loop, field), type_ignores=[]))
+        for scope in ast.walk(loop):
+            if isinstance(scope, SCOPE_NODES):
+                self.visit(scope)
+        if not cached:
+            return [loop]
+        self.changed = True
+        hoisted = [ast.copy_location(ast.Assign(
+            targets=[ast.Name(id=name, ctx=ast.Store())],
+            value=ast.Attribute(value=ast.Name(id=module, ctx=ast.Load()), attr=attr, ctx=ast.Load())
+        ), loop) for (module, attr), name in cached.items()]
+        return hoisted + [loop]
+
+    def generic_visit(self, node: ast.AST) -> ast.AST:
+        for field in ('body', 'orelse', 'finalbody'):
+            value = getattr(node, field, None)
+            if isinstance(value, list) and value and isinstance(value[0], ast.stmt):
+                setattr(node, field, self._rewrite_body(value))
+        for handler in getattr(node, 'handlers', []):
+            handler.body = self._rewrite_body(handler.body)
+        for case in getattr(node, 'cases', []):
+            case.body = self._rewrite_body(case.body)
+        return node
+
+
+class JoinConcatenation(Rule):
+    """`s = ''` + `for ...: s += part` -> parts list, `append` in the loop and `''.join` after it."""
+    name = 'join_concatenation'
+    description = 'string concatenation in a for loop collects the parts and joins them once'
+
+    def _rewrite_body(self, body: List[ast.stmt]) -> List[ast.stmt]:
+        new_body = []
+        for stmt in body:
+            previous = new_body[-1] if new_body else None
+            if isinstance(stmt, (ast.For, ast.AsyncFor)) and not stmt.orelse and isinstance(previous, ast.Assign) \
+                    and len(previous.targets) == 1 and isinstance(previous.targets[0], ast.Name) \
+                    and isinstance(previous.value, ast.Constant) and previous.value.value == '':
+                rewritten = self._rewrite_loop(previous.targets[0].id, stmt)
+                if rewritten:
+                    new_body[-1:] = rewritten
+                    continue
+            self.visit(stmt)
+            new_body.append(stmt)
+        return new_body
+
+    def _rewrite_loop(self, variable: str, loop: ast.stmt) -> Optional[List[ast.stmt]]:
+        """Rewrite the loop if its only use of variable is a top-level `variable += part` statement."""
+        appends = [stmt for stmt in loop.body if isinstance(stmt, ast.AugAssign) and isinstance(stmt.op, ast.Add)
+                   and isinstance(stmt.target, ast.Name) and stmt.target.id == variable]
+        if not appends:
+            return None
+        uses = [node for node in ast.walk(loop) if isinstance(node, ast.Name) and node.id == variable]
+        if len(uses) != len(appends) or any(isinstance(node, (ast.Global, ast.Nonlocal)) for node in ast.walk(loop)):
+            return None
+        parts = unique_name(f"_{variable}_parts", self.taken)
+        for stmt in appends:
+            index = loop.body.index(stmt)
+            append = ast.Call(func=ast.Attribute(value=ast.Name(id=parts, ctx=ast.Load()), attr='append',
+                                                 ctx=ast.Load()), args=[stmt.value], keywords=[])
+            loop.body[index] = ast.copy_location(ast.Expr(value=append), stmt)
+        self.changed = True
+        init = ast.copy_location(ast.Assign(targets=[ast.Name(id=parts, ctx=ast.Store())],
+                                            value=ast.List(elts=[], ctx=ast.Load())), loop)
+        join = ast.Call(func=ast.Attribute(value=ast.Constant(value=''), attr='join', ctx=ast.Load()),
+                        args=[ast.Name(id=parts, ctx=ast.Load())], keywords=[])
+        result = ast.copy_location(ast.Assign(targets=[ast.Name(id=variable, ctx=ast.Store())], value=join), loop)
+        return [init, loop, result]
+
+    def prepare(self, tree: ast.Module) -> None:
+        self.taken = bound_names(tree)
+
+    def generic_visit(self, node: ast.AST) -> ast.AST:
+        for field in ('body', 'orelse', 'finalbody'):
+            value = getattr(node, field, None)
+            if isinstance(value, list) and value and isinstance(value[0], ast.stmt):
+                setattr(node, field, self._rewrite_body(value))
+        for handler in getattr(node, 'handlers', []):
+            handler.body = self._rewrite_body(handler.body)
+        for case in getattr(node, 'cases', []):
+            case.body = self._rewrite_body(case.body)
+        return node
+
+
+RULES = {rule.name: rule for rule in (HoistRegex, DictCounting, MembershipSet, CacheModuleAttributes,
+                                      JoinConcatenation)}
+
+
+def rewrite(code: str, rule_name: str) -> Optional[str]:
+    """
+    Apply one rule.
+
+    Args:
+        code (str): The script.
+        rule_name (str): A key of RULES.
+
+    Returns:
+        Optional[str]: The rewritten script, None if the rule doesn't apply or the script can't be parsed.
+    """
+    try:
+        tree = ast.parse(code)
+    except (SyntaxError, ValueError):
+        return None
+    if not RULES[rule_name]().apply(tree):
+        return None
+    return ast.unparse(tree)
+
+
+def apply_rules(code: str, check: Callable[[str, str], bool],
+                rule_names: Optional[List[str]] = None) -> Tuple[str, List[str]]:
+    """
+    Apply the rules one by one, keeping a rewrite only if the check accepts it.
+
+    Args:
+        code (str): The script.
+        check (Callable[[str, str], bool]): Gets the rewritten script and the rule name, returns True if it is
+            correct (e.g. its output matches the reference).
+        rule_names (Optional[List[str]]): Rules to try, all of RULES by default.
+
+    Returns:
+        Tuple[str, List[str]]: The rewritten script and the names of the applied rules.
+    """
+    applied = []
+    for rule_name in rule_names or list(RULES):
+        rewritten = rewrite(code, rule_name)
+        if rewritten is not None and check(rewritten, rule_name):
+            code = rewritten
+            applied.append(rule_name)
+    return code, applied
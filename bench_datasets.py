@@ -0,0 +1,111 @@
+"""
+Registry of generated benchmark datasets.
+
+A dataset is a file a target script reads from a path relative to its working directory
+(e.g. ./data/access.log for script.py). prepare_dataset() generates it once per size and seed
+into a cache folder; candidates are then run with that folder as the working directory.
+"""
+import os
+import re
+import threading
+from typing import Callable, Dict, List
+
+from gen_access_log import generate_access_log
+
+DEFAULT_CACHE_DIR = './run/datasets'
+SIZE_UNITS = {"": 1, "B": 1, "KB": 1024, "MB": 1024 ** 2, "GB": 1024 ** 3, "TB": 1024 ** 4}
+
+# name -> {"path": file path relative to the working directory of the script, "generate": (path, size, seed) -> Any}
+DATASETS: Dict[str, Dict[str, object]] = {}
+_lock = threading.Lock()
+
+
+def register_dataset(name: str, path: str, generate: Callable[[str, int, int], object]) -> None:
+    """
+    Register a dataset generator.
+
+    Args:
+        name (str): Dataset name used on the command line.
+        path (str): Path of the file relative to the working directory of the script.
+        generate (Callable[[str, int, int], object]): Writes a file of about the given size with the given seed.
+    """
+    DATASETS[name] = {"path": path, "generate": generate}
+
+
+register_dataset('access_log', os.path.join('data', 'access.log'), generate_access_log)
+
+
+def parse_size(text: str) -> int:
+    """
+    Parse a human readable size.
+
+    Args:
+        text (str): E.g. '512KB', '100MB', '50GB' or a number of bytes.
+
+    Returns:
+        int: Size in bytes.
+    """
+    match = re.fullmatch(r'\s*(\d+(?:\.\d+)?)\s*([KMGT]?B?)\s*', text.upper())
+    if not match:
+        raise ValueError(f"Invalid size '{text}', expected e.g. 512KB, 100MB or 50GB")
+    unit = match.group(2)
+    if unit and not unit.endswith('B'):
+        unit += 'B'
+    return int(float(match.group(1)) * SIZE_UNITS[unit])
+
+
+def parse_sizes(text: str) -> List[int]:
+    """
+    Parse a comma separated list of sizes, see parse_size().
+
+    Args:
+        text (str): E.g. '10MB,100MB,1GB'.
+
+    Returns:
+        List[int]: Sizes in bytes.
+    """
+    return [parse_size(item) for item in text.split(',') if item.strip()]
+
+
+def format_size(size: int) -> str:
+    """
+    Render a size with the largest unit that keeps it integral, e.g. 104857600 -> '100MB'.
+
+    Args:
+        size (int): Size in bytes.
+
+    Returns:
+        str: The size.
+    """
+    for unit in ('TB', 'GB', 'MB', 'KB'):
+        if size >= SIZE_UNITS[unit] and size % SIZE_UNITS[unit] == 0:
+            return f"{size // SIZE_UNITS[unit]}{unit}"
+    return f"{size}B"
+
+
+def prepare_dataset(name: str, size: int, seed: int = 0, cache_dir: str = DEFAULT_CACHE_DIR) -> str:
+    """
+    Generate a dataset unless it is already cached.
+
+    Args:
+        name (str): Registered dataset name.
+        size (int): Size in bytes.
+        seed (int): Seed of the generator.
+        cache_dir (str): Folder of the generated datasets.
+
+    Returns:
+        str: Absolute path of the working directory to run the script in.
+    """
+    if name not in DATASETS:
+        raise ValueError(f"Unknown dataset '{name}', registered: {', '.join(DATASETS)}")
+    dataset = DATASETS[name]
+    workdir = os.path.abspath(os.path.join(cache_dir, f"{name}-{format_size(size)}-seed{seed}"))
+    file_path = os.path.join(workdir, dataset["path"])
+    with _lock:
+        if not os.path.exists(file_path):
+            os.makedirs(os.path.dirname(file_path), exist_ok=True)
+            print(f"Generating dataset {name} of {format_size(size)} (seed {seed}) in {workdir}")
+            tmp_path = f"{file_path}.{os.getpid()}.tmp"
+            dataset["generate"](tmp_path, size, seed)
+            os.replace(tmp_path, file_path)
+    return workdir
@@ -0,0 +1,62 @@
+from fastapi import FastAPI
+from threading import Thread
+import uvicorn
+import requests
+from readiness import wait_for_server
+
+# Define the FastAPI app
+app = FastAPI()
+
+
+# Endpoint for processing complex JSON
+@app.post("/process/")
+async def process_item(data: dict):
+    # Only the count is returned: count the leaves instead of building a flattened dictionary of them.
+    # .items() is kept on every level so malformed payloads fail with the same error message.
+    element_count = 0
+    try:
+        for _, level1_value in data.items():
+            for _, level2_value in level1_value.items():
+                for _, level3_value in level2_value.items():
+                    for _, level4_value in level3_value.items():
+                        element_count += len(level4_value.items())
+    except Exception as e:
+        return {"error": f"An error occurred: {str(e)}"}
+
+    return {"element_count": element_count}
+
+
+# Function to generate a complex nested JSON
+def generate_nested_json(levels=5, elements_per_level=5):
+    def create_level(depth):
+        if depth == 0:
+            return {f"key_{i}": f"value_{i}" for i in range(elements_per_level)}
+        else:
+            return {f"level_{depth}_key_{i}": create_level(depth - 1) for i in range(elements_per_level)}
+
+    return create_level(levels - 1)
+
+
+# Function to run the FastAPI server
+def run_server():
+    uvicorn.run(app, host="127.0.0.1", port=8000, log_level="warning")
+
+
+# Start the server in a separate thread
+server_thread = Thread(target=run_server, daemon=True)
+server_thread.start()
+
+# Wait until the server accepts connections
+wait_for_server("127.0.0.1", 8000)
+
+# Client sends complex JSON to the API
+try:
+    url = "http://127.0.0.1:8000/process/"
+    nested_json = generate_nested_json()
+    response = requests.post(url, json=nested_json)
+    print("Response from server:", response.json())
+except Exception as e:
+    print("Error:", e)
+
+# Stop the server
+print("Done.")
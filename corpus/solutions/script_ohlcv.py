@@ -0,0 +1,49 @@
+import ccxt
+import pandas as pd
+from concurrent.futures import ThreadPoolExecutor
+
+TOP_COINS = [
+    "BTC/USDT", "ETH/USDT", "BNB/USDT", "XRP/USDT", "DOGE/USDT",
+    "ADA/USDT", "SOL/USDT", "DOT/USDT", "MATIC/USDT", "SHIB/USDT"
+]
+END_DATE = "2024-11-25"
+COLUMNS = ['timestamp', 'open', 'high', 'low', 'close', 'volume']
+
+
+def fetch_ohlcv(exchange, symbol, timeframe='1d', limit=100):
+    """Fetch OHLCV rows of a symbol, the error instead of raising so the output order is kept."""
+    try:
+        return exchange.fetch_ohlcv(symbol, timeframe, limit=limit), None
+    except Exception as e:
+        return None, e
+
+
+def main():
+    # The requests are independent: fetch them concurrently instead of one per client-side rate limit interval.
+    exchange = ccxt.binance({'enableRateLimit': False})
+    with ThreadPoolExecutor(max_workers=len(TOP_COINS)) as executor:
+        fetched = list(executor.map(lambda symbol: fetch_ohlcv(exchange, symbol), TOP_COINS))
+
+    end = pd.Timestamp(END_DATE)
+    for symbol, (ohlcv, error) in zip(TOP_COINS, fetched):
+        if error is not None:
+            print(f"Error fetching data for {symbol}: {error}")
+            print(f"Could not calculate SMA for {symbol}.")
+            continue
+
+        df = pd.DataFrame(ohlcv, columns=COLUMNS)
+        df['datetime'] = pd.to_datetime(df['timestamp'], unit='ms')
+        df = df[df['datetime'] <= end].reset_index(drop=True)
+        if df.empty:
+            print(f"No data available for {symbol} up to {END_DATE}.")
+            continue
+
+        df['date'] = df['datetime'].dt.strftime('%Y-%m-%d')
+        df['sma_10'] = df['close'].rolling(window=10).mean()
+        df['sma_50'] = df['close'].rolling(window=50).mean()
+        print(f"SMA for {symbol} (up to {END_DATE}):")
+        print(df[['date', 'close', 'sma_10', 'sma_50']].tail(1).to_string(index=False))
+
+
+if __name__ == "__main__":
+    main()
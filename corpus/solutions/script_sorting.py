@@ -0,0 +1,9 @@
+def very_inefficient_sort(data):
+    # Timsort: O(n log n), linear on sorted, reversed and few-run inputs.
+    return sorted(data)
+
+
+# Example list to sort
+unsorted_list = [5, 3, 8, 6, 2, 7, 4, 1]
+sorted_list = very_inefficient_sort(unsorted_list)
+print(f"Sorted list: {sorted_list}")
@@ -0,0 +1,208 @@
+"""
+Runs the optimizer against the benchmark corpus and scores the models.
+
+Every model optimises every corpus entry (corpus/corpus.yaml) with the same step budget, one entry at
+a time so the timings don't disturb each other. The known-good solution of every entry is checked
+against the base script first, it is the speedup the models are compared with. Per model the runner
+reports the geometric mean speedup, the share of correct candidates and the tokens spent per unit of
+speedup (total tokens / sum of (speedup - 1)):
+
+    python3 corpus_runner.py --models ollama:qwen2.5-coder-8K-ctx:14b,openai:gpt-4o --steps 10
+"""
+import argparse
+import json
+import math
+import os
+from typing import Any, Dict, List, Optional
+
+import yaml
+
+from main import (PROCESS_OPTIONS, build_parser, configure_exchange_sim, create_llm_interface, evaluate_program,
+                  get_outcome, optimize, outputs_match, parse_backend_specs, prepare_workdirs, print_summary,
+                  record_http_cassette)
+
+DEFAULT_CORPUS = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'corpus', 'corpus.yaml')
+# Corpus keys that aren't main.py options.
+ENTRY_KEYS = ('name', 'description', 'solution')
+# Entries run one at a time, so the options of the process can be set per entry.
+ENTRY_PROCESS_OPTIONS = ('exchange_sim', 'sim_latency', 'sim_jitter', 'sim_rate_limit', 'sim_seed')
+
+
+def load_corpus(corpus_path: str, names: Optional[List[str]] = None) -> List[Dict[str, Any]]:
+    """
+    Read the corpus and build the options of every entry.
+
+    Args:
+        corpus_path (str): Path to the corpus YAML file, with 'defaults' and 'scripts' like a batch manifest.
+        names (Optional[List[str]]): Only these entries, all by default.
+
+    Returns:
+        List[Dict[str, Any]]: Per entry "name", "description", "solution" (absolute path) and "args".
+    """
+    with open(corpus_path, 'r') as file:
+        corpus = yaml.safe_load(file)
+    corpus_dir = os.path.dirname(os.path.abspath(corpus_path))
+    defaults = corpus.get('defaults') or {}
+    base_options = vars(build_parser().parse_args([]))
+    entries = []
+    for script in corpus['scripts']:
+        if names and script['name'] not in names:
+            continue
+        options = dict(base_options)
+        for key, value in {**defaults, **script}.items():
+            key = key.replace('-', '_')
+            if key in ENTRY_KEYS:
+                continue
+            if key not in options or (key in PROCESS_OPTIONS and key not in ENTRY_PROCESS_OPTIONS):
+                raise ValueError(f"Unknown option '{key}' in corpus {corpus_path}")
+            options[key] = str(value) if isinstance(base_options.get(key), str) else value
+        options['program'] = os.path.join(corpus_dir, script['program'])
+        entries.append({
+            "name": script['name'],
+            "description": script.get('description', ''),
+            "solution": os.path.join(corpus_dir, script['solution']),
+            "args": argparse.Namespace(**options),
+        })
+    if names and len(entries) != len(names):
+        raise ValueError(f"Unknown corpus entries: {', '.join(sorted(set(names) - {e['name'] for e in entries}))}")
+    return entries
+
+
+def check_solution(entry: Dict[str, Any]) -> Dict[str, Any]:
+    """
+    Measure the base script and the known-good solution of an entry.
+
+    Args:
+        entry (Dict[str, Any]): A corpus entry, see load_corpus().
+
+    Returns:
+        Dict[str, Any]: "base" and "solution" execution times in microseconds, "correct" and "speedup".
+    """
+    args = entry["args"]
+    configure_exchange_sim(args)
+    workdirs = prepare_workdirs(args)
+    cwd = workdirs[0][1] if workdirs else None
+    if args.http_replay:
+        record_http_cassette(args, cwd=cwd)
+    reference_results, _, base_extime, base_failed = evaluate_program(args, args.program, timeout=args.timeout, cwd=cwd)
+    output, error, solution_extime, failed = evaluate_program(args, entry["solution"], timeout=args.timeout, cwd=cwd)
+    correct = not base_failed and not failed and outputs_match(reference_results, output, args.equivalence)
+    if not correct:
+        print(f"[{entry['name']}] The known-good solution doesn't reproduce the base output: {error}")
+    return {
+        "base": base_extime,
+        "solution": solution_extime,
+        "correct": correct,
+        "speedup": base_extime / solution_extime if correct and solution_extime else None,
+    }
+
+
+def score_run(base_extime: int, results: List[Dict[str, Any]]) -> Dict[str, Any]:
+    """
+    Score one optimisation run.
+
+    Args:
+        base_extime (int): Execution time of the base script in microseconds.
+        results (List[Dict[str, Any]]): Results of the iterations.
+
+    Returns:
+        Dict[str, Any]: "speedup" of the best correct candidate (1.0 without one), "best" execution time,
+            "correct" and "candidates" counts and "tokens".
+    """
+    times = [res['execution_time'] for res in results if get_outcome(res) == 'ok' and res['execution_time'] > 0]
+    best = min(times, default=base_extime)
+    return {
+        "speedup": max(1.0, base_extime / best) if best else 1.0,
+        "best": best,
+        "correct": len(times),
+        "candidates": len(results),
+        "tokens": sum(res['tokens'] for res in results),
+    }
+
+
+def aggregate(scores: List[Dict[str, Any]]) -> Dict[str, Any]:
+    """
+    Aggregate the scores of a model over the corpus.
+
+    Args:
+        scores (List[Dict[str, Any]]): Scores of the entries, see score_run().
+
+    Returns:
+        Dict[str, Any]: "speedup" (geometric mean), "correctness" (share of correct candidates), "tokens" and
+            "tokens_per_speedup" (None without any speedup).
+    """
+    gain = sum(score["speedup"] - 1 for score in scores)
+    tokens = sum(score["tokens"] for score in scores)
+    candidates = sum(score["candidates"] for score in scores)
+    return {
+        "speedup": math.exp(sum(math.log(score["speedup"]) for score in scores) / len(scores)) if scores else 1.0,
+        "correctness": sum(score["correct"] for score in scores) / candidates if candidates else 0.0,
+        "tokens": tokens,
+        "tokens_per_speedup": tokens / gain if gain > 0 else None,
+    }
+
+
+def run_corpus(args: argparse.Namespace) -> Dict[str, Any]:
+    """
+    Optimise every corpus entry with every model and print the scores.
+
+    Args:
+        args (argparse.Namespace): Command line options of the runner.
+
+    Returns:
+        Dict[str, Any]: The report: "solutions" per entry, "runs" per model and entry and "models" aggregates.
+    """
+    entries = load_corpus(args.corpus, args.entries.split(',') if args.entries else None)
+    models = parse_backend_specs(args.models)
+    report: Dict[str, Any] = {"steps": args.steps, "solutions": {}, "runs": {}, "models": {}}
+    for entry in entries:
+        report["solutions"][entry["name"]] = check_solution(entry)
+    for backend, model_name in models:
+        model = f"{backend}:{model_name}"
+        report["runs"][model] = {}
+        for entry in entries:
+            run_args = argparse.Namespace(**{**vars(entry["args"]), "model": backend, "model_name": model_name,
+                                             "steps": args.steps, "token_budget": args.token_budget,
+                                             "fake_responses": args.fake_responses})
+            configure_exchange_sim(run_args)
+            log_prefix = f"[{model} {entry['name']}] "
+            base_extime, results = optimize(run_args, create_llm_interface(run_args), log_prefix=log_prefix)
+            print_summary(results, log_prefix)
+            report["runs"][model][entry["name"]] = score_run(base_extime, results)
+        report["models"][model] = aggregate(list(report["runs"][model].values()))
+
+    print("Corpus results:")
+    for model, runs in report["runs"].items():
+        for name, score in runs.items():
+            known_good = report["solutions"][name]["speedup"]
+            print(f"{model} {name}: speedup {score['speedup']:.2f}x "
+                  f"(known-good {f'{known_good:.2f}x' if known_good else 'n/a'}), "
+                  f"correct {score['correct']}/{score['candidates']}, tokens {score['tokens']}")
+        summary = report["models"][model]
+        tokens_per_speedup = summary["tokens_per_speedup"]
+        print(f"{model}: geometric mean speedup {summary['speedup']:.2f}x, correctness {summary['correctness']:.0%}, "
+              f"tokens per unit speedup {f'{tokens_per_speedup:.0f}' if tokens_per_speedup else 'n/a'}")
+    if args.report:
+        os.makedirs(os.path.dirname(os.path.abspath(args.report)), exist_ok=True)
+        with open(args.report, 'w') as file:
+            json.dump(report, file, indent=2)
+        print(f"Report saved to {args.report}")
+    return report
+
+
+def main() -> None:
+    """Run the corpus from the command line."""
+    parser = argparse.ArgumentParser(description='Score models on the benchmark corpus.')
+    parser.add_argument('--models', required=True,
+                        help='Comma separated backend:model_name pairs, e.g. ollama:qwen2.5-coder-8K-ctx:14b,openai:gpt-4o')
+    parser.add_argument('--corpus', default=DEFAULT_CORPUS, help='Corpus YAML file')
+    parser.add_argument('--entries', help='Comma separated corpus entries to run, all by default')
+    parser.add_argument('--steps', type=int, default=10, help='Optimisation steps per model and entry')
+    parser.add_argument('--token-budget', type=int, help='Token budget per model and entry')
+    parser.add_argument('--report', default='./run/corpus_report.json', help='JSON report file')
+    parser.add_argument('--fake-responses', help='Fake model: responses to replay')
+    run_corpus(parser.parse_args())
+
+
+if __name__ == "__main__":
+    main()
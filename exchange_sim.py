@@ -0,0 +1,194 @@
+"""
+Local exchange simulator for ccxt-based targets.
+
+SimulatedBinance and AsyncSimulatedBinance are ccxt.binance subclasses that never touch the network:
+fetch_ohlcv() serves seeded synthetic candles with configurable latency, jitter and a server-side
+rate limit, and every other REST call fails with ccxt.NetworkError. install() replaces ccxt.binance
+and ccxt.async_support.binance with them; the optimizer does that in every candidate through
+harness_site/sitecustomize.py when it runs with --exchange-sim. Settings come from the environment:
+
+    OPTIMIZER_EXCHANGE_SIM=1          enable the simulator
+    OPTIMIZER_SIM_SEED=0              seed of the candles and of the latency jitter
+    OPTIMIZER_SIM_LATENCY=0.05        seconds per request
+    OPTIMIZER_SIM_JITTER=0.02         maximum random deviation of the latency in seconds
+    OPTIMIZER_SIM_RATE_LIMIT=0        requests per second before ccxt.RateLimitExceeded, 0 disables it
+"""
+import asyncio
+import math
+import os
+import random
+import threading
+import time
+import zlib
+from collections import deque
+from typing import Any, Dict, List, Optional
+
+import ccxt
+import ccxt.async_support
+
+# The simulated "now": the latest candle starts before this timestamp (2024-11-26 00:00 UTC).
+SIM_NOW = 1_732_579_200_000
+DEFAULT_LIMIT = 500
+MAX_LIMIT = 1000
+SYMBOLS = ["BTC/USDT", "ETH/USDT", "BNB/USDT", "XRP/USDT", "DOGE/USDT", "ADA/USDT", "SOL/USDT", "DOT/USDT",
+           "MATIC/USDT", "SHIB/USDT", "AVAX/USDT", "LINK/USDT", "LTC/USDT", "TRX/USDT", "UNI/USDT"]
+
+
+class SimulationSettings:
+    """Simulator settings and the server-side state shared by all simulated exchanges of the process."""
+    def __init__(self, seed: int = 0, latency: float = 0.05, jitter: float = 0.02, rate_limit: float = 0.0) -> None:
+        """
+        Initialize the settings.
+
+        Args:
+            seed (int): Seed of the candles and of the latency jitter.
+            latency (float): Seconds per request.
+            jitter (float): Maximum random deviation of the latency in seconds.
+            rate_limit (float): Requests per second before ccxt.RateLimitExceeded, 0 disables it.
+        """
+        self.seed = seed
+        self.latency = latency
+        self.jitter = jitter
+        self.rate_limit = rate_limit
+        self.rng = random.Random(seed)
+        self.requests: deque = deque()
+        self.lock = threading.Lock()
+
+    @classmethod
+    def from_env(cls) -> 'SimulationSettings':
+        """Read the settings from the OPTIMIZER_SIM_* environment variables."""
+        return cls(
+            seed=int(os.environ.get("OPTIMIZER_SIM_SEED", 0)),
+            latency=float(os.environ.get("OPTIMIZER_SIM_LATENCY", 0.05)),
+            jitter=float(os.environ.get("OPTIMIZER_SIM_JITTER", 0.02)),
+            rate_limit=float(os.environ.get("OPTIMIZER_SIM_RATE_LIMIT", 0)),
+        )
+
+    def admit(self, exchange_id: str) -> float:
+        """
+        Account a request against the rate limit.
+
+        Args:
+            exchange_id (str): Exchange id for the error message.
+
+        Returns:
+            float: Latency of the request in seconds.
+        """
+        now = time.monotonic()
+        with self.lock:
+            if self.rate_limit:
+                while self.requests and now - self.requests[0] >= 1.0:
+                    self.requests.popleft()
+                if len(self.requests) >= self.rate_limit:
+                    raise ccxt.RateLimitExceeded(f'{exchange_id} {{"code":-1003,"msg":"Too many requests; '
+                                                 f'simulated limit is {self.rate_limit:g} requests per second."}}')
+                self.requests.append(now)
+            return max(0.0, self.latency + self.rng.uniform(-self.jitter, self.jitter))
+
+
+SETTINGS = SimulationSettings()
+
+
+def _close(seed: int, symbol_hash: int, timeframe: str, index: int) -> float:
+    """Close price of the candle with the given index: a smooth seeded trend plus per-candle noise."""
+    base = 10 ** ((symbol_hash % 600) / 100 - 1)  # From 0.1 to ~100000 depending on the symbol.
+    phase = (symbol_hash % 628) / 100
+    noise = random.Random(f"{seed}:{symbol_hash}:{timeframe}:{index}").gauss(0, 0.01)
+    return base * math.exp(0.3 * math.sin(index / 37 + phase) + 0.1 * math.sin(index / 11 + 2 * phase) + noise)
+
+
+def simulated_ohlcv(symbol: str, timeframe: str = '1m', since: Optional[int] = None, limit: Optional[int] = None,
+                    seed: int = 0) -> List[List[float]]:
+    """
+    Deterministic candles: the same seed, symbol, timeframe and timestamp always give the same candle,
+    whatever window is requested.
+
+    Args:
+        symbol (str): Market symbol, e.g. 'BTC/USDT'.
+        timeframe (str): ccxt timeframe, e.g. '1d'.
+        since (Optional[int]): Timestamp in milliseconds of the first candle, the latest candles by default.
+        limit (Optional[int]): Number of candles, 500 by default, at most 1000.
+        seed (int): Seed of the data.
+
+    Returns:
+        List[List[float]]: [timestamp, open, high, low, close, volume] rows.
+    """
+    step = ccxt.Exchange.parse_timeframe(timeframe) * 1000
+    limit = min(limit or DEFAULT_LIMIT, MAX_LIMIT)
+    last_index = (SIM_NOW - 1) // step
+    first_index = last_index - limit + 1 if since is None else -(-since // step)
+    symbol_hash = zlib.crc32(symbol.encode())
+    candles = []
+    for index in range(first_index, min(first_index + limit, last_index + 1)):
+        rng = random.Random(f"{seed}:{symbol_hash}:{timeframe}:{index}:candle")
+        open_price = _close(seed, symbol_hash, timeframe, index - 1)
+        close_price = _close(seed, symbol_hash, timeframe, index)
+        high = max(open_price, close_price) * (1 + rng.uniform(0, 0.01))
+        low = min(open_price, close_price) * (1 - rng.uniform(0, 0.01))
+        volume = rng.uniform(1_000, 100_000) / math.sqrt(close_price)
+        candles.append([index * step, open_price, high, low, close_price, volume])
+    return candles
+
+
+def _markets() -> Dict[str, Dict[str, Any]]:
+    markets = {}
+    for symbol in SYMBOLS:
+        base, quote = symbol.split('/')
+        markets[symbol] = {"id": base + quote, "symbol": symbol, "base": base, "quote": quote, "settle": None,
+                           "baseId": base, "quoteId": quote, "active": True, "type": "spot", "spot": True,
+                           "margin": False, "swap": False, "future": False, "option": False, "contract": False,
+                           "linear": None, "inverse": None, "precision": {}, "limits": {}, "info": {}}
+    return markets
+
+
+class SimulatedBinance(ccxt.binance):
+    """Offline ccxt.binance: seeded OHLCV, simulated latency and rate limits."""
+    def fetch(self, url: str, method: str = 'GET', headers: Any = None, body: Any = None) -> Any:
+        raise ccxt.NetworkError(f"{self.id} {method} {url}: the exchange simulator doesn't serve this endpoint")
+
+    def load_markets(self, reload: bool = False, params: dict = {}) -> Dict[str, Dict[str, Any]]:
+        if reload or not self.markets:
+            self.markets = _markets()
+            self.symbols = list(self.markets)
+        return self.markets
+
+    def fetch_ohlcv(self, symbol: str, timeframe: str = '1m', since: Optional[int] = None,
+                    limit: Optional[int] = None, params: dict = {}) -> List[list]:
+        if self.enableRateLimit:
+            self.throttle(1)
+        self.lastRestRequestTimestamp = self.milliseconds()
+        time.sleep(SETTINGS.admit(self.id))
+        return simulated_ohlcv(symbol, timeframe, since, limit, SETTINGS.seed)
+
+
+class AsyncSimulatedBinance(ccxt.async_support.binance):
+    """Offline ccxt.async_support.binance, see SimulatedBinance."""
+    async def fetch(self, url: str, method: str = 'GET', headers: Any = None, body: Any = None) -> Any:
+        raise ccxt.NetworkError(f"{self.id} {method} {url}: the exchange simulator doesn't serve this endpoint")
+
+    async def load_markets(self, reload: bool = False, params: dict = {}) -> Dict[str, Dict[str, Any]]:
+        if reload or not self.markets:
+            self.markets = _markets()
+            self.symbols = list(self.markets)
+        return self.markets
+
+    async def fetch_ohlcv(self, symbol: str, timeframe: str = '1m', since: Optional[int] = None,
+                          limit: Optional[int] = None, params: dict = {}) -> List[list]:
+        if self.enableRateLimit:
+            await self.throttle(1)
+        self.lastRestRequestTimestamp = self.milliseconds()
+        await asyncio.sleep(SETTINGS.admit(self.id))
+        return simulated_ohlcv(symbol, timeframe, since, limit, SETTINGS.seed)
+
+
+def install(settings: Optional[SimulationSettings] = None) -> None:
+    """
+    Replace ccxt.binance and ccxt.async_support.binance with the simulated exchanges.
+
+    Args:
+        settings (Optional[SimulationSettings]): Simulator settings, read from the environment by default.
+    """
+    global SETTINGS
+    SETTINGS = settings or SimulationSettings.from_env()
+    ccxt.binance = SimulatedBinance
+    ccxt.async_support.binance = AsyncSimulatedBinance
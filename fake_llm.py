@@ -0,0 +1,245 @@
+"""
+Offline OpenAI-compatible stand-in LLM server.
+
+Serves POST /v1/chat/completions (plain and streaming) on localhost, replays scripted or cached
+responses and injects configurable latency, token rate and rate-limit errors. Used by
+`main.py --model fake` to benchmark the harness without API keys or network.
+
+Run standalone to share one server between several optimizer processes:
+    python3 fake_llm.py --port 8765 --responses ./run/exp0025 --latency 0.5 --token-rate 50
+    FAKE_LLM_URL=http://127.0.0.1:8765/v1 python3 main.py --model fake --model_name fake ...
+"""
+import argparse
+import glob
+import json
+import os
+import re
+import threading
+import time
+import uuid
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Any, Dict, List, Optional
+
+CHARS_PER_TOKEN = 4
+STREAM_FLUSH_INTERVAL = 0.02  # Seconds between SSE writes when the token rate is limited.
+BASE_CODE_PATTERN = re.compile(r"base_code: ```(.*?)```,\s*base_extime:", re.DOTALL)
+
+
+def load_responses(path: str) -> List[str]:
+    """
+    Load scripted responses.
+
+    Args:
+        path (str): A .jsonl file with {"content": "..."} lines, a .json file with a list of strings,
+            or an experiment folder (e.g. ./run/exp0025) whose *_epoch_N.py scripts are replayed in epoch order.
+
+    Returns:
+        List[str]: Responses in replay order.
+    """
+    if os.path.isdir(path):
+        scripts = glob.glob(os.path.join(path, "*_epoch_*.py"))
+        scripts.sort(key=lambda p: int(re.search(r"_epoch_(\d+)\.py$", p).group(1)))
+        responses = []
+        for script in scripts:
+            with open(script, 'r') as file:
+                responses.append(f"```python\n{file.read()}\n```")
+        return responses
+    with open(path, 'r') as file:
+        if path.endswith('.jsonl'):
+            return [json.loads(line)['content'] for line in file if line.strip()]
+        return json.load(file)
+
+
+class FakeLLMServer:
+    """A threaded fake OpenAI chat completions server."""
+    def __init__(self, responses: Optional[List[str]] = None, latency: float = 0.0, token_rate: float = 0.0,
+                 rate_limit_every: int = 0, host: str = "127.0.0.1", port: int = 0) -> None:
+        """
+        Initialize the fake server.
+
+        Args:
+            responses (Optional[List[str]]): Responses replayed in order (cycled). If empty, the base code
+                found in the prompt is echoed back with a marker assignment so that every answer is a new candidate.
+            latency (float): Seconds before the first token.
+            token_rate (float): Generated tokens per second, 0 means unlimited.
+            rate_limit_every (int): Every N-th request gets HTTP 429, 0 disables rate limiting.
+            host (str): Interface to bind.
+            port (int): Port to bind, 0 picks a free one.
+        """
+        self.responses = responses or []
+        self.latency = latency
+        self.token_rate = token_rate
+        self.rate_limit_every = rate_limit_every
+        self.request_count = 0
+        self.completion_count = 0
+        self._lock = threading.Lock()
+        self.httpd = ThreadingHTTPServer((host, port), self._make_handler())
+        self.httpd.daemon_threads = True
+        self._thread: Optional[threading.Thread] = None
+
+    @property
+    def url(self) -> str:
+        """Base URL of the OpenAI-compatible API."""
+        host, port = self.httpd.server_address[:2]
+        return f"http://{host}:{port}/v1"
+
+    def start(self) -> 'FakeLLMServer':
+        """Serve requests in a background thread."""
+        self._thread = threading.Thread(target=self.httpd.serve_forever, daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self) -> None:
+        """Stop the server."""
+        self.httpd.shutdown()
+        self.httpd.server_close()
+
+    def next_response(self, messages: List[Dict[str, Any]]) -> Optional[str]:
+        """
+        Pick the response for a request, or None if the request is rate limited.
+
+        Args:
+            messages (List[Dict[str, Any]]): Chat messages of the request.
+
+        Returns:
+            Optional[str]: The response content.
+        """
+        with self._lock:
+            self.request_count += 1
+            if self.rate_limit_every and self.request_count % self.rate_limit_every == 0:
+                return None
+            number = self.completion_count
+            self.completion_count += 1
+        if self.responses:
+            return self.responses[number % len(self.responses)]
+        user_messages = [message for message in messages if message.get('role') == 'user']
+        prompt_text = str(user_messages[-1].get('content', '')) if user_messages else ''
+        match = BASE_CODE_PATTERN.search(prompt_text)
+        code = match.group(1) if match else 'print("fake")'
+        return f"```python\n{code.rstrip()}\n_fake_completion = {number}\n```"
+
+    def _make_handler(self) -> type:
+        server = self
+
+        class Handler(BaseHTTPRequestHandler):
+            protocol_version = "HTTP/1.1"
+
+            def log_message(self, format: str, *args: Any) -> None:
+                pass
+
+            def _send_json(self, status: int, payload: Dict[str, Any], headers: Optional[Dict[str, str]] = None) -> None:
+                body = json.dumps(payload).encode()
+                self.send_response(status)
+                self.send_header("Content-Type", "application/json")
+                self.send_header("Content-Length", str(len(body)))
+                for name, value in (headers or {}).items():
+                    self.send_header(name, value)
+                self.end_headers()
+                self.wfile.write(body)
+
+            def _write_chunk(self, data: bytes) -> None:
+                self.wfile.write(f"{len(data):x}\r\n".encode() + data + b"\r\n")
+                self.wfile.flush()
+
+            def do_GET(self) -> None:
+                if self.path.rstrip('/') == "/v1/models":
+                    self._send_json(200, {"object": "list", "data": [{"id": "fake", "object": "model"}]})
+                else:
+                    self._send_json(404, {"error": {"message": "Not found"}})
+
+            def do_POST(self) -> None:
+                length = int(self.headers.get("Content-Length", 0))
+                request = json.loads(self.rfile.read(length) or b"{}")
+                if self.path.rstrip('/') != "/v1/chat/completions":
+                    self._send_json(404, {"error": {"message": "Not found"}})
+                    return
+                messages = request.get("messages", [])
+                content = server.next_response(messages)
+                if content is None:
+                    self._send_json(429, {"error": {"message": "Rate limit reached", "type": "requests",
+                                                    "code": "rate_limit_exceeded"}},
+                                    headers={"retry-after-ms": "100"})
+                    return
+                time.sleep(server.latency)
+                prompt_tokens = sum(len(str(message.get('content', ''))) for message in messages) // CHARS_PER_TOKEN
+                completion_tokens = len(content) // CHARS_PER_TOKEN
+                usage = {"prompt_tokens": prompt_tokens, "completion_tokens": completion_tokens,
+                         "total_tokens": prompt_tokens + completion_tokens}
+                completion_id = f"chatcmpl-{uuid.uuid4().hex}"
+                model = request.get("model", "fake")
+                if request.get("stream"):
+                    self._stream(completion_id, model, content, usage,
+                                 (request.get("stream_options") or {}).get("include_usage", False))
+                    return
+                if server.token_rate:
+                    time.sleep(completion_tokens / server.token_rate)
+                self._send_json(200, {
+                    "id": completion_id, "object": "chat.completion", "created": int(time.time()), "model": model,
+                    "choices": [{"index": 0, "message": {"role": "assistant", "content": content},
+                                 "finish_reason": "stop"}],
+                    "usage": usage,
+                })
+
+            def _stream(self, completion_id: str, model: str, content: str, usage: Dict[str, int],
+                        include_usage: bool) -> None:
+                self.send_response(200)
+                self.send_header("Content-Type", "text/event-stream")
+                self.send_header("Transfer-Encoding", "chunked")
+                self.end_headers()
+
+                def event(delta: Dict[str, Any], finish_reason: Optional[str] = None,
+                          chunk_usage: Optional[Dict[str, int]] = None) -> bytes:
+                    choices = [] if chunk_usage else [{"index": 0, "delta": delta, "finish_reason": finish_reason}]
+                    payload = {"id": completion_id, "object": "chat.completion.chunk", "created": int(time.time()),
+                               "model": model, "choices": choices}
+                    if chunk_usage:
+                        payload["usage"] = chunk_usage
+                    return f"data: {json.dumps(payload)}\n\n".encode()
+
+                tokens_per_write = max(1, int(server.token_rate * STREAM_FLUSH_INTERVAL)) if server.token_rate else 16
+                step = tokens_per_write * CHARS_PER_TOKEN
+                try:
+                    self._write_chunk(event({"role": "assistant", "content": ""}))
+                    for start in range(0, len(content), step):
+                        self._write_chunk(event({"content": content[start:start + step]}))
+                        if server.token_rate:
+                            time.sleep(tokens_per_write / server.token_rate)
+                    self._write_chunk(event({}, finish_reason="stop"))
+                    if include_usage:
+                        self._write_chunk(event({}, chunk_usage=usage))
+                    self._write_chunk(b"data: [DONE]\n\n")
+                    self._write_chunk(b"")
+                except (BrokenPipeError, ConnectionResetError):
+                    # The client aborted the stream, e.g. after the code block was complete.
+                    self.close_connection = True
+
+        return Handler
+
+
+def main() -> None:
+    """Run the fake server in the foreground."""
+    parser = argparse.ArgumentParser(description='Offline OpenAI-compatible fake LLM server.')
+    parser.add_argument('--host', default='127.0.0.1', help='Interface to bind')
+    parser.add_argument('--port', type=int, default=8765, help='Port to bind')
+    parser.add_argument('--responses', help='Scripted responses: .jsonl/.json file or experiment folder to replay')
+    parser.add_argument('--latency', type=float, default=0.0, help='Seconds before the first token')
+    parser.add_argument('--token-rate', type=float, default=0.0, help='Generated tokens per second, 0 is unlimited')
+    parser.add_argument('--rate-limit-every', type=int, default=0, help='Every N-th request gets HTTP 429')
+    args = parser.parse_args()
+    server = FakeLLMServer(
+        responses=load_responses(args.responses) if args.responses else None,
+        latency=args.latency,
+        token_rate=args.token_rate,
+        rate_limit_every=args.rate_limit_every,
+        host=args.host,
+        port=args.port
+    )
+    print(f"Fake LLM server is listening on {server.url}")
+    try:
+        server.httpd.serve_forever()
+    except KeyboardInterrupt:
+        server.stop()
+
+
+if __name__ == "__main__":
+    main()
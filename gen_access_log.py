@@ -0,0 +1,99 @@
+"""
+Deterministic access log generator for script.py.
+
+Writes Combined Log Format lines with realistic method, status, path and user-agent distributions.
+The same seed and size always produce the same file, so benchmarks are reproducible:
+    python3 gen_access_log.py --output ./data/access.log --size 100MB --seed 42
+"""
+import argparse
+import itertools
+import random
+from datetime import datetime, timedelta, timezone
+
+METHODS = {"GET": 80.0, "POST": 12.0, "HEAD": 3.0, "PUT": 2.0, "DELETE": 1.5, "OPTIONS": 1.0, "PATCH": 0.5}
+STATUSES = {200: 82.0, 304: 6.0, 301: 2.0, 302: 2.0, 404: 5.0, 403: 1.0, 500: 1.5, 503: 0.5}
+PATHS = {"/": 10.0, "/index.html": 8.0, "/api/v1/items": 15.0, "/api/v1/items/{id}": 20.0, "/api/v1/users/{id}": 8.0,
+         "/login": 4.0, "/search?q={id}": 10.0, "/static/app.{id}.js": 12.0, "/static/style.css": 9.0,
+         "/images/{id}.png": 4.0}
+USER_AGENTS = {
+    "Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/119.0.0.0 Safari/537.36": 38.0,
+    "Mozilla/5.0 (Macintosh; Intel Mac OS X 10_15_7) AppleWebKit/605.1.15 (KHTML, like Gecko) Version/17.1 Safari/605.1.15": 14.0,
+    "Mozilla/5.0 (iPhone; CPU iPhone OS 17_1 like Mac OS X) AppleWebKit/605.1.15 (KHTML, like Gecko) Version/17.1 Mobile/15E148 Safari/604.1": 16.0,
+    "Mozilla/5.0 (Linux; Android 14; Pixel 8) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/119.0.0.0 Mobile Safari/537.36": 12.0,
+    "Mozilla/5.0 (X11; Linux x86_64; rv:120.0) Gecko/20100101 Firefox/120.0": 7.0,
+    "Googlebot/2.1 (+http://www.google.com/bot.html)": 5.0,
+    "curl/8.4.0": 4.0,
+    "python-requests/2.31.0": 4.0,
+}
+REFERERS = {"-": 85.0, "https://www.google.com/": 9.0, "https://example.com/": 6.0}
+# Seconds between two lines, about five requests per second.
+LINE_GAPS = {0: 80.0, 1: 20.0}
+LINES_PER_BLOCK = 10_000
+# Requests are built from this many pre-rendered variants, it keeps generation at disk speed.
+VARIANTS = 50_000
+START_TIME = datetime(2024, 11, 1, tzinfo=timezone.utc)
+
+
+def _weighted(rng: random.Random, table: dict, k: int) -> list:
+    """Draw k values of a {value: weight} table."""
+    return rng.choices(list(table), weights=list(table.values()), k=k)
+
+
+def generate_access_log(path: str, size: int, seed: int = 0) -> int:
+    """
+    Write an access log of about size bytes.
+
+    Args:
+        path (str): Output file.
+        size (int): Target size in bytes, the file ends with the first complete line past it.
+        seed (int): Seed of the random generator.
+
+    Returns:
+        int: Number of written lines.
+    """
+    rng = random.Random(seed)
+    ips = [f"{rng.randint(1, 223)}.{rng.randint(0, 255)}.{rng.randint(0, 255)}.{rng.randint(1, 254)}"
+           for _ in range(5_000)]
+    requests = []
+    for method, path_template, status, agent, referer in zip(
+            _weighted(rng, METHODS, VARIANTS), _weighted(rng, PATHS, VARIANTS), _weighted(rng, STATUSES, VARIANTS),
+            _weighted(rng, USER_AGENTS, VARIANTS), _weighted(rng, REFERERS, VARIANTS)):
+        request_path = path_template.format(id=rng.randint(1, 99_999))
+        response_size = 0 if status == 304 else rng.randint(200, 60_000)
+        requests.append(f'"{method} {request_path} HTTP/1.1" {status} {response_size} "{referer}" "{agent}"\n')
+    written = 0
+    lines = 0
+    elapsed = 0
+    with open(path, 'w') as file:
+        while written < size:
+            # Seconds since START_TIME of every line, each distinct second is formatted once.
+            seconds = list(itertools.accumulate(_weighted(rng, LINE_GAPS, LINES_PER_BLOCK), initial=elapsed))
+            elapsed = seconds.pop()
+            stamps = {second: (START_TIME + timedelta(seconds=second)).strftime('%d/%b/%Y:%H:%M:%S +0000')
+                      for second in range(seconds[0], elapsed + 1)}
+            block = ''.join(f"{ip} - - [{stamps[second]}] {request}" for ip, request, second in
+                            zip(rng.choices(ips, k=LINES_PER_BLOCK), rng.choices(requests, k=LINES_PER_BLOCK),
+                                seconds))
+            if written + len(block) > size:
+                # Cut the last block at the first line end past the target size.
+                block = block[:block.index('\n', max(0, size - written - 1)) + 1]
+            file.write(block)
+            written += len(block)
+            lines += block.count('\n')
+    return lines
+
+
+def main() -> None:
+    """Generate an access log from the command line."""
+    from bench_datasets import parse_size
+    parser = argparse.ArgumentParser(description='Deterministic Combined Log Format generator.')
+    parser.add_argument('--output', default='./data/access.log', help='Output file')
+    parser.add_argument('--size', default='100MB', help='Target size, e.g. 500KB, 100MB, 50GB')
+    parser.add_argument('--seed', type=int, default=0, help='Seed of the random generator')
+    args = parser.parse_args()
+    lines = generate_access_log(args.output, parse_size(args.size), args.seed)
+    print(f"Wrote {lines} lines to {args.output}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,17 @@
+"""
+Start-up hook of the candidates, on their PYTHONPATH when the exchange simulator, HTTP replay or port remapping
+is enabled (see main.py harness_env()).
+"""
+import os
+
+if os.environ.get("OPTIMIZER_EXCHANGE_SIM"):
+    import exchange_sim
+    exchange_sim.install()
+
+if os.environ.get("OPTIMIZER_HTTP_MODE"):
+    import http_replay
+    http_replay.install()
+
+if os.environ.get("OPTIMIZER_PORT_MAP"):
+    import sandbox
+    sandbox.install_port_map(sandbox.parse_port_map(os.environ["OPTIMIZER_PORT_MAP"]))
@@ -0,0 +1,85 @@
+import importlib.util
+import threading
+from typing import Any, Optional
+
+HTTP_POOL_SETTINGS = {
+    "max_connections": 100,
+    "max_keepalive_connections": 20,
+    "keepalive_expiry": 60.0,
+    "http2": True,
+}
+
+_lock = threading.Lock()
+# httpx is imported with the first client, configuring the pool costs nothing when no hosted backend is used.
+_client: Optional[Any] = None
+_async_client: Optional[Any] = None
+
+
+def configure_http_pool(max_connections: int = 100, max_keepalive_connections: int = 20,
+                        keepalive_expiry: float = 60.0, http2: bool = True) -> None:
+    """
+    Set the limits of the shared connection pool. Must be called before the first client is created.
+
+    Args:
+        max_connections (int): Maximum number of concurrent connections.
+        max_keepalive_connections (int): Maximum number of idle connections kept alive.
+        keepalive_expiry (float): Seconds an idle connection is kept alive.
+        http2 (bool): Negotiate HTTP/2 with the hosts that support it, falls back to HTTP/1.1 without h2.
+    """
+    with _lock:
+        if _client is not None or _async_client is not None:
+            raise RuntimeError("The shared HTTP pool is already in use, configure it before creating LLM backends")
+        HTTP_POOL_SETTINGS.update(
+            max_connections=max_connections,
+            max_keepalive_connections=max_keepalive_connections,
+            keepalive_expiry=keepalive_expiry,
+            http2=http2
+        )
+
+
+def _limits() -> Any:
+    """Build the pool limits (httpx.Limits) from HTTP_POOL_SETTINGS."""
+    import httpx
+    return httpx.Limits(
+        max_connections=HTTP_POOL_SETTINGS["max_connections"],
+        max_keepalive_connections=HTTP_POOL_SETTINGS["max_keepalive_connections"],
+        keepalive_expiry=HTTP_POOL_SETTINGS["keepalive_expiry"]
+    )
+
+
+def _http2() -> bool:
+    """HTTP/2 setting of the clients, off with a warning when h2 (httpx[http2]) isn't installed."""
+    if HTTP_POOL_SETTINGS["http2"] and importlib.util.find_spec('h2') is None:
+        print("Warning: HTTP/2 requires the h2 package (pip install httpx[http2]), the shared pool uses HTTP/1.1")
+        HTTP_POOL_SETTINGS["http2"] = False
+    return HTTP_POOL_SETTINGS["http2"]
+
+
+def get_http_client() -> Any:
+    """
+    Get the process wide HTTP client shared by all hosted LLM backends.
+
+    Returns:
+        httpx.Client: The pooled client.
+    """
+    global _client
+    with _lock:
+        if _client is None:
+            import httpx
+            _client = httpx.Client(http2=_http2(), limits=_limits(), timeout=None)
+        return _client
+
+
+def get_async_http_client() -> Any:
+    """
+    Get the process wide async HTTP client. Its connections belong to the event loop that uses them first.
+
+    Returns:
+        httpx.AsyncClient: The pooled async client.
+    """
+    global _async_client
+    with _lock:
+        if _async_client is None:
+            import httpx
+            _async_client = httpx.AsyncClient(http2=_http2(), limits=_limits(), timeout=None)
+        return _async_client
@@ -0,0 +1,323 @@
+"""
+HTTP record/replay for network-bound candidates.
+
+In record mode the HTTP calls of a script made with requests, httpx or aiohttp go to the network as
+usual and their responses are appended to a JSON cassette when the process exits. In replay mode the
+same calls are answered from the cassette after the recorded (or a configured) latency, and calls
+that were never recorded fail like a connection error. The clients are patched when they are
+imported, so scripts that don't use them pay nothing. The optimizer records the base run and replays
+it to every candidate through harness_site/sitecustomize.py when it runs with --http-replay:
+
+    OPTIMIZER_HTTP_MODE=record|replay
+    OPTIMIZER_HTTP_CASSETTE=./run/cassettes/script_ohlcv.json
+    OPTIMIZER_REPLAY_LATENCY=0.05     seconds per replayed response, the recorded latency if unset
+"""
+import asyncio
+import atexit
+import base64
+import fcntl
+import hashlib
+import importlib.abc
+import json
+import os
+import sys
+import threading
+import time
+from datetime import timedelta
+from typing import Any, Dict, List, Optional, Tuple
+
+# Response headers that describe the transfer, not the (already decoded) recorded body.
+TRANSFER_HEADERS = ('content-encoding', 'content-length', 'transfer-encoding', 'connection')
+
+
+class ReplayMiss(Exception):
+    """A request that isn't in the cassette."""
+
+
+def body_digest(body: Any) -> str:
+    """SHA-1 of a request body, the empty string for requests without one."""
+    if body is None or body == b'' or body == '':
+        return ''
+    if isinstance(body, str):
+        body = body.encode()
+    elif not isinstance(body, (bytes, bytearray)):
+        body = json.dumps(body, sort_keys=True, default=str).encode()
+    return hashlib.sha1(body).hexdigest()
+
+
+class Cassette:
+    """Recorded interactions of a JSON cassette, served in order per (method, url, body)."""
+    def __init__(self, path: str, mode: str, latency: Optional[float] = None) -> None:
+        """
+        Initialize the cassette.
+
+        Args:
+            path (str): Cassette file.
+            mode (str): 'record' or 'replay'.
+            latency (Optional[float]): Seconds per replayed response, the recorded latency if None.
+        """
+        self.path = path
+        self.mode = mode
+        self.latency = latency
+        self.lock = threading.Lock()
+        self.recorded: List[Dict[str, Any]] = []
+        self.replies: Dict[Tuple[str, str, str], List[Dict[str, Any]]] = {}
+        self.served: Dict[Tuple[str, str, str], int] = {}
+        if mode == 'replay':
+            with open(path, 'r') as file:
+                for interaction in json.load(file)["interactions"]:
+                    key = (interaction["method"], interaction["url"], interaction["body_sha1"])
+                    self.replies.setdefault(key, []).append(interaction)
+
+    def record(self, method: str, url: str, body: Any, status: int, reason: str, headers: Dict[str, str],
+               content: bytes, elapsed: float) -> None:
+        """Keep an interaction, written to the cassette by save()."""
+        with self.lock:
+            self.recorded.append({
+                "method": method.upper(), "url": url, "body_sha1": body_digest(body), "status": status,
+                "reason": reason or '', "elapsed": elapsed, "body": base64.b64encode(content).decode('ascii'),
+                "headers": {name: value for name, value in headers.items() if name.lower() not in TRANSFER_HEADERS},
+            })
+
+    def reply(self, method: str, url: str, body: Any) -> Dict[str, Any]:
+        """
+        Find the response to a request: repeated requests get the recorded responses in order, the last one
+        once they are exhausted.
+
+        Returns:
+            Dict[str, Any]: The interaction with "content" (bytes) and "delay" (seconds).
+        """
+        key = (method.upper(), url, body_digest(body))
+        with self.lock:
+            replies = self.replies.get(key)
+            if not replies:
+                raise ReplayMiss(f"{method.upper()} {url} isn't in the HTTP cassette {self.path}")
+            index = self.served.get(key, 0)
+            self.served[key] = index + 1
+        interaction = replies[min(index, len(replies) - 1)]
+        delay = interaction["elapsed"] if self.latency is None else self.latency
+        return {**interaction, "content": base64.b64decode(interaction["body"]), "delay": delay}
+
+    def save(self) -> None:
+        """Append the recorded interactions to the cassette; processes of the same run (e.g. a pool) share it."""
+        if not self.recorded:
+            return
+        os.makedirs(os.path.dirname(os.path.abspath(self.path)), exist_ok=True)
+        with open(self.path, 'a+') as file:
+            fcntl.flock(file, fcntl.LOCK_EX)
+            file.seek(0)
+            content = file.read()
+            interactions = json.loads(content)["interactions"] if content else []
+            file.seek(0)
+            file.truncate()
+            json.dump({"interactions": interactions + self.recorded}, file, indent=1)
+
+
+CASSETTE: Optional[Cassette] = None
+
+
+def _reason(status: int) -> str:
+    from http import HTTPStatus
+    try:
+        return HTTPStatus(status).phrase
+    except ValueError:
+        return ''
+
+
+def _patch_requests(module: Any) -> None:
+    """Patch requests.Session.send."""
+    from requests.exceptions import ConnectionError as RequestsConnectionError
+    from requests.models import Response
+    from requests.structures import CaseInsensitiveDict
+    from requests.utils import get_encoding_from_headers
+    original_send = module.Session.send
+
+    def send(self: Any, request: Any, **kwargs: Any) -> Any:
+        if CASSETTE.mode == 'record':
+            start = time.perf_counter()
+            response = original_send(self, request, **kwargs)
+            content = response.content
+            CASSETTE.record(request.method, request.url, request.body, response.status_code, response.reason,
+                            dict(response.headers), content, time.perf_counter() - start)
+            return response
+        try:
+            interaction = CASSETTE.reply(request.method, request.url, request.body)
+        except ReplayMiss as e:
+            raise RequestsConnectionError(str(e), request=request)
+        time.sleep(interaction["delay"])
+        response = Response()
+        response.status_code = interaction["status"]
+        response.reason = interaction["reason"] or _reason(interaction["status"])
+        response.headers = CaseInsensitiveDict(interaction["headers"])
+        response.encoding = get_encoding_from_headers(response.headers)
+        response._content = interaction["content"]
+        response.url = request.url
+        response.request = request
+        response.elapsed = timedelta(seconds=interaction["delay"])
+        return response
+
+    module.Session.send = send
+
+
+def _patch_httpx(module: Any) -> None:
+    """Patch httpx.Client.send and httpx.AsyncClient.send."""
+    import httpx
+    original_send = module.Client.send
+    original_async_send = module.AsyncClient.send
+
+    def replayed(request: Any) -> Tuple[Any, float]:
+        try:
+            interaction = CASSETTE.reply(request.method, str(request.url), request.content)
+        except ReplayMiss as e:
+            raise httpx.ConnectError(str(e), request=request)
+        response = httpx.Response(interaction["status"], headers=interaction["headers"],
+                                  content=interaction["content"], request=request)
+        return response, interaction["delay"]
+
+    def send(self: Any, request: Any, **kwargs: Any) -> Any:
+        if CASSETTE.mode == 'record':
+            start = time.perf_counter()
+            response = original_send(self, request, **kwargs)
+            CASSETTE.record(request.method, str(request.url), request.content, response.status_code,
+                            response.reason_phrase, dict(response.headers), response.read(),
+                            time.perf_counter() - start)
+            return response
+        response, delay = replayed(request)
+        time.sleep(delay)
+        return response
+
+    async def async_send(self: Any, request: Any, **kwargs: Any) -> Any:
+        if CASSETTE.mode == 'record':
+            start = time.perf_counter()
+            response = await original_async_send(self, request, **kwargs)
+            CASSETTE.record(request.method, str(request.url), request.content, response.status_code,
+                            response.reason_phrase, dict(response.headers), await response.aread(),
+                            time.perf_counter() - start)
+            return response
+        response, delay = replayed(request)
+        await asyncio.sleep(delay)
+        return response
+
+    module.Client.send = send
+    module.AsyncClient.send = async_send
+
+
+class ReplayedAiohttpResponse:
+    """The parts of aiohttp.ClientResponse that clients read, backed by a recorded interaction."""
+    def __init__(self, method: str, url: Any, interaction: Dict[str, Any]) -> None:
+        from multidict import CIMultiDict, CIMultiDictProxy
+        self.method = method
+        self.url = url
+        self.status = interaction["status"]
+        self.reason = interaction["reason"] or _reason(self.status)
+        self.headers = CIMultiDictProxy(CIMultiDict(interaction["headers"]))
+        self._body = interaction["content"]
+        self.ok = self.status < 400
+        self.closed = True
+
+    async def read(self) -> bytes:
+        return self._body
+
+    async def text(self, encoding: Optional[str] = None, errors: str = 'strict') -> str:
+        return self._body.decode(encoding or 'utf-8', errors)
+
+    async def json(self, *, loads: Any = json.loads, **kwargs: Any) -> Any:
+        return loads(self._body.decode('utf-8'))
+
+    def raise_for_status(self) -> None:
+        if not self.ok:
+            import aiohttp
+            raise aiohttp.ClientResponseError(None, (), status=self.status, message=self.reason, headers=self.headers)
+
+    def release(self) -> None:
+        pass
+
+    def close(self) -> None:
+        pass
+
+    async def wait_for_close(self) -> None:
+        pass
+
+    async def __aenter__(self) -> 'ReplayedAiohttpResponse':
+        return self
+
+    async def __aexit__(self, *exc_info: Any) -> None:
+        pass
+
+
+def _patch_aiohttp(module: Any) -> None:
+    """Patch aiohttp.ClientSession._request (behind request(), get(), post(), ...)."""
+    import aiohttp
+    from yarl import URL
+    original_request = module.ClientSession._request
+
+    async def _request(self: Any, method: str, str_or_url: Any, **kwargs: Any) -> Any:
+        url = URL(str_or_url)
+        if kwargs.get('params'):
+            url = url.update_query(kwargs['params'])
+        body = kwargs.get('data') if kwargs.get('json') is None else kwargs['json']
+        if CASSETTE.mode == 'record':
+            start = time.perf_counter()
+            response = await original_request(self, method, str_or_url, **kwargs)
+            CASSETTE.record(method, str(url), body, response.status, response.reason, dict(response.headers),
+                            await response.read(), time.perf_counter() - start)
+            return response
+        try:
+            interaction = CASSETTE.reply(method, str(url), body)
+        except ReplayMiss as e:
+            raise aiohttp.ClientConnectionError(str(e))
+        await asyncio.sleep(interaction["delay"])
+        return ReplayedAiohttpResponse(method, url, interaction)
+
+    module.ClientSession._request = _request
+
+
+# module -> patch; the modules are patched right after they are executed.
+PATCHES = {"requests.sessions": _patch_requests, "httpx._client": _patch_httpx, "aiohttp.client": _patch_aiohttp}
+
+
+class PatchOnImport(importlib.abc.MetaPathFinder):
+    """Import hook applying PATCHES when the client modules are loaded."""
+    def find_spec(self, fullname: str, path: Any, target: Any = None) -> Any:
+        if fullname not in PATCHES:
+            return None
+        for finder in sys.meta_path:
+            if finder is self or not hasattr(finder, 'find_spec'):
+                continue
+            spec = finder.find_spec(fullname, path, target)
+            if spec is not None and spec.loader is not None:
+                exec_module = spec.loader.exec_module
+
+                def patched_exec_module(module: Any) -> None:
+                    exec_module(module)
+                    PATCHES[fullname](module)
+
+                spec.loader.exec_module = patched_exec_module
+                return spec
+        return None
+
+
+def install(mode: Optional[str] = None, path: Optional[str] = None, latency: Optional[float] = None) -> None:
+    """
+    Record or replay the HTTP calls of this process.
+
+    Args:
+        mode (Optional[str]): 'record' or 'replay', OPTIMIZER_HTTP_MODE by default.
+        path (Optional[str]): Cassette file, OPTIMIZER_HTTP_CASSETTE by default.
+        latency (Optional[float]): Seconds per replayed response, OPTIMIZER_REPLAY_LATENCY or the recorded
+            latency by default.
+    """
+    global CASSETTE
+    mode = mode or os.environ["OPTIMIZER_HTTP_MODE"]
+    path = path or os.environ["OPTIMIZER_HTTP_CASSETTE"]
+    if latency is None and os.environ.get("OPTIMIZER_REPLAY_LATENCY"):
+        latency = float(os.environ["OPTIMIZER_REPLAY_LATENCY"])
+    if mode not in ('record', 'replay'):
+        raise ValueError(f"Unknown HTTP replay mode '{mode}', expected record or replay")
+    CASSETTE = Cassette(path, mode, latency)
+    if mode == 'record':
+        atexit.register(CASSETTE.save)
+    for name, patch in PATCHES.items():
+        if name in sys.modules:
+            patch(sys.modules[name])
+    sys.meta_path.insert(0, PatchOnImport())
@@ -0,0 +1,209 @@
+"""
+HTTP load benchmark for FastAPI/ASGI targets.
+
+The candidate is stripped of its example code (server thread, sleeps, client requests, see
+script_module.py), its app is served by uvicorn in a subprocess, and an async load generator drives
+it with payloads produced by a generator function of the base script (e.g. generate_nested_json).
+"""
+import ast
+import asyncio
+import json
+import os
+import shutil
+import socket
+import subprocess
+import sys
+import tempfile
+import time
+from typing import Any, Dict, List, Optional, Tuple
+
+import httpx
+
+from readiness import HARNESS_DIR, wait_for_server
+from script_module import extract_module, find_assigned_call
+
+# Top-level calls of the script itself (server start, waits, client requests), not of the app.
+HTTP_METHODS = ('get', 'post', 'put', 'patch', 'delete', 'head', 'options', 'request')
+SIDE_EFFECT_CALLS = ('uvicorn.run', 'time.sleep', 'sleep', 'asyncio.sleep', 'asyncio.run', 'wait_for_server',
+                     'readiness.wait_for_server') + tuple(
+    f"{client}.{method}" for client in ('requests', 'httpx') for method in HTTP_METHODS)
+SERVER_START_TIMEOUT = 30.0
+# Seconds a single request may take, a candidate that stops answering fails the benchmark instead of hanging it.
+REQUEST_TIMEOUT = 30.0
+
+
+def extract_app_module(code: str) -> Tuple[str, str]:
+    """
+    Strip a script to the statements that define its ASGI app, see script_module.py.
+
+    Args:
+        code (str): The script.
+
+    Returns:
+        Tuple[str, str]: The module code and the name of the app variable (the first `X = FastAPI(...)`, 'app' by default).
+    """
+    tree = extract_module(code, SIDE_EFFECT_CALLS)
+    return ast.unparse(tree), find_assigned_call(tree, ('FastAPI', 'Starlette')) or 'app'
+
+
+def load_payloads(script_path: str, function_name: str, sizes: List[Tuple[int, ...]]) -> List[bytes]:
+    """
+    Build the request bodies with a payload generator function of a script.
+
+    Args:
+        script_path (str): Script defining the generator, e.g. script_fapi.py.
+        function_name (str): Generator function, e.g. 'generate_nested_json'.
+        sizes (List[Tuple[int, ...]]): Positional arguments of the generator, one payload per tuple.
+
+    Returns:
+        List[bytes]: JSON encoded payloads.
+    """
+    with open(script_path, 'r') as file:
+        module_code, _ = extract_app_module(file.read())
+    namespace: Dict[str, Any] = {"__name__": "loadbench_payloads"}
+    exec(compile(module_code, script_path, 'exec'), namespace)
+    if function_name not in namespace:
+        raise ValueError(f"{script_path} doesn't define the payload generator {function_name}()")
+    return [json.dumps(namespace[function_name](*size)).encode() for size in sizes]
+
+
+def free_port() -> int:
+    """Pick a free local TCP port."""
+    with socket.socket(socket.AF_INET, socket.SOCK_STREAM) as sock:
+        sock.bind(('127.0.0.1', 0))
+        return sock.getsockname()[1]
+
+
+def percentile(values: List[float], fraction: float) -> float:
+    """Nearest-rank percentile of sorted values."""
+    if not values:
+        return 0.0
+    return values[min(len(values) - 1, max(0, int(round(fraction * len(values))) - 1))]
+
+
+async def drive_load(url: str, payloads: List[bytes], requests_count: int, concurrency: int,
+                     request_timeout: float = REQUEST_TIMEOUT) -> Dict[str, Any]:
+    """
+    Send requests_count POST requests from concurrency workers, payloads are used round robin.
+
+    Args:
+        url (str): Endpoint URL.
+        payloads (List[bytes]): JSON request bodies.
+        requests_count (int): Number of timed requests.
+        concurrency (int): Number of concurrent workers.
+        request_timeout (float): Seconds per request, a timed out request counts as an error.
+
+    Returns:
+        Dict[str, Any]: "responses" (one per payload, from the warmup), "latencies" (sorted, seconds),
+            "errors" and "duration" (seconds).
+    """
+    headers = {"Content-Type": "application/json"}
+    limits = httpx.Limits(max_connections=concurrency, max_keepalive_connections=concurrency)
+    async with httpx.AsyncClient(limits=limits, timeout=request_timeout) as client:
+        responses = []
+        for payload in payloads:
+            response = await client.post(url, content=payload, headers=headers)
+            responses.append((response.status_code, response.text))
+        latencies: List[float] = []
+        errors = 0
+        next_request = 0
+
+        async def worker() -> None:
+            nonlocal next_request, errors
+            while next_request < requests_count:
+                payload = payloads[next_request % len(payloads)]
+                next_request += 1
+                start = time.perf_counter()
+                try:
+                    response = await client.post(url, content=payload, headers=headers)
+                    if response.status_code >= 400:
+                        errors += 1
+                except httpx.HTTPError:
+                    errors += 1
+                latencies.append(time.perf_counter() - start)
+
+        start = time.perf_counter()
+        await asyncio.gather(*(worker() for _ in range(concurrency)))
+        duration = time.perf_counter() - start
+    return {"responses": responses, "latencies": sorted(latencies), "errors": errors, "duration": duration}
+
+
+def run_http_benchmark(program_path: str, payloads: List[bytes], path: str = '/process/', requests_count: int = 500,
+                       concurrency: int = 16, timeout: Optional[float] = None,
+                       cwd: Optional[str] = None,
+                       env: Optional[Dict[str, str]] = None) -> Tuple[str, str, Dict[str, float], bool]:
+    """
+    Serve the app of a script with uvicorn and measure it under load.
+
+    Args:
+        program_path (str): Path to the script.
+        payloads (List[bytes]): JSON request bodies, see load_payloads().
+        path (str): Endpoint path.
+        requests_count (int): Number of timed requests.
+        concurrency (int): Number of concurrent clients.
+        timeout (Optional[float]): Seconds after which the benchmark is aborted and reported as failed.
+        cwd (Optional[str]): Working directory of the server.
+        env (Optional[Dict[str, str]]): Environment of the server, the process environment by default.
+
+    Returns:
+        Tuple[str, str, Dict[str, float], bool]: Output (the response of every payload, compared with the reference),
+            error message, statistics ("rps", "p50", "p95", "p99" in seconds, "errors") and error status.
+    """
+    with open(program_path, 'r') as file:
+        try:
+            module_code, app_name = extract_app_module(file.read())
+        except SyntaxError as e:
+            return '', f"Syntax error: {e}", {}, True
+    module_dir = tempfile.mkdtemp(prefix='loadbench_')
+    module_name = f"{os.path.splitext(os.path.basename(program_path))[0]}_app"
+    with open(os.path.join(module_dir, f"{module_name}.py"), 'w') as file:
+        file.write(module_code)
+    # The stripped module lives in a temporary folder, keep the modules next to the script and the harness
+    # helpers (readiness.py) importable.
+    env = dict(os.environ if env is None else env)
+    env["PYTHONPATH"] = os.pathsep.join(filter(None, [os.path.dirname(os.path.abspath(program_path)), HARNESS_DIR,
+                                                      env.get("PYTHONPATH")]))
+    port = free_port()
+    # The server log goes to a file: a failing endpoint logs a traceback per request, a pipe nobody reads
+    # during the load would fill up and block the server.
+    log_path = os.path.join(module_dir, 'server.log')
+    with open(log_path, 'w') as log_file:
+        process = subprocess.Popen(
+            [sys.executable, '-m', 'uvicorn', f"{module_name}:{app_name}", '--app-dir', module_dir,
+             '--host', '127.0.0.1', '--port', str(port), '--log-level', 'warning'],
+            stdout=subprocess.DEVNULL, stderr=log_file, cwd=cwd, env=env
+        )
+    try:
+        if not wait_for_server('127.0.0.1', port, timeout=SERVER_START_TIMEOUT, alive=lambda: process.poll() is None):
+            process.kill()
+            process.wait()
+            with open(log_path, 'r', errors='replace') as log_file:
+                return '', f"The server didn't start: {log_file.read()}", {}, True
+        try:
+            stats = asyncio.run(asyncio.wait_for(
+                drive_load(f"http://127.0.0.1:{port}{path}", payloads, requests_count, concurrency), timeout
+            ))
+        except asyncio.TimeoutError:
+            return '', f"Timeout: the load benchmark was aborted after {timeout} seconds", {}, True
+        except httpx.HTTPError as e:
+            return '', f"Request error: {e!r}", {}, True
+    finally:
+        if process.poll() is None:
+            process.terminate()
+            try:
+                process.wait(timeout=5)
+            except subprocess.TimeoutExpired:
+                process.kill()
+        shutil.rmtree(module_dir, ignore_errors=True)
+    output = '\n'.join(f"payload {index}: {status} {body}" for index, (status, body) in enumerate(stats["responses"]))
+    latencies = stats["latencies"]
+    result = {
+        "rps": len(latencies) / stats["duration"] if stats["duration"] else 0.0,
+        "p50": percentile(latencies, 0.50),
+        "p95": percentile(latencies, 0.95),
+        "p99": percentile(latencies, 0.99),
+        "errors": stats["errors"],
+    }
+    if stats["errors"]:
+        return output, f"{stats['errors']} of {requests_count} requests failed", result, True
+    return output, '', result, False
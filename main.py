@@ -1,75 +1,291 @@
 import argparse
+import ast
+import concurrent.futures
+import contextlib
+import difflib
+import functools
+import json
 import os
 import subprocess
+import threading
 import time
-from typing import Any, Tuple, List, Dict, Optional
+from typing import Any, Callable, Tuple, List, Dict, Optional, Sequence
 
-from langchain.callbacks.tracers import ConsoleCallbackHandler
-from langchain_anthropic import ChatAnthropic
-from langchain_google_genai import GoogleGenerativeAI
-from langchain_openai import ChatOpenAI
-from langchain_ollama import ChatOllama
 from langchain_core.prompts import ChatPromptTemplate
 
+from analyzer import analyze, format_findings
+from ast_rewrite import apply_rules
+from bench_datasets import DATASETS, format_size, parse_sizes, prepare_dataset
+from http_pool import configure_http_pool
+import metrics
+from preflight import code_fingerprint, find_code_block, preflight
+from racing import LLMRace
+from readiness import HARNESS_DIR, HARNESS_SITE_DIR
+from routing import ModelRouter
+from search import CROSSOVER_MODEL, GeneticSearch, LinearSearch, SearchNode, TreeSearch
+
 DEBUG = False
+# Options shared by the whole process, a batch manifest can't override them per script.
+PROCESS_OPTIONS = ('manifest', 'llm_concurrency', 'cpu_slots', 'metrics_port', 'metrics_addr', 'debug',
+                   'http_max_connections', 'http_max_keepalive', 'http_keepalive_expiry', 'no_http2',
+                   'fake_responses', 'fake_latency', 'fake_token_rate', 'fake_rate_limit_every',
+                   'exchange_sim', 'sim_latency', 'sim_jitter', 'sim_rate_limit', 'sim_seed')
+_fake_server_lock = threading.Lock()
+CHARS_PER_TOKEN = 4  # Rough estimate used to enforce the token cap while streaming.
+AST_REWRITE_MODEL = 'ast_rewrite'  # Model name of the rule-based rewrite of the base code.
+AST_REWRITE_MIN_SPEEDUP = 0.02  # A rewrite is kept if it saves this share of the time, less is run to run noise.
+
+
+def create_ollama(name: Optional[str], temperature: float) -> Any:
+    """Create a local Ollama chat model."""
+    from langchain_ollama import ChatOllama
+    return ChatOllama(model=name, temperature=temperature)
+
+
+def create_openai(name: Optional[str], temperature: float) -> Any:
+    """Create an OpenAI chat model."""
+    if "OPENAI_API_KEY" not in os.environ:
+        raise ValueError("Please setup OPENAI_API_KEY")
+    from langchain_openai import ChatOpenAI
+    from http_pool import get_async_http_client, get_http_client
+    return ChatOpenAI(model=name, temperature=temperature, http_client=get_http_client(),
+                      http_async_client=get_async_http_client())
+
+
+def create_anthropic(name: Optional[str], temperature: float) -> Any:
+    """Create an Anthropic chat model."""
+    if "ANTHROPIC_API_KEY" not in os.environ:
+        raise ValueError("Please setup ANTHROPIC_API_KEY")
+    import anthropic
+    from langchain_anthropic import ChatAnthropic
+    from http_pool import get_async_http_client, get_http_client
+    llm = ChatAnthropic(model=name, temperature=temperature)
+    # ChatAnthropic has no http_client option, rebuild its SDK clients on top of the shared pool.
+    client_params = {
+        "api_key": llm.anthropic_api_key.get_secret_value(),
+        "base_url": llm.anthropic_api_url,
+        "max_retries": llm.max_retries,
+        "default_headers": llm.default_headers or None,
+    }
+    if llm.default_request_timeout is None or llm.default_request_timeout > 0:
+        client_params["timeout"] = llm.default_request_timeout
+    llm._client = anthropic.Client(http_client=get_http_client(), **client_params)
+    llm._async_client = anthropic.AsyncClient(http_client=get_async_http_client(), **client_params)
+    return llm
+
+
+def create_googlegenai(name: Optional[str], temperature: float) -> Any:
+    """Create a Google GenAI completion model."""
+    if "GOOGLE_API_KEY" not in os.environ and "GOOGLE_APPLICATION_CREDENTIALS" not in os.environ:
+        raise ValueError("Please set up either GOOGLE_API_KEY or GOOGLE_APPLICATION_CREDENTIALS environment variable.")
+    from langchain_google_genai import GoogleGenerativeAI
+    return GoogleGenerativeAI(model=name, temperature=temperature)
+
+
+def create_fake(name: Optional[str], temperature: float) -> Any:
+    """Create a chat model for the offline fake server (see fake_llm.py)."""
+    if "FAKE_LLM_URL" not in os.environ:
+        raise ValueError("Please start fake_llm.py and set FAKE_LLM_URL")
+    from langchain_openai import ChatOpenAI
+    from http_pool import get_async_http_client, get_http_client
+    return ChatOpenAI(model=name, temperature=temperature, base_url=os.environ["FAKE_LLM_URL"], api_key="fake",
+                      http_client=get_http_client(), http_async_client=get_async_http_client())
+
+
+# Backend name -> (factory, seconds to sleep before each request). Factories import their
+# provider package on first use, so a run only pays for the backend it selects.
+BACKENDS: Dict[str, Tuple[Callable[[Optional[str], float], Any], int]] = {
+    "ollama": (create_ollama, 0),
+    "openai": (create_openai, 5),  # GPT-4 has rate limits. Be careful not to hit them.
+    "anthropic": (create_anthropic, 2),  # Adjust as needed based on observed rate limits
+    "googlegenai": (create_googlegenai, 2),  # Adjust as needed
+    "fake": (create_fake, 0),
+}
+
+
+def get_callbacks() -> List[Any]:
+    """Return the LLM callbacks, the console tracer is imported only in debug mode."""
+    if not DEBUG:
+        return []
+    from langchain.callbacks.tracers import ConsoleCallbackHandler
+    return [ConsoleCallbackHandler()]
 
 
 class LLMInterface:
-    """A class for interacting with Ollama, OpenAI, Anthropic, or Google Palm models."""
+    """A class for interacting with the models of the registered BACKENDS."""
     def __init__(self, model_type: str, prompt_tpl: ChatPromptTemplate, name: Optional[str] = None,
                  temperature: float = 1.0) -> None:
         """
         Initialize the LLM interface.
 
         Args:
-            model_type (str): The model type ('ollama', 'openai', 'anthropic', or 'googlepalm').
+            model_type (str): The model type, a key of BACKENDS ('ollama', 'openai', 'anthropic', 'googlegenai' or 'fake').
             prompt_tpl (ChatPromptTemplate): The prompt template to use.
             name (Optional[str]): The model name.
             temperature (float): Sampling temperature.
         """
+        if model_type not in BACKENDS:
+            raise ValueError(f"Unsupported model type. Use one of: {', '.join(BACKENDS)}.")
         self.model_type = model_type
-        if model_type == "ollama":
-            self.llm = ChatOllama(model=name, temperature=temperature)
-            self.time4sleep = 0
-        elif model_type == "openai":
-            if "OPENAI_API_KEY" not in os.environ:
-                raise ValueError("Please setup OPENAI_API_KEY")
-            self.time4sleep = 5  # GPT-4 has rate limits. Be careful not to hit them.
-            self.llm = ChatOpenAI(model=name, temperature=temperature)
-        elif model_type == "anthropic":
-            if "ANTHROPIC_API_KEY" not in os.environ:
-                raise ValueError("Please setup ANTHROPIC_API_KEY")
-            self.time4sleep = 2 # Adjust as needed based on observed rate limits
-            self.llm = ChatAnthropic(model=name, temperature=temperature)
-        elif model_type == "googlegenai":
-            if "GOOGLE_API_KEY" not in os.environ and "GOOGLE_APPLICATION_CREDENTIALS" not in os.environ:
-                raise ValueError("Please set up either GOOGLE_API_KEY or GOOGLE_APPLICATION_CREDENTIALS environment variable.")
-            self.time4sleep = 2  # Adjust as needed
-            self.llm = GoogleGenerativeAI(model=name, temperature=temperature)
-        else:
-            raise ValueError("Unsupported model type. Use 'ollama', 'openai', 'anthropic', or 'googlepalm'.")
+        self.name = name
+        factory, self.time4sleep = BACKENDS[model_type]
+        self.llm = factory(name, temperature)
 
+        self.prompt_tpl = prompt_tpl
         self.chain = prompt_tpl | self.llm
 
 
-    def __call__(self, **kwargs: dict) -> Any:
+    def __call__(self, stats: Optional[Dict[str, Any]] = None, **kwargs: dict) -> Any:
         """
         Invoke the LLM model with provided arguments.
 
         Args:
+            stats (Optional[Dict[str, Any]]): Filled with the "latency" in seconds and the (input, output) token
+                "usage" of the request. The interface is shared by concurrent requests, so it keeps no per-request state.
             **kwargs: Arbitrary keyword arguments for the model.
 
         Returns:
             str: The response from the model.
         """
         time.sleep(self.time4sleep)
+        start_time = time.time()
         response = self.chain.invoke(
-            kwargs, config={'callbacks': [ConsoleCallbackHandler()] if DEBUG else []}
+            kwargs, config={'callbacks': get_callbacks()}
         )
-        if self.model_type != 'googlegenai':
+        latency = time.time() - start_time
+        if self.model_type != 'googlegenai' and response.usage_metadata:
+            usage = (response.usage_metadata['input_tokens'], response.usage_metadata['output_tokens'])
             print(f"Total tokens: {response.usage_metadata['total_tokens']}")
+        else:
+            text = response if isinstance(response, str) else response.content
+            usage = (self.estimate_prompt_tokens(**kwargs), len(text) // CHARS_PER_TOKEN)
+        if stats is not None:
+            stats.update(latency=latency, usage=usage)
         return response
 
+    def stream(self, max_tokens: int, stats: Optional[Dict[str, Any]] = None, **kwargs: dict) -> Tuple[str, Optional[str]]:
+        """
+        Stream the LLM response and stop as soon as the fenced code block is complete.
+
+        The trailing text after the closing fence is never awaited. The stream is aborted
+        when the response exceeds max_tokens (estimated from the received characters).
+
+        Args:
+            max_tokens (int): Hard cap of response tokens.
+            stats (Optional[Dict[str, Any]]): Filled with the "latency" and "usage" of the request, see __call__().
+            **kwargs: Arbitrary keyword arguments for the model.
+
+        Returns:
+            Tuple[str, Optional[str]]: The response text and an abort error description or None.
+        """
+        time.sleep(self.time4sleep)
+        start_time = time.time()
+        chunks = self.chain.stream(
+            kwargs, config={'callbacks': get_callbacks()}
+        )
+        text = ''
+        error = None
+        try:
+            for chunk in chunks:
+                text += get_chunk_text(chunk)
+                if find_code_block(text) is not None:
+                    break
+                if len(text) // CHARS_PER_TOKEN > max_tokens:
+                    error = f"Response aborted: it exceeded the cap of {max_tokens} tokens."
+                    break
+        finally:
+            chunks.close()
+        latency = time.time() - start_time
+        usage = (self.estimate_prompt_tokens(**kwargs), len(text) // CHARS_PER_TOKEN)
+        print(f"Streamed tokens (estimated): {usage[1]}")
+        if stats is not None:
+            stats.update(latency=latency, usage=usage)
+        return text, error
+
+    def generate(self, stream: bool, max_tokens: int, origin: Any = None, **kwargs: dict) -> Dict[str, Any]:
+        """
+        Ask the model for a new script version.
+
+        Args:
+            stream (bool): Use the streaming path (see stream()).
+            max_tokens (int): Hard cap of streamed response tokens.
+            origin (Any): The search node the prompt was built from, returned with the response.
+            **kwargs: Arbitrary keyword arguments for the model.
+
+        Returns:
+            Dict[str, Any]: The response: model name, response text, error description or None,
+            latency in seconds, (input, output) token usage and origin.
+        """
+        stats: Dict[str, Any] = {}
+        if stream:
+            text, error = self.stream(max_tokens, stats, **kwargs)
+        else:
+            response = self(stats, **kwargs)
+            text = response if isinstance(response, str) else response.content
+            error = None
+        return {"model": self.name, "text": text, "error": error, "latency": stats["latency"],
+                "usage": stats["usage"], "origin": origin}
+
+    def queued_responses(self) -> List[Dict[str, Any]]:
+        """
+        Responses that arrived outside of generate(), only LLMRace has them.
+
+        Returns:
+            List[Dict[str, Any]]: Always empty.
+        """
+        return []
+
+    def record(self, result: Dict[str, Any]) -> None:
+        """
+        Feedback about an evaluated candidate, used by adaptive wrappers like ModelRouter.
+
+        Args:
+            result (Dict[str, Any]): An entry of the results list.
+        """
+
+    def escalate(self, reason: str) -> bool:
+        """
+        Ask for a stronger model, only adaptive wrappers like ModelRouter have one.
+
+        Args:
+            reason (str): Why the current model is abandoned.
+
+        Returns:
+            bool: False, a single model can't escalate.
+        """
+        return False
+
+    def estimate_prompt_tokens(self, **kwargs: dict) -> int:
+        """
+        Estimate prompt tokens for backends and modes that don't report usage.
+
+        Args:
+            **kwargs: Arbitrary keyword arguments for the model.
+
+        Returns:
+            int: Estimated number of prompt tokens.
+        """
+        messages = self.prompt_tpl.format_messages(**kwargs)
+        return sum(len(message.content) for message in messages) // CHARS_PER_TOKEN
+
+
+def get_chunk_text(chunk: Any) -> str:
+    """
+    Get the text of a streamed chunk.
+
+    Args:
+        chunk (Any): A message chunk of a chat model or a string of a completion model.
+
+    Returns:
+        str: The chunk text.
+    """
+    if isinstance(chunk, str):
+        return chunk
+    content = chunk.content
+    if isinstance(content, list):
+        return ''.join(block.get('text', '') if isinstance(block, dict) else block for block in content)
+    return content
+
 
 def get_script_content(script_path: str) -> str:
     """
@@ -85,24 +301,219 @@ def get_script_content(script_path: str) -> str:
         return file.read()
 
 
-def run_program(program_path: str) -> Tuple[str, str, int, bool]:
+def http_cassette_path(args: argparse.Namespace) -> str:
+    """
+    Cassette of the --http-replay mode: --http-cassette or ./run/cassettes/<script name>.json.
+
+    Args:
+        args (argparse.Namespace): Options of the run.
+
+    Returns:
+        str: Absolute path of the cassette, the candidates run in other folders.
+    """
+    name = os.path.splitext(os.path.basename(args.program))[0]
+    return os.path.abspath(args.http_cassette or os.path.join('./run/cassettes', f"{name}.json"))
+
+
+def harness_env(args: Optional[argparse.Namespace] = None, http_mode: str = 'replay',
+                port_map: Optional[Dict[int, int]] = None) -> Dict[str, str]:
+    """
+    Environment of the candidates: the harness helpers (e.g. readiness.py) are importable, and the start-up hook of
+    harness_site/ swaps ccxt exchanges for the simulator (--exchange-sim, see exchange_sim.py), records or replays
+    HTTP calls (--http-replay, see http_replay.py) and remaps ports (--isolate, see sandbox.py).
+
+    Args:
+        args (Optional[argparse.Namespace]): Options of the run, enable --http-replay.
+        http_mode (str): 'record' for the run that records the cassette, 'replay' otherwise.
+        port_map (Optional[Dict[int, int]]): Ports of the script -> free ports it uses instead.
+
+    Returns:
+        Dict[str, str]: A copy of the process environment with the harness folders on the PYTHONPATH.
+    """
+    env = dict(os.environ)
+    if args is not None and args.http_replay:
+        env["OPTIMIZER_HTTP_MODE"] = http_mode
+        env["OPTIMIZER_HTTP_CASSETTE"] = http_cassette_path(args)
+        if args.replay_latency is not None:
+            env["OPTIMIZER_REPLAY_LATENCY"] = str(args.replay_latency)
+    if port_map:
+        from sandbox import format_port_map
+        env["OPTIMIZER_PORT_MAP"] = format_port_map(port_map)
+        env["OPTIMIZER_PORT"] = str(next(iter(port_map.values())))
+    site_dir = HARNESS_SITE_DIR if env.get("OPTIMIZER_EXCHANGE_SIM") or env.get("OPTIMIZER_HTTP_MODE") \
+        or env.get("OPTIMIZER_PORT_MAP") else None
+    env["PYTHONPATH"] = os.pathsep.join(filter(None, [site_dir, HARNESS_DIR, env.get("PYTHONPATH")]))
+    return env
+
+
+def run_program(program_path: str, timeout: Optional[float] = None, cwd: Optional[str] = None,
+                env: Optional[Dict[str, str]] = None, wrapper: Sequence[str] = ()) -> Tuple[str, str, int, bool]:
     """
     Execute a Python script and measure its execution time.
 
     Args:
         program_path (str): Path to the Python script.
+        timeout (Optional[float]): Seconds after which the script is killed and reported as failed.
+        cwd (Optional[str]): Working directory of the script, e.g. a generated dataset folder. Defaults to the current one.
+        env (Optional[Dict[str, str]]): Environment of the script, harness_env() by default.
+        wrapper (Sequence[str]): Command prefix, e.g. sandbox.NETNS_COMMAND.
 
     Returns:
         Tuple[str, str, int, bool]: Output, error message, execution time in microseconds, and error status.
     """
     start_time = time.time()
-    result = subprocess.run(['python3', program_path], capture_output=True, text=True)
+    try:
+        result = subprocess.run([*wrapper, 'python3', os.path.abspath(program_path)], capture_output=True, text=True,
+                                timeout=timeout, cwd=cwd, env=env or harness_env())
+    except subprocess.TimeoutExpired:
+        execution_time = int((time.time() - start_time) * 1_000_000)
+        return '', f"Timeout: the script was killed after {timeout} seconds", execution_time, True
     end_time = time.time()
     execution_time = int((end_time - start_time) * 1_000_000)  # Convert to microseconds
     error_occurred = result.returncode != 0
     return result.stdout, result.stderr, execution_time, error_occurred
 
 
+def run_script_bench(args: argparse.Namespace, program_path: str, timeout: Optional[float] = None,
+                     cwd: Optional[str] = None) -> Tuple[str, str, int, bool]:
+    """
+    'run' benchmark: execute the script once, see run_program(). With --isolate it runs in its own sandbox folder,
+    with its --isolate-ports remapped to free ports or in a private network namespace.
+    """
+    if args.isolate == 'off':
+        return run_program(program_path, timeout=timeout, cwd=cwd, env=harness_env(args))
+    from sandbox import NETNS_COMMAND, allocate_ports, netns_available, sandbox_dir
+    use_netns = args.isolate == 'netns' and netns_available()
+    port_map = {} if use_netns else allocate_ports([int(port) for port in args.isolate_ports.split(',') if port])
+    with sandbox_dir(cwd or os.getcwd()) as sandbox:
+        return run_program(program_path, timeout=timeout, cwd=sandbox, env=harness_env(args, port_map=port_map),
+                           wrapper=NETNS_COMMAND if use_netns else ())
+
+
+@functools.lru_cache(maxsize=None)
+def get_load_payloads(script_path: str, function_name: str, sizes: str) -> List[bytes]:
+    """
+    Build (once per process) the request bodies of the http benchmark with a generator function of the base script.
+
+    Args:
+        script_path (str): The base script.
+        function_name (str): Payload generator, e.g. 'generate_nested_json'.
+        sizes (str): Positional arguments of the generator per payload, e.g. '3x5,5x5,5x8'.
+
+    Returns:
+        List[bytes]: JSON encoded payloads.
+    """
+    from loadbench import load_payloads
+    return load_payloads(script_path, function_name,
+                         [tuple(int(value) for value in size.split('x')) for size in sizes.split(',')])
+
+
+def run_http_bench(args: argparse.Namespace, program_path: str, timeout: Optional[float] = None,
+                   cwd: Optional[str] = None) -> Tuple[str, str, int, bool]:
+    """
+    'http' benchmark: serve the app of the script and drive it with the load generator (see loadbench.py).
+
+    Args:
+        args (argparse.Namespace): Options of the run, the load_* options configure the benchmark.
+        program_path (str): Path to the script.
+        timeout (Optional[float]): Seconds after which the benchmark is aborted and reported as failed.
+        cwd (Optional[str]): Working directory of the server.
+
+    Returns:
+        Tuple[str, str, int, bool]: Responses to the payloads, error message, the --load-objective in microseconds
+            (microseconds per request for rps) and error status.
+    """
+    from loadbench import run_http_benchmark
+    from sandbox import sandbox_dir
+    payloads = get_load_payloads(args.program, args.load_payload_fn, args.load_payloads)
+    # The server always listens on a free port, --isolate only gives it a sandbox folder.
+    with sandbox_dir(cwd or os.getcwd()) if args.isolate != 'off' else contextlib.nullcontext(cwd) as cwd:
+        output, error, stats, failed = run_http_benchmark(program_path, payloads, path=args.load_path,
+                                                          requests_count=args.load_requests,
+                                                          concurrency=args.load_concurrency, timeout=timeout, cwd=cwd,
+                                                          env=harness_env(args))
+    if not stats:
+        return output, error, 0, True
+    print(f"Load of {os.path.basename(program_path)}: {stats['rps']:.0f} rps, p50 {stats['p50'] * 1000:.2f} ms, "
+          f"p95 {stats['p95'] * 1000:.2f} ms, p99 {stats['p99'] * 1000:.2f} ms")
+    if args.load_objective == 'rps':
+        objective = 1_000_000 / stats['rps'] if stats['rps'] else 0
+    else:
+        objective = stats[args.load_objective] * 1_000_000
+    return output, error, int(objective), failed
+
+
+def run_sort_bench(args: argparse.Namespace, program_path: str, timeout: Optional[float] = None,
+                   cwd: Optional[str] = None) -> Tuple[str, str, int, bool]:
+    """
+    'sort' benchmark: run the parametric sort suite against the sort function of the script (see sortbench.py).
+
+    Args:
+        args (argparse.Namespace): Options of the run, the sort_* options configure the suite.
+        program_path (str): Path to the script.
+        timeout (Optional[float]): Seconds after which the suite is killed and reported as failed.
+        cwd (Optional[str]): Working directory of the suite.
+
+    Returns:
+        Tuple[str, str, int, bool]: The suite and its wrong cases, error message, total time of the cases in
+            microseconds (unfinished cases count as --sort-budget) and error status.
+    """
+    from sortbench import run_sort_benchmark
+    output, error, stats, failed = run_sort_benchmark(program_path, function_name=args.sort_function,
+                                                      sizes=args.sort_sizes, distributions=args.sort_distributions,
+                                                      seed=args.sort_seed, budget=args.sort_budget, timeout=timeout,
+                                                      cwd=cwd, env=harness_env(args))
+    if not stats:
+        return output, error, 0, True
+    largest = max((case["size"] for case in stats["cases"] if case["status"] == 'ok'), default=0)
+    print(f"Sort suite of {os.path.basename(program_path)}: {stats['finished']} of {len(stats['cases'])} cases "
+          f"within the budget, largest input {largest}, total {stats['seconds']:.3f} s")
+    return output, error, int(stats["seconds"] * 1_000_000), failed
+
+
+# name -> benchmark(args, program_path, timeout, cwd) -> (output, error, execution time in microseconds, error status)
+BENCHMARKS: Dict[str, Callable[..., Tuple[str, str, int, bool]]] = {
+    'run': run_script_bench,
+    'http': run_http_bench,
+    'sort': run_sort_bench,
+}
+
+
+def evaluate_program(args: argparse.Namespace, program_path: str, timeout: Optional[float] = None,
+                     cwd: Optional[str] = None) -> Tuple[str, str, int, bool]:
+    """
+    Measure a script with the benchmark selected by --bench, with its data files warm or cold in the page cache
+    (--cache-mode).
+
+    Args:
+        args (argparse.Namespace): Options of the run.
+        program_path (str): Path to the Python script.
+        timeout (Optional[float]): Seconds after which the script is killed and reported as failed.
+        cwd (Optional[str]): Working directory of the script.
+
+    Returns:
+        Tuple[str, str, int, bool]: Output, error message, execution time (the benchmark objective) in microseconds,
+            and error status. With --cache-mode both, the cold-cache execution time is used as the objective.
+    """
+    benchmark = BENCHMARKS[args.bench]
+    if args.cache_mode == 'off':
+        return benchmark(args, program_path, timeout, cwd)
+    from pagecache import cache_files, prepare as prepare_page_cache
+    files = cache_files(cwd or os.getcwd(), args.cache_files)
+    if args.cache_mode != 'both':
+        prepare_page_cache(files, args.cache_mode)
+        return benchmark(args, program_path, timeout, cwd)
+    prepare_page_cache(files, 'cold')
+    output, error, cold_extime, failed = benchmark(args, program_path, timeout, cwd)
+    if failed:
+        return output, error, cold_extime, failed
+    prepare_page_cache(files, 'warm')
+    _, warm_error, warm_extime, warm_failed = benchmark(args, program_path, timeout, cwd)
+    print(f"Page cache of {os.path.basename(program_path)}: cold {cold_extime} microseconds, "
+          f"warm {warm_extime} microseconds ({len(files)} data files)")
+    return output, warm_error if warm_failed else error, cold_extime, warm_failed
+
+
 def create_exp_folder(run_folder: Optional[str] = None) -> str:
     """
     Create a new experiment folder with a unique name.
@@ -115,24 +526,28 @@ def create_exp_folder(run_folder: Optional[str] = None) -> str:
     """
     if run_folder is None:
         run_folder = "./run"
-    if not os.path.exists(run_folder):
-        os.makedirs(run_folder)
-    exp_folders = [f for f in os.listdir(run_folder) if f.startswith("exp") and f[3:].isdigit() and len(f) == 7]
-    if exp_folders:
-        exp_numbers = [int(folder[3:]) for folder in exp_folders]
-        next_exp_number = max(exp_numbers) + 1
-    else:
-        next_exp_number = 1
-    next_exp_folder = f"exp{next_exp_number:04d}"
-    next_exp_path = os.path.join(run_folder, next_exp_folder)
-    os.makedirs(next_exp_path)
-    return next_exp_path
+    os.makedirs(run_folder, exist_ok=True)
+    while True:
+        exp_folders = [f for f in os.listdir(run_folder) if f.startswith("exp") and f[3:].isdigit() and len(f) == 7]
+        if exp_folders:
+            exp_numbers = [int(folder[3:]) for folder in exp_folders]
+            next_exp_number = max(exp_numbers) + 1
+        else:
+            next_exp_number = 1
+        next_exp_folder = f"exp{next_exp_number:04d}"
+        next_exp_path = os.path.join(run_folder, next_exp_folder)
+        try:
+            os.makedirs(next_exp_path)
+            return next_exp_path
+        except FileExistsError:
+            # Another concurrent run took this number, pick the next one.
+            continue
 
 
-def save_and_run_optimized_script(script_path: str, exp_folder_path: str, optimized_script: str,
-                                  iteration_number: int) -> Tuple[str, str, int, bool]:
+def save_optimized_script(script_path: str, exp_folder_path: str, optimized_script: str,
+                          iteration_number: int) -> str:
     """
-    Save an optimized script to a file and execute it.
+    Save an optimized script to a file in the experiment folder.
 
     Args:
         script_path (str): Path to the original script.
@@ -141,13 +556,95 @@ def save_and_run_optimized_script(script_path: str, exp_folder_path: str, optimi
         iteration_number (int): Current iteration number.
 
     Returns:
-        Tuple[str, str, int, bool]: Output, error message, execution time in microseconds, and error status.
+        str: Path to the saved script.
     """
     script_name = os.path.splitext(os.path.basename(script_path))[0]
     new_script_path = os.path.join(exp_folder_path, f"{script_name}_epoch_{iteration_number}.py")
     with open(new_script_path, 'w') as file:
         file.write(optimized_script)
-    return run_program(new_script_path)
+    return new_script_path
+
+
+def save_and_run_optimized_script(script_path: str, exp_folder_path: str, optimized_script: str,
+                                  iteration_number: int, timeout: Optional[float] = None,
+                                  cwd: Optional[str] = None) -> Tuple[str, str, int, bool]:
+    """
+    Save an optimized script to a file and execute it.
+
+    Args:
+        script_path (str): Path to the original script.
+        exp_folder_path (str): Path to the experiment folder.
+        optimized_script (str): The optimized script content.
+        iteration_number (int): Current iteration number.
+        timeout (Optional[float]): Seconds after which the script is killed and reported as failed.
+        cwd (Optional[str]): Working directory of the script.
+
+    Returns:
+        Tuple[str, str, int, bool]: Output, error message, execution time in microseconds, and error status.
+    """
+    new_script_path = save_optimized_script(script_path, exp_folder_path, optimized_script, iteration_number)
+    return run_program(new_script_path, timeout=timeout, cwd=cwd)
+
+
+def make_code_diff(base_code: str, new_code: str, name: str) -> str:
+    """
+    Build a unified diff of a candidate against the base code.
+
+    Args:
+        base_code (str): The initial code version.
+        new_code (str): The candidate code version.
+        name (str): Label used for the candidate side of the diff.
+
+    Returns:
+        str: Unified diff text, empty if the candidate is identical to the base code.
+    """
+    return '\n'.join(difflib.unified_diff(
+        base_code.splitlines(), new_code.splitlines(), fromfile='base_code', tofile=name, lineterm=''
+    ))
+
+
+def get_outcome(result: Dict[str, Any]) -> str:
+    """
+    Classify an iteration result.
+
+    Args:
+        result (Dict[str, Any]): An entry of the results list.
+
+    Returns:
+        str: 'rejected', 'error', 'mismatch' or 'ok'.
+    """
+    if result.get('preflight_error'):
+        return 'rejected'
+    if result['execution_error']:
+        return 'error'
+    if result['output_issue']:
+        return 'mismatch'
+    return 'ok'
+
+
+def format_attempts_history(base_extime: int, results: List[Dict[str, Any]]) -> str:
+    """
+    Render a compact table with the execution time and outcome of every prior attempt.
+
+    Args:
+        base_extime (int): Execution time of the base code in microseconds.
+        results (List[Dict[str, Any]]): Results of the previous iterations.
+
+    Returns:
+        str: The history table.
+    """
+    lines = ["iteration | parent | extime | speedup | outcome", f"base | - | {base_extime} | 1.00x | ok"]
+    for res in results:
+        outcome = get_outcome(res)
+        if outcome == 'ok' and res['execution_time'] > 0:
+            speedup = f"{base_extime / res['execution_time']:.2f}x"
+        else:
+            speedup = "-"
+        parent = 'base' if res['parent'] < 0 else res['parent']
+        if res.get('mate') is not None:
+            parent = f"{parent}x{'base' if res['mate'] < 0 else res['mate']}"
+        lines.append(f"{res['iteration']} | {parent} | {res['execution_time']} | {speedup} | {outcome}")
+    return '\n'.join(lines)
 
 
 prompt = ChatPromptTemplate.from_messages(
@@ -159,22 +656,24 @@ User will send you data in this pattern:
 
             base_code: ```CODE_HERE``` -  the code that the user have from the beginning and tries to optimise.
 	        base_extime: ```Integer, Time in microseconds``` -  execution time of base_code
-            two_iterations_ago_code: ```CODE_HERE``` -  two iterations ago python code that you wrote
-            two_iterations_ago_extime: ```Integer, Time in microseconds``` - execution time of two_iterations_ago_code
-            prev_iteration_code ```CODE_HERE``` - previous iteration python code that you wrote
-            prev_iteration_extime: ```Integer, Time in microseconds``` - execution time of prev_iteration_code
-            prev_iteration_execution_error: ```True|False``` - This variable shows that prev_iteration_code returned an error. It means your prev_iteration_code can’t be launched on the user's PC. 
+            attempts_history: ```TABLE_HERE``` - every previous iteration with the iteration its code was derived from (parent, AxB for a combination of the functions of iterations A and B), its execution time in microseconds, speedup against base_code and outcome (ok, error, mismatch or rejected - the code didn't pass checks before the launch).
+            static_analysis: ```FINDINGS_HERE``` - hot spots found by a static analysis of the previous iteration code (base_code on the first iteration): line number, pattern (nested loops over the same collection, 'in' on lists inside loops, sorting inside loops, repeated pd.to_datetime, blocking sleeps) and estimated complexity. Start from these lines.
+            two_iterations_ago_diff: ```UNIFIED_DIFF_HERE``` -  unified diff between base_code and the code that you wrote two iterations ago
+            two_iterations_ago_extime: ```Integer, Time in microseconds``` - execution time of two iterations ago code
+            prev_iteration_diff ```UNIFIED_DIFF_HERE``` - unified diff between base_code and the code that you wrote on previous iteration
+            prev_iteration_extime: ```Integer, Time in microseconds``` - execution time of previous iteration code
+            prev_iteration_execution_error: ```True|False``` - This variable shows that previous iteration code returned an error. It means your previous iteration code can’t be launched on the user's PC. 
             prev_iteration_error_description: ```Error description or None``` - if prev_iteration_execution_error = True you have error description. What went wrong on the user's PC.
             reference_result: ```STRUCTURED_TEXT_HERE``` - the script that you try to optimise returns some results and this is the reference result - result that returns base script w/o any optimisations.
             prev_iteration_results: ```STRUCTURED_TEXT_HERE``` - results of script that you wrote on previous iteration. 
 
             CONDITIONS:
                 1. User send you code and execution time, you return user new version of script, user execute it on his side and provide you result as
-prev_iteration_code and prev_iteration_extime (execution time). Also users always provide you base_code and base_extime as a reference. At the first iteration prev_iteration_code = base_code and prev_iteration_extime = base_extime
-                2. After the first iteration, a user provides you with two versions of the script that you sent to the user (prev_iteration_code,
-prev_iteration_extime) and (two_iterations_ago_code, two_iterations_ago_extime) . Please analyse them and keep in mind what approaches you already tried.
+prev_iteration_diff and prev_iteration_extime (execution time). Also users always provide you base_code and base_extime as a reference. At the first iteration prev_iteration_diff is empty (previous code = base_code) and prev_iteration_extime = base_extime
+                2. After the first iteration, a user provides you with two versions of the script that you sent to the user as diffs against base_code (prev_iteration_diff,
+prev_iteration_extime) and (two_iterations_ago_diff, two_iterations_ago_extime) and attempts_history with results of all your previous attempts. Please analyse them and keep in mind what approaches you already tried.
                 3. Find the best solution for minimising execution time base on p.1 and p.2
-                4. Return to a user a new script w/o any explanation and any additional tags. send back just a new version of scrip.
+                4. Return to a user a new script w/o any explanation and any additional tags. send back just a new version of scrip. Always send the full script, never a diff.
                 5. You are able to add any python3 libraries that you think may improve performance.
                 6. If you don’t see significant changes in execution time,  try some different approaches.
                 7. If you receive prev_iteration_execution_error=True and
@@ -188,9 +687,11 @@ You should analyse and fix the issue.
                 11. If you notice that the previous version has different results with reference results  please add to documentation. ```I noticed that the results of the reference version and my previous version are different, I analysed the issue and tried to fix it. So results should be the same in current version."""),
         ("human", """base_code: ```{base_code}```,
                      base_extime: {base_extime},
-                     two_iterations_ago_code: ```{two_iterations_ago_code}```,
+                     attempts_history: ```{attempts_history}```,
+                     static_analysis: ```{static_analysis}```,
+                     two_iterations_ago_diff: ```{two_iterations_ago_diff}```,
                      two_iterations_ago_extime: {two_iterations_ago_extime}
-                     prev_iteration_code: ```{prev_iteration_code}```,
+                     prev_iteration_diff: ```{prev_iteration_diff}```,
                      prev_iteration_extime: {prev_iteration_extime},
                      prev_iteration_execution_error: {prev_iteration_execution_error},
                      prev_iteration_error_description: {prev_iteration_error_description},
@@ -200,85 +701,762 @@ You should analyse and fix the issue.
 )
 
 
-def main() -> None:
-    """Main function."""
-    parser = argparse.ArgumentParser(description='Optimize Python script execution time.')
-    parser.add_argument('--debug', required=False, action='store_true', help='Enable LLM detail output')
-    parser.add_argument('--program', required=True, help='Path to the Python script to optimize')
-    parser.add_argument('--steps', type=int, default=50, help='Number of optimisation steps you want to try')
-    parser.add_argument('--model', required=True, choices=['ollama', 'openai', 'anthropic', 'googlegenai'], help='Select the model to use')
-    parser.add_argument('--model_name', required=True, help='Specify the model name for the selected backend')
-    global DEBUG
-    args = parser.parse_args()
-    DEBUG = args.debug
+def outputs_match(reference_results: str, output: str, equivalence: str = 'exact') -> bool:
+    """
+    Compare a candidate output with the reference output.
+
+    Args:
+        reference_results (str): Output of the base script.
+        output (str): Output of the candidate.
+        equivalence (str): 'exact', 'strip' (ignore trailing whitespace and blank lines) or
+            'unordered' (same lines in any order).
+
+    Returns:
+        bool: True if the outputs are equivalent.
+    """
+    if equivalence == 'exact':
+        return reference_results == output
+    reference_lines = [line.rstrip() for line in reference_results.splitlines() if line.strip()]
+    output_lines = [line.rstrip() for line in output.splitlines() if line.strip()]
+    if equivalence == 'strip':
+        return reference_lines == output_lines
+    if equivalence == 'unordered':
+        return sorted(reference_lines) == sorted(output_lines)
+    raise ValueError(f"Unsupported equivalence mode: {equivalence}")
+
+
+def apply_ast_rewrites(args: argparse.Namespace, exp_path: str, code: str, execution_time: int,
+                       reference_results: str, label: str, cpu_slots: Any,
+                       cwd: Optional[str] = None) -> Tuple[str, List[str], str, int]:
+    """
+    Apply the rule-based rewrites of ast_rewrite.py, keeping only those whose output matches the reference
+    and that run at least AST_REWRITE_MIN_SPEEDUP faster than the script before the rewrite.
+
+    Args:
+        args (argparse.Namespace): Options of the run.
+        exp_path (str): Path to the experiment folder, the checked scripts are written there and removed.
+        code (str): The script to rewrite.
+        execution_time (int): Execution time of code in microseconds.
+        reference_results (str): Output of the base script.
+        label (str): Part of the checked script names, e.g. 'base' or the iteration number.
+        cpu_slots (Any): Limit of concurrent script executions.
+        cwd (Optional[str]): Working directory of the checked scripts.
+
+    Returns:
+        Tuple[str, List[str], str, int]: The rewritten script, the applied rules, and the output and execution time
+            of the rewritten script (empty and 0 if no rule was applied).
+    """
+    script_name = os.path.splitext(os.path.basename(args.program))[0]
+    last_run = {"output": '', "execution_time": 0}
+    best_time = execution_time
+
+    def check(rewritten: str, rule_name: str) -> bool:
+        check_path = os.path.join(exp_path, f"{script_name}_ast_{label}_{rule_name}.py")
+        with open(check_path, 'w') as file:
+            file.write(rewritten)
+        with cpu_slots:
+            output, _, execution_time, execution_error = evaluate_program(args, check_path, timeout=args.timeout, cwd=cwd)
+        os.remove(check_path)
+        if execution_error or not outputs_match(reference_results, output, args.equivalence):
+            return False
+        nonlocal best_time
+        if execution_time > best_time * (1 - AST_REWRITE_MIN_SPEEDUP):
+            # Correct but not measurably faster, the rule only changes the code.
+            return False
+        best_time = execution_time
+        last_run.update(output=output, execution_time=execution_time)
+        return True
+
+    rewritten, applied = apply_rules(code, check)
+    return rewritten, applied, last_run["output"], last_run["execution_time"]
+
+
+def prepare_workdirs(args: argparse.Namespace) -> List[Tuple[int, str]]:
+    """
+    Generate (or reuse) the datasets of --dataset at every size of --dataset-sizes.
+
+    Args:
+        args (argparse.Namespace): Options of the run.
+
+    Returns:
+        List[Tuple[int, str]]: Size in bytes and working directory per size, empty without --dataset.
+    """
+    if not args.dataset:
+        return []
+    return [(size, prepare_dataset(args.dataset, size, args.dataset_seed)) for size in parse_sizes(args.dataset_sizes)]
+
+
+def record_http_cassette(args: argparse.Namespace, cwd: Optional[str] = None, log_prefix: str = '') -> None:
+    """
+    Record the HTTP calls of the base script once (--http-replay); the base run and the candidates replay them.
+
+    Args:
+        args (argparse.Namespace): Options of the run.
+        cwd (Optional[str]): Working directory of the script.
+        log_prefix (str): Prefix of printed lines.
+    """
+    cassette = http_cassette_path(args)
+    if os.path.exists(cassette):
+        print(f"{log_prefix}Replaying HTTP responses of {cassette}")
+        return
+    _, error, _, failed = run_program(args.program, timeout=args.timeout, cwd=cwd,
+                                      env=harness_env(args, http_mode='record'))
+    if failed:
+        print(f"{log_prefix}The recording run of the base script failed: {error}")
+    if not os.path.exists(cassette):
+        # No HTTP calls: an empty cassette still makes every call of the candidates fail instead of going out.
+        os.makedirs(os.path.dirname(cassette), exist_ok=True)
+        with open(cassette, 'w') as file:
+            json.dump({"interactions": []}, file)
+    print(f"{log_prefix}Recorded HTTP responses of the base script to {cassette}")
+
+
+def report_dataset_scaling(args: argparse.Namespace, base_path: str, best_path: str, best_iteration: int,
+                           workdirs: List[Tuple[int, str]], cpu_slots: Any, log_prefix: str = '') -> List[Dict[str, Any]]:
+    """
+    Run the base script and the best candidate at every dataset size and print how the speedup scales.
+
+    Args:
+        args (argparse.Namespace): Options of the run.
+        base_path (str): Path to the base script.
+        best_path (str): Path to the best candidate.
+        best_iteration (int): Iteration of the best candidate.
+        workdirs (List[Tuple[int, str]]): Output of prepare_workdirs().
+        cpu_slots (Any): Limit of concurrent script executions.
+        log_prefix (str): Prefix of printed lines.
+
+    Returns:
+        List[Dict[str, Any]]: Per size: "size", "base_time", "best_time", "output_match".
+    """
+    rows = []
+    lines = [f"Dataset scaling of {args.dataset}, best iteration {best_iteration}:",
+             "size | base extime | best extime | speedup | output"]
+    for size, workdir in workdirs:
+        with cpu_slots:
+            reference, _, base_time, base_error = evaluate_program(args, base_path, timeout=args.timeout, cwd=workdir)
+            output, _, best_time, best_error = evaluate_program(args, best_path, timeout=args.timeout, cwd=workdir)
+        output_match = not base_error and not best_error and outputs_match(reference, output, args.equivalence)
+        rows.append({"size": size, "base_time": base_time, "best_time": best_time, "output_match": output_match})
+        speedup = f"{base_time / best_time:.2f}x" if best_time and not best_error else "-"
+        lines.append(f"{format_size(size)} | {base_time} | {best_time} | {speedup} | "
+                     f"{'ok' if output_match else 'error' if best_error or base_error else 'mismatch'}")
+    print('\n'.join(log_prefix + line for line in lines))
+    return rows
+
+
+def build_prompt_kwargs(base_code: str, base_extime: int, reference_results: str, results: List[Dict[str, Any]],
+                        parent: SearchNode) -> Dict[str, Any]:
+    """
+    Build the prompt variables for a new version derived from a node.
+
+    Args:
+        base_code (str): The initial code version.
+        base_extime (int): Execution time of the base code in microseconds.
+        reference_results (str): Output of the base script.
+        results (List[Dict[str, Any]]): Results of the previous iterations.
+        parent (SearchNode): The node sent as the previous iteration, its parent is the two iterations ago one.
+
+    Returns:
+        Dict[str, Any]: Keyword arguments of the prompt template.
+    """
+    grandparent = parent.parent
+    return dict(
+        base_code=base_code,
+        base_extime=base_extime,
+        attempts_history=format_attempts_history(base_extime, results),
+        static_analysis=format_findings(analyze(parent.code)),
+        two_iterations_ago_diff=make_code_diff(base_code, grandparent.code if grandparent else base_code,
+                                               'two_iterations_ago_code'),
+        two_iterations_ago_extime=grandparent.execution_time if grandparent else 0,
+        prev_iteration_diff=make_code_diff(base_code, parent.code, 'prev_iteration_code'),
+        prev_iteration_extime=parent.execution_time,
+        prev_iteration_execution_error=parent.execution_error,
+        prev_iteration_error_description=parent.error_description,
+        reference_results=reference_results,
+        prev_iteration_results=parent.output
+    )
+
+
+def optimize(args: argparse.Namespace, llm_interface: LLMInterface, llm_slots: Optional[threading.Semaphore] = None,
+             cpu_slots: Optional[threading.Semaphore] = None, log_prefix: str = '') -> Tuple[int, List[Dict[str, Any]]]:
+    """
+    Run the optimisation loop for one script.
+
+    Args:
+        args (argparse.Namespace): Options of the run (see main()), args.program is the script to optimise.
+        llm_interface (LLMInterface): The LLM to ask for new versions.
+        llm_slots (Optional[threading.Semaphore]): Global limit of concurrent LLM requests.
+        cpu_slots (Optional[threading.Semaphore]): Global limit of concurrent script executions.
+        log_prefix (str): Prefix of printed lines.
+
+    Returns:
+        Tuple[int, List[Dict[str, Any]]]: Execution time of the base script and results of the iterations.
+    """
+    run_start = time.time()
+    llm_slots = llm_slots or contextlib.nullcontext()
+    cpu_slots = cpu_slots or contextlib.nullcontext()
     steps = args.steps
     base_code = get_script_content(args.program)
     iteration_number = 0
-    llm_interface = LLMInterface(
-        model_type=args.model,
-        prompt_tpl=prompt,
-        name=args.model_name,
-        temperature=1.0
-    )
     exp_path = create_exp_folder()
-    reference_results, _, base_extime, _ = run_program(args.program)
-
-    print(f"Iteration Initial: Execution Time: {base_extime} microseconds")
-    two_iterations_ago_code = ''
-    two_iterations_ago_extime = 0
-    prev_iteration_code = base_code
-    prev_iteration_extime = base_extime
-    prev_iteration_execution_error = False
-    prev_iteration_error_description = ''
-    output = reference_results
-    results: List[Dict[str, any]] = []
+    experiment = os.path.basename(exp_path)
+    # With --dataset every script runs in the folder of the first (smallest) dataset size.
+    workdirs = prepare_workdirs(args)
+    run_cwd = workdirs[0][1] if workdirs else None
+    with cpu_slots:
+        if args.http_replay:
+            record_http_cassette(args, cwd=run_cwd, log_prefix=log_prefix)
+        reference_results, _, base_extime, _ = evaluate_program(args, args.program, cwd=run_cwd)
 
-    while steps > 0:
-        llm_response = llm_interface(
-            base_code=base_code,
-            base_extime=base_extime,
-            two_iterations_ago_code=two_iterations_ago_code,
-            two_iterations_ago_extime=two_iterations_ago_extime,
-            prev_iteration_code=prev_iteration_code,
-            prev_iteration_extime=prev_iteration_extime,
-            prev_iteration_execution_error=prev_iteration_execution_error,
-            prev_iteration_error_description=prev_iteration_error_description,
-            reference_results=reference_results,
-            prev_iteration_results=output
-        )
-        if args.model != 'googlegenai':
-            script_content = llm_response.content.strip().strip("```").strip("python")
+    print(f"{log_prefix}Iteration Initial: Execution Time: {base_extime} microseconds")
+    ceiling_extime = 0
+    if args.reference_impl:
+        with cpu_slots:
+            ceiling_output, ceiling_error, ceiling_extime, ceiling_failed = evaluate_program(
+                args, args.reference_impl, timeout=args.timeout, cwd=run_cwd
+            )
+        if ceiling_failed or not outputs_match(reference_results, ceiling_output, args.equivalence):
+            print(f"{log_prefix}Reference implementation is ignored, its output differs from the base script: "
+                  f"{ceiling_error}")
+            ceiling_extime = 0
         else:
-            script_content = llm_response.strip().strip("```").strip("python")
-        output, error, execution_time, execution_error = save_and_run_optimized_script(
-            args.program, exp_path, script_content, iteration_number
-        )
+            print(f"{log_prefix}Reference implementation: Execution Time: {ceiling_extime} microseconds "
+                  f"(speedup against the base code: {base_extime / ceiling_extime:.2f}x)")
+    root = SearchNode(-1, base_code, None, execution_time=base_extime, output=reference_results)
+    if args.search == 'tree':
+        search = TreeSearch(root, exploration=args.exploration)
+    elif args.search == 'genetic':
+        search = GeneticSearch(root, population_size=args.population_size, crossover_rate=args.crossover_rate)
+    else:
+        search = LinearSearch(root)
+    results: List[Dict[str, Any]] = []
+    seen = {code_fingerprint(ast.parse(base_code)): -1}
+    seen_lock = threading.Lock()
+    best_extime = base_extime
+    metrics.BEST_SPEEDUP.labels(experiment).set(1.0)
+    tokens_used = 0
+    plateau_extime = base_extime
+    steps_without_improvement = 0
+
+    def expand(parent: Optional[SearchNode], mate: Optional[SearchNode], code: Optional[str], iteration: int,
+               response: Optional[Dict[str, Any]] = None) -> Tuple[SearchNode, Dict[str, Any]]:
+        """
+        Ask the LLM for a new version derived from parent (or take the crossover child code, or a queued response
+        of an earlier race) and evaluate it.
+        """
+        if code is None:
+            if response is None:
+                prompt_kwargs = build_prompt_kwargs(base_code, base_extime, reference_results, results, parent)
+                with llm_slots:
+                    response = llm_interface.generate(args.stream, args.max_tokens, parent, **prompt_kwargs)
+            # A queued race response answers an older prompt, the candidate belongs to the node of that prompt.
+            parent = response['origin'] or parent
+            metrics.LLM_REQUEST_SECONDS.labels(experiment, response['model']).observe(response['latency'])
+            metrics.LLM_TOKENS.labels(experiment, response['model'], 'in').inc(response['usage'][0])
+            metrics.LLM_TOKENS.labels(experiment, response['model'], 'out').inc(response['usage'][1])
+        else:
+            print(f"{log_prefix}Iteration {iteration}: crossover of {parent.iteration} and {mate.iteration}")
+            response = {"model": CROSSOVER_MODEL, "text": f"```python\n{code}\n```", "error": None,
+                        "latency": 0.0, "usage": (0, 0), "origin": parent}
+        with seen_lock:
+            script_content, preflight_error = preflight(response['text'], seen, iteration)
+        candidate_error = response['error'] or preflight_error
+        if candidate_error is None:
+            evaluation_start = time.time()
+            with cpu_slots:
+                script_path = save_optimized_script(args.program, exp_path, script_content, iteration)
+                output, error, execution_time, execution_error = evaluate_program(
+                    args, script_path, timeout=args.timeout, cwd=run_cwd
+                )
+            metrics.CANDIDATE_EVALUATION_SECONDS.labels(experiment).observe(time.time() - evaluation_start)
+        else:
+            # The candidate can't produce a valid run, don't spend a subprocess on it.
+            save_optimized_script(args.program, exp_path, script_content, iteration)
+            output, error, execution_time, execution_error = '', candidate_error, 0, True
 
-        print(f"Iteration {iteration_number}: Execution Time: {execution_time} microseconds")
-        output_issue= False
-        if execution_error:
-            prev_iteration_execution_error = execution_error
-            print(f"Error during execution: {error}")
-        elif reference_results != output and not execution_error:
-            print("Output mismatch error:", error)
+        print(f"{log_prefix}Iteration {iteration}: Execution Time: {execution_time} microseconds")
+        output_issue = False
+        if candidate_error is not None:
+            print(f"{log_prefix}Candidate rejected: {error}")
+        elif execution_error:
+            print(f"{log_prefix}Error during execution: {error}")
+        elif not outputs_match(reference_results, output, args.equivalence):
+            print(f"{log_prefix}Output mismatch error:", error)
             output_issue = True
-        results.append({
-            "iteration": iteration_number,
+        rewrites = []
+        if args.ast_rewrite == 'all' and candidate_error is None and not execution_error and not output_issue:
+            rewritten, rewrites, rewritten_output, rewritten_extime = apply_ast_rewrites(
+                args, exp_path, script_content, execution_time, reference_results, str(iteration), cpu_slots, run_cwd
+            )
+            if rewrites:
+                print(f"{log_prefix}Iteration {iteration}: AST rewrites {', '.join(rewrites)}: "
+                      f"Execution Time: {rewritten_extime} microseconds")
+                script_content, output, execution_time = rewritten, rewritten_output, rewritten_extime
+                save_optimized_script(args.program, exp_path, script_content, iteration)
+        node = SearchNode(iteration, script_content, parent, execution_time=execution_time,
+                          execution_error=execution_error, output_issue=output_issue,
+                          error_description=error if execution_error else '', output=output, mate=mate)
+        return node, {
+            "iteration": iteration,
+            "parent": parent.iteration,
+            "mate": mate.iteration if mate else None,
+            "model": response['model'],
             "execution_time": execution_time,
             "execution_error": execution_error,
-            "output_issue": output_issue
-        })
-        iteration_number += 1
-        steps -= 1
+            "preflight_error": candidate_error is not None,
+            "output_issue": output_issue,
+            "improved": False,
+            "tokens": sum(response['usage']),
+            "rewrites": rewrites
+        }
+
+    def register(node: SearchNode, result: Dict[str, Any]) -> bool:
+        """Add an evaluated candidate to the search and the history, returns True if the run should stop."""
+        nonlocal best_extime, tokens_used, plateau_extime, steps_without_improvement
+        search.add(node)
+        results.append(result)
+        tokens_used += result['tokens']
+        metrics.CANDIDATES.labels(experiment, get_outcome(result)).inc()
+        if not node.failed and 0 < node.execution_time < best_extime:
+            best_extime = node.execution_time
+            result["improved"] = True
+            metrics.BEST_SPEEDUP.labels(experiment).set(base_extime / best_extime)
+        if ceiling_extime and not node.failed and node.execution_time > 0:
+            result["ceiling_fraction"] = ceiling_extime / node.execution_time
+            print(f"{log_prefix}Iteration {node.iteration}: {result['ceiling_fraction']:.0%} of the reference "
+                  f"implementation speed")
+        if result['model'] not in (CROSSOVER_MODEL, AST_REWRITE_MODEL):
+            llm_interface.record(result)
+        # Improvements smaller than the plateau threshold are treated as measurement noise.
+        if not node.failed and node.execution_time < plateau_extime * (1 - args.plateau_threshold):
+            plateau_extime = node.execution_time
+            steps_without_improvement = 0
+        else:
+            steps_without_improvement += 1
+        if ceiling_extime and args.stop_at_ceiling and ceiling_extime / best_extime >= args.stop_at_ceiling:
+            print(f"{log_prefix}Stopping: the best version reached {ceiling_extime / best_extime:.0%} of the "
+                  f"reference implementation speed")
+            return True
+        if args.plateau_steps and steps_without_improvement >= args.plateau_steps:
+            reason = f"no significant improvement for {steps_without_improvement} steps"
+            if args.on_plateau == 'escalate' and llm_interface.escalate(reason):
+                steps_without_improvement = 0
+            else:
+                print(f"{log_prefix}Stopping: {reason}")
+                return True
+        return False
+
+    if args.ast_rewrite != 'off':
+        # The rule-based rewrite of the base code is a free first candidate, it doesn't use a step.
+        rewritten, rewrites, rewritten_output, rewritten_extime = apply_ast_rewrites(
+            args, exp_path, base_code, base_extime, reference_results, 'base', cpu_slots, run_cwd
+        )
+        if rewrites:
+            print(f"{log_prefix}Iteration {iteration_number}: AST rewrites {', '.join(rewrites)}: "
+                  f"Execution Time: {rewritten_extime} microseconds")
+            save_optimized_script(args.program, exp_path, rewritten, iteration_number)
+            with seen_lock:
+                seen[code_fingerprint(ast.parse(rewritten))] = iteration_number
+            register(SearchNode(iteration_number, rewritten, root, execution_time=rewritten_extime,
+                                output=rewritten_output), {
+                "iteration": iteration_number,
+                "parent": root.iteration,
+                "mate": None,
+                "model": AST_REWRITE_MODEL,
+                "execution_time": rewritten_extime,
+                "execution_error": False,
+                "preflight_error": False,
+                "output_issue": False,
+                "improved": False,
+                "tokens": 0,
+                "rewrites": rewrites
+            })
+            iteration_number += 1
+        else:
+            print(f"{log_prefix}AST rewrites: no rule applies to the base code")
+
+    executor = concurrent.futures.ThreadPoolExecutor(max_workers=args.search_width)
+    while steps > 0:
+        if args.time_budget and time.time() - run_start >= args.time_budget:
+            print(f"{log_prefix}Stopping: the time budget of {args.time_budget} seconds is spent")
+            break
+        if args.token_budget and tokens_used >= args.token_budget:
+            print(f"{log_prefix}Stopping: the token budget of {args.token_budget} tokens is spent ({tokens_used})")
+            break
+        # Late responses of earlier races are evaluated without using a step.
+        queued = llm_interface.queued_responses()
+        futures = [executor.submit(expand, None, None, None, iteration_number + index, response)
+                   for index, response in enumerate(queued)]
+        iteration_number += len(queued)
+        proposals = search.select(min(args.search_width, steps))
+        futures += [executor.submit(expand, parent, mate, code, iteration_number + index)
+                    for index, (parent, mate, code) in enumerate(proposals)]
+        iteration_number += len(proposals)
+        steps -= len(proposals)
+        stop = False
+        for future in futures:
+            stop = register(*future.result()) or stop
+        if stop:
+            break
+    executor.shutdown()
+
+    if len(workdirs) > 1:
+        improved = [res for res in results if res['improved']]
+        if improved:
+            script_name = os.path.splitext(os.path.basename(args.program))[0]
+            best_iteration = improved[-1]['iteration']
+            best_path = os.path.join(exp_path, f"{script_name}_epoch_{best_iteration}.py")
+            report_dataset_scaling(args, args.program, best_path, best_iteration, workdirs, cpu_slots, log_prefix)
+        else:
+            print(f"{log_prefix}Dataset scaling: no candidate is faster than the base code")
+
+    return base_extime, results
+
+
+def print_summary(results: List[Dict[str, Any]], log_prefix: str = '') -> None:
+    """
+    Print the last and the best correct results.
 
+    Args:
+        results (List[Dict[str, Any]]): Results of the iterations.
+        log_prefix (str): Prefix of printed lines.
+    """
     filtered_results = [res for res in results if not res['output_issue'] and not res['execution_error']]
+    if not filtered_results:
+        print(f"{log_prefix}No correct results")
+        return
     sorted_filtered_results = sorted(filtered_results, key=lambda x: x['execution_time'])
     print(
-        f"Last results: execution_time {filtered_results[-1]['execution_time']} "
+        f"{log_prefix}Last results: execution_time {filtered_results[-1]['execution_time']} "
         f"iteration: {filtered_results[-1]['iteration']}")
     print(
-        f"The best results: execution_time {sorted_filtered_results[0]['execution_time']} "
+        f"{log_prefix}The best results: execution_time {sorted_filtered_results[0]['execution_time']} "
         f"iteration: {sorted_filtered_results[0]['iteration']}")
+    if 'ceiling_fraction' in sorted_filtered_results[0]:
+        print(f"{log_prefix}The best results reach {sorted_filtered_results[0]['ceiling_fraction']:.0%} of the "
+              f"reference implementation speed")
+
+
+def parse_backend_specs(spec: str) -> List[Tuple[str, str]]:
+    """
+    Parse a comma separated list of backend:model_name pairs.
+
+    Args:
+        spec (str): E.g. 'ollama:qwen2.5-coder-8K-ctx:14b,openai:gpt-4o'.
+
+    Returns:
+        List[Tuple[str, str]]: Backend and model name pairs.
+    """
+    pairs = []
+    for item in spec.split(','):
+        backend, _, model_name = item.strip().partition(':')
+        if backend not in BACKENDS or not model_name:
+            raise ValueError(f"Invalid backend spec '{item}', expected backend:model_name with backend one of: "
+                             f"{', '.join(BACKENDS)}")
+        pairs.append((backend, model_name))
+    return pairs
+
+
+def create_llm_interface(args: argparse.Namespace) -> Any:
+    """
+    Create the LLM interface of a run, the in-process fake server is started on first use.
+
+    Args:
+        args (argparse.Namespace): Options of the run.
+
+    Returns:
+        Any: LLMInterface, LLMRace over several interfaces with --race or ModelRouter with --route.
+    """
+    if args.race and args.route:
+        raise ValueError("--race and --route can't be used together")
+    if args.race or args.route:
+        backends = parse_backend_specs(args.race or args.route)
+    else:
+        backends = [(args.model, args.model_name)]
+    with _fake_server_lock:
+        if any(backend == 'fake' for backend, _ in backends) and "FAKE_LLM_URL" not in os.environ:
+            from fake_llm import FakeLLMServer, load_responses
+            fake_server = FakeLLMServer(
+                responses=load_responses(args.fake_responses) if args.fake_responses else None,
+                latency=args.fake_latency,
+                token_rate=args.fake_token_rate,
+                rate_limit_every=args.fake_rate_limit_every
+            ).start()
+            os.environ["FAKE_LLM_URL"] = fake_server.url
+    interfaces = [
+        LLMInterface(model_type=backend, prompt_tpl=prompt, name=model_name, temperature=1.0)
+        for backend, model_name in backends
+    ]
+    if args.race:
+        return LLMRace(interfaces)
+    if args.route:
+        return ModelRouter(
+            interfaces,
+            family=args.family or os.path.splitext(os.path.basename(args.program))[0],
+            stats_path=args.routing_stats,
+            escalate_after=args.escalate_after,
+            max_error_rate=args.escalate_error_rate,
+            error_window=args.error_window
+        )
+    return interfaces[0]
+
+
+def load_manifest(manifest_path: str, args: argparse.Namespace) -> List[argparse.Namespace]:
+    """
+    Read a batch manifest and build the options of every script in it.
+
+    The manifest is a YAML or JSON mapping with an optional 'defaults' mapping and a 'scripts' list.
+    Keys are main.py options with '_' or '-' (e.g. program, steps, equivalence, timeout, model, model_name);
+    a script entry overrides the defaults, which override the command line.
+
+    Args:
+        manifest_path (str): Path to the .yaml/.yml/.json manifest.
+        args (argparse.Namespace): Command line options.
+
+    Returns:
+        List[argparse.Namespace]: Options of every script.
+    """
+    with open(manifest_path, 'r') as file:
+        if manifest_path.endswith(('.yaml', '.yml')):
+            import yaml
+            try:
+                manifest = yaml.safe_load(file)
+            except yaml.YAMLError as e:
+                raise ValueError(f"Manifest {manifest_path} is not valid YAML: {e}")
+        else:
+            manifest = json.load(file)
+    if not isinstance(manifest, dict) or not isinstance(manifest.get('scripts'), list) or not manifest['scripts']:
+        raise ValueError(f"Manifest {manifest_path} needs a non-empty 'scripts' list")
+    defaults = manifest.get('defaults') or {}
+    if not isinstance(defaults, dict):
+        raise ValueError(f"'defaults' of manifest {manifest_path} must be a mapping")
+    scripts_args = []
+    for entry in manifest['scripts']:
+        if not isinstance(entry, dict):
+            raise ValueError(f"Every script of manifest {manifest_path} must be a mapping of options")
+        options = vars(args).copy()
+        for key, value in {**defaults, **entry}.items():
+            key = key.replace('-', '_')
+            if key not in options or key in PROCESS_OPTIONS:
+                raise ValueError(f"Unknown option '{key}' in manifest {manifest_path}")
+            options[key] = value
+        if not options.get('program') or not (options.get('race') or options.get('route') or (options.get('model') and options.get('model_name'))):
+            raise ValueError(f"Every script of manifest {manifest_path} needs program and model/model_name, race or route")
+        scripts_args.append(argparse.Namespace(**options))
+    return scripts_args
+
+
+def run_batch(args: argparse.Namespace, scripts_args: List[argparse.Namespace]) -> None:
+    """
+    Optimise every script of a manifest concurrently under global LLM and CPU limits.
+
+    Args:
+        args (argparse.Namespace): Command line options.
+        scripts_args (List[argparse.Namespace]): Options of every script, see load_manifest().
+    """
+    llm_slots = threading.Semaphore(args.llm_concurrency)
+    cpu_slots = threading.Semaphore(args.cpu_slots or os.cpu_count() or 1)
+
+    def run_script(script_args: argparse.Namespace) -> Tuple[int, List[Dict[str, Any]]]:
+        log_prefix = f"[{script_args.program}] "
+        base_extime, results = optimize(script_args, create_llm_interface(script_args), llm_slots, cpu_slots, log_prefix)
+        print_summary(results, log_prefix)
+        return base_extime, results
+
+    with concurrent.futures.ThreadPoolExecutor(max_workers=len(scripts_args)) as executor:
+        futures = {executor.submit(run_script, script_args): script_args.program for script_args in scripts_args}
+        print("Batch results:")
+        for future in concurrent.futures.as_completed(futures):
+            program = futures[future]
+            try:
+                base_extime, results = future.result()
+            except Exception as e:
+                print(f"{program}: failed: {e}")
+                continue
+            times = [res['execution_time'] for res in results if get_outcome(res) == 'ok' and res['execution_time'] > 0]
+            if times:
+                print(f"{program}: base {base_extime} best {min(times)} speedup {base_extime / min(times):.2f}x")
+            else:
+                print(f"{program}: base {base_extime} no correct results")
+
+
+def configure_exchange_sim(args: argparse.Namespace) -> None:
+    """
+    Enable (or disable) the exchange simulator for the candidates started from now on, see exchange_sim.py.
+
+    Args:
+        args (argparse.Namespace): Options of the run, exchange_sim and the sim_* options.
+    """
+    if not args.exchange_sim:
+        for name in ("OPTIMIZER_EXCHANGE_SIM", "OPTIMIZER_SIM_SEED", "OPTIMIZER_SIM_LATENCY", "OPTIMIZER_SIM_JITTER",
+                     "OPTIMIZER_SIM_RATE_LIMIT"):
+            os.environ.pop(name, None)
+        return
+    # Inherited by every candidate through harness_env().
+    os.environ.update({
+        "OPTIMIZER_EXCHANGE_SIM": "1",
+        "OPTIMIZER_SIM_SEED": str(args.sim_seed),
+        "OPTIMIZER_SIM_LATENCY": str(args.sim_latency),
+        "OPTIMIZER_SIM_JITTER": str(args.sim_jitter),
+        "OPTIMIZER_SIM_RATE_LIMIT": str(args.sim_rate_limit),
+    })
+
+
+def build_parser() -> argparse.ArgumentParser:
+    """Command line options of main.py; their defaults are also the base options of corpus runs."""
+    from sortbench import DEFAULT_SIZES as DEFAULT_SORT_SIZES, DISTRIBUTIONS as SORT_DISTRIBUTIONS
+    parser = argparse.ArgumentParser(description='Optimize Python script execution time.')
+    parser.add_argument('--debug', required=False, action='store_true', help='Enable LLM detail output')
+    parser.add_argument('--program', help='Path to the Python script to optimize')
+    parser.add_argument('--steps', type=int, default=50, help='Number of optimisation steps you want to try')
+    parser.add_argument('--model', choices=list(BACKENDS), help='Select the model to use')
+    parser.add_argument('--model_name', help='Specify the model name for the selected backend')
+    parser.add_argument('--time-budget', type=float, help='Stop after this many seconds of wall time')
+    parser.add_argument('--token-budget', type=int, help='Stop after this many LLM tokens (prompt and completion)')
+    parser.add_argument('--plateau-steps', type=int, help='Plateau: steps without significant improvement before --on-plateau')
+    parser.add_argument('--plateau-threshold', type=float, default=0.02,
+                        help='Plateau: minimal relative improvement of the best time that counts as significant')
+    parser.add_argument('--on-plateau', default='stop', choices=['stop', 'escalate'],
+                        help='Plateau: stop, or escalate to the next --route model (stops at the strongest one)')
+    parser.add_argument('--search', default='linear', choices=['linear', 'tree', 'genetic'],
+                        help='linear: every prompt is built from the previous candidate, tree: best-first tree search, '
+                             'genetic: population of correct candidates with LLM mutation and function crossover')
+    parser.add_argument('--search-width', type=int, default=1,
+                        help='Tree and genetic search: number of nodes expanded concurrently in every round')
+    parser.add_argument('--exploration', type=float, default=1.0, help='Tree search: weight of the UCB exploration bonus')
+    parser.add_argument('--population-size', type=int, default=6, help='Genetic search: correct candidates kept')
+    parser.add_argument('--crossover-rate', type=float, default=0.3,
+                        help='Genetic search: probability that a child is a crossover instead of an LLM mutation')
+    parser.add_argument('--ast-rewrite', default='off', choices=['off', 'base', 'all'],
+                        help='Rule-based AST rewrites verified against the reference output: off, base (a free '
+                             'first candidate from the base code) or all (also applied to every correct candidate)')
+    parser.add_argument('--dataset', choices=list(DATASETS),
+                        help='Run the scripts in a folder with a generated dataset, e.g. access_log for script.py')
+    parser.add_argument('--dataset-sizes', default='10MB',
+                        help='Comma separated dataset sizes; the first one is used for the optimisation, the best '
+                             'candidate is benchmarked against the base code at all of them in the end')
+    parser.add_argument('--dataset-seed', type=int, default=0, help='Seed of the dataset generator')
+    parser.add_argument('--reference-impl',
+                        help='Speed-of-light implementation of the program (e.g. script_mmap_reference.py for '
+                             'script.py), candidates are reported as a fraction of its speed')
+    parser.add_argument('--stop-at-ceiling', type=float,
+                        help='Stop when the best candidate reaches this fraction of the --reference-impl speed, e.g. 0.9')
+    parser.add_argument('--bench', default='run', choices=list(BENCHMARKS),
+                        help='run: execution time of the script, http: serve its ASGI app and measure it under load, '
+                             'sort: run the parametric sort suite against its sort function')
+    parser.add_argument('--load-path', default='/process/', help='HTTP benchmark: endpoint receiving the POST requests')
+    parser.add_argument('--load-requests', type=int, default=500, help='HTTP benchmark: number of timed requests')
+    parser.add_argument('--load-concurrency', type=int, default=16, help='HTTP benchmark: concurrent clients')
+    parser.add_argument('--load-payload-fn', default='generate_nested_json',
+                        help='HTTP benchmark: payload generator function of the base script')
+    parser.add_argument('--load-payloads', default='3x5,5x5,5x8',
+                        help='HTTP benchmark: comma separated positional arguments of the generator, one payload '
+                             'each, e.g. 5x8 is generate_nested_json(5, 8)')
+    parser.add_argument('--load-objective', default='p95', choices=['p50', 'p95', 'p99', 'rps'],
+                        help='HTTP benchmark: metric used as the execution time (rps as microseconds per request)')
+    parser.add_argument('--sort-function', default='very_inefficient_sort', help='Sort benchmark: function to measure')
+    parser.add_argument('--sort-sizes', default=DEFAULT_SORT_SIZES, help='Sort benchmark: comma separated input sizes')
+    parser.add_argument('--sort-distributions', default=','.join(SORT_DISTRIBUTIONS),
+                        help=f"Sort benchmark: comma separated input distributions ({', '.join(SORT_DISTRIBUTIONS)})")
+    parser.add_argument('--sort-seed', type=int, default=0, help='Sort benchmark: seed of the inputs')
+    parser.add_argument('--sort-budget', type=float, default=10.0,
+                        help='Sort benchmark: seconds per case, slower cases and the larger ones of their '
+                             'distribution count as the budget')
+    parser.add_argument('--exchange-sim', action='store_true',
+                        help='Serve ccxt.binance from the local simulator (exchange_sim.py) instead of the live API')
+    parser.add_argument('--sim-latency', type=float, default=0.05, help='Exchange simulator: seconds per request')
+    parser.add_argument('--sim-jitter', type=float, default=0.02,
+                        help='Exchange simulator: maximum random deviation of the latency in seconds')
+    parser.add_argument('--sim-rate-limit', type=float, default=0.0,
+                        help='Exchange simulator: requests per second before RateLimitExceeded, 0 disables it')
+    parser.add_argument('--sim-seed', type=int, default=0, help='Exchange simulator: seed of the market data')
+    parser.add_argument('--isolate', default='off', choices=['off', 'on', 'netns'],
+                        help='Run every candidate in its own tmpfs sandbox folder with the --isolate-ports remapped to '
+                             'free ports (on), or in a private network namespace without external network (netns)')
+    parser.add_argument('--isolate-ports', default='8000',
+                        help='Isolation: comma separated loopback ports the scripts bind or connect to')
+    parser.add_argument('--http-replay', action='store_true',
+                        help='Record the HTTP calls (requests, httpx, aiohttp) of the base script once and replay them '
+                             'to the base run and every candidate')
+    parser.add_argument('--http-cassette', help='HTTP replay: cassette file (default: ./run/cassettes/<script>.json), '
+                                                'delete it to record again')
+    parser.add_argument('--replay-latency', type=float,
+                        help='HTTP replay: seconds per replayed response (default: the recorded latency)')
+    parser.add_argument('--cache-mode', default='off', choices=['off', 'warm', 'cold', 'both'],
+                        help='Page cache state of the --cache-files before every trial: warm (read first), cold '
+                             '(dropped with posix_fadvise) or both (cold is the objective, warm is reported)')
+    parser.add_argument('--cache-files', default='data/**',
+                        help='Cache mode: comma separated glob patterns of the data files, relative to the working '
+                             'directory of the scripts')
+    parser.add_argument('--equivalence', default='exact', choices=['exact', 'strip', 'unordered'],
+                        help='How candidate output is compared with the reference output')
+    parser.add_argument('--timeout', type=float, help='Kill candidates running longer than this number of seconds')
+    parser.add_argument('--manifest', help='Batch mode: YAML/JSON manifest of scripts to optimise concurrently')
+    parser.add_argument('--llm-concurrency', type=int, default=4, help='Batch mode: maximum concurrent LLM requests')
+    parser.add_argument('--cpu-slots', type=int, help='Batch mode: maximum concurrent script executions (default: CPU count)')
+    parser.add_argument('--race', help='Race several backends on every prompt, e.g. ollama:qwen2.5-coder:14b,openai:gpt-4o')
+    parser.add_argument('--route', help='Model ladder from cheap to strong, e.g. ollama:qwen2.5-coder:14b,anthropic:claude-3-5-sonnet-20241022')
+    parser.add_argument('--escalate-after', type=int, default=3, help='Routing: escalate after this many steps without improvement')
+    parser.add_argument('--escalate-error-rate', type=float, default=0.75,
+                        help='Routing: escalate when this share of the recent candidates failed')
+    parser.add_argument('--error-window', type=int, default=4, help='Routing: number of recent candidates for the error rate')
+    parser.add_argument('--routing-stats', default='./run/routing_stats.json', help='Routing: persisted per-model statistics')
+    parser.add_argument('--family', help='Routing: script family of the statistics (default: script name)')
+    parser.add_argument('--stream', required=False, action='store_true',
+                        help='Stream LLM responses and evaluate the code as soon as its block is complete')
+    parser.add_argument('--max-tokens', type=int, default=8192, help='Hard cap of streamed response tokens')
+    parser.add_argument('--http-max-connections', type=int, default=100,
+                        help='Shared HTTP pool of hosted backends: maximum concurrent connections')
+    parser.add_argument('--http-max-keepalive', type=int, default=20,
+                        help='Shared HTTP pool of hosted backends: maximum idle keep-alive connections')
+    parser.add_argument('--http-keepalive-expiry', type=float, default=60.0,
+                        help='Shared HTTP pool of hosted backends: seconds an idle connection is kept alive')
+    parser.add_argument('--no-http2', required=False, action='store_true', help='Disable HTTP/2 in the shared HTTP pool')
+    parser.add_argument('--metrics-port', type=int, help='Expose Prometheus metrics on this local port')
+    parser.add_argument('--metrics-addr', default='127.0.0.1',
+                        help='Address the metrics port binds, 0.0.0.0 exposes it to the network')
+    parser.add_argument('--fake-responses', help='Fake model: .jsonl/.json responses or experiment folder to replay')
+    parser.add_argument('--fake-latency', type=float, default=0.0, help='Fake model: seconds before the first token')
+    parser.add_argument('--fake-token-rate', type=float, default=0.0, help='Fake model: tokens per second, 0 is unlimited')
+    parser.add_argument('--fake-rate-limit-every', type=int, default=0, help='Fake model: every N-th request gets HTTP 429')
+    return parser
+
+
+def main() -> None:
+    """Main function."""
+    global DEBUG
+    parser = build_parser()
+    args = parser.parse_args()
+    DEBUG = args.debug
+    if not args.manifest and not (args.program and (args.race or args.route or (args.model and args.model_name))):
+        parser.error('--program and --model/--model_name, --race or --route are required without --manifest')
+    if args.search_width < 1:
+        parser.error('--search-width must be at least 1')
+    scripts_args = []
+    if args.manifest:
+        try:
+            scripts_args = load_manifest(args.manifest, args)
+        except (OSError, ValueError) as e:
+            parser.error(str(e))
+    if args.isolate == 'netns':
+        from sandbox import netns_available
+        if not netns_available():
+            print("Network namespaces are unavailable, --isolate netns remaps the --isolate-ports instead")
+    configure_http_pool(
+        max_connections=args.http_max_connections,
+        max_keepalive_connections=args.http_max_keepalive,
+        keepalive_expiry=args.http_keepalive_expiry,
+        http2=not args.no_http2
+    )
+    if args.metrics_port:
+        metrics.start_metrics_server(args.metrics_port, args.metrics_addr)
+    if args.exchange_sim:
+        configure_exchange_sim(args)
+    if args.manifest:
+        run_batch(args, scripts_args)
+        return
+    _, results = optimize(args, create_llm_interface(args))
+    print_summary(results)
 
 
 if __name__ == "__main__":
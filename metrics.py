@@ -0,0 +1,64 @@
+from typing import Any
+
+LATENCY_BUCKETS = (0.1, 0.25, 0.5, 1, 2.5, 5, 10, 20, 40, 60, 120, 300)
+
+
+class _NoMetric:
+    """
+    Stands in for a metric until start_metrics_server() is called, so runs without --metrics-port don't
+    import prometheus_client.
+    """
+    def labels(self, *labels: str) -> '_NoMetric':
+        return self
+
+    def observe(self, value: float) -> None:
+        pass
+
+    def inc(self, value: float = 1) -> None:
+        pass
+
+    def set(self, value: float) -> None:
+        pass
+
+
+# Replaced by the Prometheus metrics in start_metrics_server(), read them as metrics.NAME.
+LLM_REQUEST_SECONDS: Any = _NoMetric()
+LLM_TOKENS: Any = _NoMetric()
+CANDIDATE_EVALUATION_SECONDS: Any = _NoMetric()
+CANDIDATES: Any = _NoMetric()
+BEST_SPEEDUP: Any = _NoMetric()
+
+
+def start_metrics_server(port: int, addr: str = '127.0.0.1') -> None:
+    """
+    Create the metrics and expose them for Prometheus scraping on http://addr:port/metrics.
+
+    Args:
+        port (int): Metrics port.
+        addr (str): Address to bind, the loopback interface by default; '0.0.0.0' exposes the metrics to the network.
+    """
+    global LLM_REQUEST_SECONDS, LLM_TOKENS, CANDIDATE_EVALUATION_SECONDS, CANDIDATES, BEST_SPEEDUP
+    from prometheus_client import Counter, Gauge, Histogram, start_http_server
+
+    LLM_REQUEST_SECONDS = Histogram(
+        'optimizer_llm_request_seconds', 'LLM request latency in seconds (without rate limit sleeps)',
+        ['experiment', 'model'], buckets=LATENCY_BUCKETS
+    )
+    LLM_TOKENS = Counter(
+        'optimizer_llm_tokens_total', 'LLM tokens, direction is "in" (prompt) or "out" (completion)',
+        ['experiment', 'model', 'direction']
+    )
+    CANDIDATE_EVALUATION_SECONDS = Histogram(
+        'optimizer_candidate_evaluation_seconds', 'Wall time of candidate evaluation in seconds',
+        ['experiment'], buckets=LATENCY_BUCKETS
+    )
+    CANDIDATES = Counter(
+        'optimizer_candidates_total', 'Evaluated candidates by outcome (ok, error, mismatch, rejected)',
+        ['experiment', 'outcome']
+    )
+    BEST_SPEEDUP = Gauge(
+        'optimizer_best_speedup', 'Best speedup against the base code of a correct candidate',
+        ['experiment']
+    )
+    start_http_server(port, addr=addr)
+    print(f"Metrics are exposed on http://{addr}:{port}/metrics")
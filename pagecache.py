@@ -0,0 +1,69 @@
+"""
+Page cache control for I/O-bound targets (main.py --cache-mode).
+
+Whether the input of a script like script.py is in the page cache changes its execution time by an
+order of magnitude. Before a trial the data files are either read completely (warm) or flushed and
+dropped from the cache with posix_fadvise(POSIX_FADV_DONTNEED) (cold). Dropping only works for files
+on a disk-backed file system and isn't forced: pages used by another process at the same time may
+stay cached, so cold measurements should run one candidate at a time.
+"""
+import glob
+import os
+from typing import List
+
+READ_CHUNK_SIZE = 4 * 1024 * 1024
+
+
+def cache_files(cwd: str, patterns: str) -> List[str]:
+    """
+    Find the data files of a script.
+
+    Args:
+        cwd (str): Working directory of the script, the patterns are relative to it.
+        patterns (str): Comma separated glob patterns, e.g. 'data/**'.
+
+    Returns:
+        List[str]: Sorted regular files matching the patterns.
+    """
+    files = set()
+    for pattern in filter(None, patterns.split(',')):
+        for path in glob.glob(os.path.join(cwd, pattern.strip()), recursive=True):
+            if os.path.isfile(path):
+                files.add(os.path.realpath(path))
+    return sorted(files)
+
+
+def warm(paths: List[str]) -> None:
+    """Read the files completely so they are in the page cache."""
+    buffer = bytearray(READ_CHUNK_SIZE)
+    for path in paths:
+        with open(path, 'rb', buffering=0) as file:
+            while file.readinto(buffer):
+                pass
+
+
+def evict(paths: List[str]) -> None:
+    """Write back the dirty pages of the files and drop them from the page cache."""
+    for path in paths:
+        fd = os.open(path, os.O_RDONLY)
+        try:
+            os.fdatasync(fd)
+            os.posix_fadvise(fd, 0, 0, os.POSIX_FADV_DONTNEED)
+        finally:
+            os.close(fd)
+
+
+def prepare(paths: List[str], mode: str) -> None:
+    """
+    Bring the files into the state of a trial.
+
+    Args:
+        paths (List[str]): Data files, see cache_files().
+        mode (str): 'warm' or 'cold'.
+    """
+    if mode == 'warm':
+        warm(paths)
+    elif mode == 'cold':
+        evict(paths)
+    else:
+        raise ValueError(f"Unknown cache mode '{mode}', expected warm or cold")
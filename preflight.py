@@ -0,0 +1,190 @@
+import ast
+import importlib.util
+import re
+import sys
+from typing import Dict, Optional, Tuple
+
+FENCE_PATTERN = re.compile(r"```[ \t]*([\w+-]*)[ \t]*\n")
+PYTHON_FENCE_LABELS = ('', 'python', 'python3', 'py')
+IMPORT_ERROR_NAMES = ('ImportError', 'ModuleNotFoundError', 'Exception', 'BaseException')
+
+_module_available: Dict[str, bool] = {}
+
+
+def find_code_block(text: str) -> Optional[str]:
+    """
+    Find the first complete python fenced code block in a (partial) LLM response.
+
+    Args:
+        text (str): The response text received so far.
+
+    Returns:
+        Optional[str]: The code inside the fence, or None if no python block is closed yet.
+    """
+    position = 0
+    while True:
+        match = FENCE_PATTERN.search(text, position)
+        if match is None:
+            return None
+        closing = text.find("\n```", match.end() - 1)
+        if closing == -1:
+            return None
+        if match.group(1).lower() in PYTHON_FENCE_LABELS:
+            return text[match.end():closing + 1]
+        position = closing + 4
+
+
+def extract_code(text: str) -> str:
+    """
+    Extract the python script from an LLM response.
+
+    The first complete python fenced block wins. A response cut before the closing fence
+    gives everything after the opening fence, and a response without fences is taken as is.
+
+    Args:
+        text (str): The LLM response.
+
+    Returns:
+        str: The script content.
+    """
+    code = find_code_block(text)
+    if code is not None:
+        return code
+    match = FENCE_PATTERN.search(text)
+    if match is not None and match.group(1).lower() in PYTHON_FENCE_LABELS:
+        return text[match.end():]
+    return text.strip()
+
+
+def code_fingerprint(tree: ast.Module) -> str:
+    """
+    Fingerprint a script by its AST, ignoring formatting, comments and the module docstring.
+
+    Args:
+        tree (ast.Module): Parsed script.
+
+    Returns:
+        str: The fingerprint.
+    """
+    body = tree.body
+    if body and isinstance(body[0], ast.Expr) and isinstance(body[0].value, ast.Constant) \
+            and isinstance(body[0].value.value, str):
+        body = body[1:]
+    return ast.dump(ast.Module(body=body, type_ignores=[]))
+
+
+def is_module_available(name: str) -> bool:
+    """
+    Check whether a top level module can be imported in the installed environment.
+
+    Args:
+        name (str): Top level module name.
+
+    Returns:
+        bool: True if the module is importable.
+    """
+    if name not in _module_available:
+        if name in sys.stdlib_module_names or name in sys.builtin_module_names:
+            _module_available[name] = True
+        else:
+            try:
+                _module_available[name] = importlib.util.find_spec(name) is not None
+            except (ImportError, ValueError):
+                _module_available[name] = False
+    return _module_available[name]
+
+
+def _guards_import(handler: ast.ExceptHandler) -> bool:
+    """Check whether an except clause catches import errors."""
+    if handler.type is None:
+        return True
+    names = handler.type.elts if isinstance(handler.type, ast.Tuple) else [handler.type]
+    return any(isinstance(name, ast.Name) and name.id in IMPORT_ERROR_NAMES for name in names)
+
+
+def find_missing_imports(tree: ast.Module) -> Tuple[str, ...]:
+    """
+    Find absolute imports that can't be resolved. Imports guarded by try/except ImportError are skipped.
+
+    Args:
+        tree (ast.Module): Parsed script.
+
+    Returns:
+        Tuple[str, ...]: Missing top level module names in order of appearance.
+    """
+    guarded = set()
+    for node in ast.walk(tree):
+        if isinstance(node, ast.Try) and any(_guards_import(handler) for handler in node.handlers):
+            for statement in node.body:
+                guarded.update(id(child) for child in ast.walk(statement))
+    missing = []
+    for node in ast.walk(tree):
+        if id(node) in guarded:
+            continue
+        if isinstance(node, ast.Import):
+            names = [alias.name for alias in node.names]
+        elif isinstance(node, ast.ImportFrom) and node.level == 0 and node.module:
+            names = [node.module]
+        else:
+            continue
+        for name in names:
+            top_level = name.split('.')[0]
+            if not is_module_available(top_level) and top_level not in missing:
+                missing.append(top_level)
+    return tuple(missing)
+
+
+def find_static_issue(tree: ast.Module) -> Optional[str]:
+    """
+    Cheap static rejection of candidates that can't produce a valid run.
+
+    Args:
+        tree (ast.Module): Parsed script.
+
+    Returns:
+        Optional[str]: Issue description or None.
+    """
+    if not tree.body:
+        return "the script is empty"
+    for node in ast.walk(tree):
+        if isinstance(node, ast.Call) and isinstance(node.func, ast.Name) and node.func.id == 'input':
+            return f"line {node.lineno}: input() needs an interactive user, the script runs non-interactively"
+    return None
+
+
+def preflight(response_text: str, seen: Dict[str, int], iteration_number: int) -> Tuple[str, Optional[str]]:
+    """
+    Validate an LLM response before spending a subprocess run on it.
+
+    Stages: fenced block extraction, ast.parse, import resolution against the installed
+    environment, static rejection and duplicate detection. A passed candidate is added to seen.
+
+    Args:
+        response_text (str): The LLM response.
+        seen (Dict[str, int]): Fingerprints of already evaluated candidates mapped to their iteration number.
+            Use -1 for the base code.
+        iteration_number (int): Current iteration number.
+
+    Returns:
+        Tuple[str, Optional[str]]: The script content and the preflight error description or None.
+    """
+    code = extract_code(response_text)
+    try:
+        tree = ast.parse(code)
+        # The compiler catches what the parser accepts, e.g. 'await' outside of an async function.
+        compile(tree, '<candidate>', 'exec')
+    except SyntaxError as e:
+        line = (e.text or '').rstrip()
+        return code, f"Preflight syntax error: line {e.lineno}: {e.msg}: {line}"
+    missing = find_missing_imports(tree)
+    if missing:
+        return code, f"Preflight import error: modules not installed on the user's PC: {', '.join(missing)}"
+    issue = find_static_issue(tree)
+    if issue is not None:
+        return code, f"Preflight static check error: {issue}"
+    fingerprint = code_fingerprint(tree)
+    if fingerprint in seen:
+        origin = 'base_code' if seen[fingerprint] < 0 else f"the code of iteration {seen[fingerprint]}"
+        return code, f"Preflight duplicate error: the script is identical to {origin}, try a different approach"
+    seen[fingerprint] = iteration_number
+    return code, None
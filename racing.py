@@ -0,0 +1,119 @@
+import queue
+import threading
+from concurrent.futures import Future, ThreadPoolExecutor
+from typing import Any, Dict, List
+
+from preflight import preflight
+
+
+class LLMRace:
+    """
+    Send the same prompt to several LLM interfaces concurrently.
+
+    The first response that passes pre-flight wins the race and is evaluated immediately.
+    Valid responses that arrive after the winner go to a secondary queue, the optimizer takes them
+    with queued_responses() and evaluates them without using a step, so a slow provider never stalls
+    the evaluator. Failed or pre-flight rejected late responses are dropped. Every response carries
+    the search node its prompt was built from (origin), queued ones answer older prompts.
+    """
+    def __init__(self, interfaces: List[Any]) -> None:
+        """
+        Initialize the race.
+
+        Args:
+            interfaces (List[Any]): LLM interfaces with generate(stream, max_tokens, **kwargs) and a name.
+        """
+        self.interfaces = interfaces
+        self.secondary: queue.Queue = queue.Queue()
+        self._executor = ThreadPoolExecutor(max_workers=len(interfaces))
+        self._busy = set()
+        # Notified whenever an interface finishes a response.
+        self._lock = threading.Condition()
+
+    def generate(self, stream: bool, max_tokens: int, origin: Any = None, **kwargs: dict) -> Dict[str, Any]:
+        """
+        Get the winner of a new race.
+
+        Interfaces that are still answering a previous prompt don't take part in the new race. If all of
+        them are busy, the race waits for the first one to finish; late responses are only handed out by
+        queued_responses().
+
+        Args:
+            stream (bool): Use the streaming path of the interfaces.
+            max_tokens (int): Hard cap of streamed response tokens.
+            origin (Any): The search node the prompt was built from.
+            **kwargs: Arbitrary keyword arguments for the model.
+
+        Returns:
+            Dict[str, Any]: The response, see LLMInterface.generate().
+        """
+        with self._lock:
+            while True:
+                idle = [interface for interface in self.interfaces if id(interface) not in self._busy]
+                if idle:
+                    break
+                self._lock.wait()
+            self._busy.update(id(interface) for interface in idle)
+
+        race = {"winner": None, "pending": len(idle)}
+        finished = threading.Event()
+
+        def on_done(interface: Any, future: Future) -> None:
+            try:
+                response = future.result()
+            except Exception as e:
+                response = {"model": interface.name, "text": "", "error": f"LLM request failed: {e}",
+                            "latency": 0.0, "usage": (0, 0), "origin": origin}
+            passed = response["error"] is None and preflight(response["text"], {}, 0)[1] is None
+            with self._lock:
+                self._busy.discard(id(interface))
+                self._lock.notify_all()
+                race["pending"] -= 1
+                if race["winner"] is not None:
+                    if passed:
+                        self.secondary.put(response)
+                    return
+                # If every response fails pre-flight, the last one is reported so the error reaches the prompt.
+                if passed or race["pending"] == 0:
+                    race["winner"] = response
+                    finished.set()
+
+        for interface in idle:
+            future = self._executor.submit(interface.generate, stream, max_tokens, origin, **kwargs)
+            future.add_done_callback(lambda f, interface=interface: on_done(interface, f))
+        finished.wait()
+        return race["winner"]
+
+    def queued_responses(self) -> List[Dict[str, Any]]:
+        """
+        Take the valid responses that arrived after the winners of previous races.
+
+        Returns:
+            List[Dict[str, Any]]: The responses in arrival order, see LLMInterface.generate().
+        """
+        responses = []
+        while True:
+            try:
+                responses.append(self.secondary.get_nowait())
+            except queue.Empty:
+                return responses
+
+    def record(self, result: Dict[str, Any]) -> None:
+        """
+        Feedback about an evaluated candidate, the race ignores it.
+
+        Args:
+            result (Dict[str, Any]): An entry of the results list.
+        """
+
+    def escalate(self, reason: str) -> bool:
+        """
+        Ask for a stronger model, the race already uses all of them.
+
+        Args:
+            reason (str): Why the current model is abandoned.
+
+        Returns:
+            bool: Always False.
+        """
+        return False
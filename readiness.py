@@ -0,0 +1,64 @@
+"""
+Readiness probing for server-style scripts.
+
+Replaces fixed `time.sleep(...)` waits after starting a server: polls the port (and optionally a
+health path) with exponential backoff and returns as soon as the server answers. Target scripts
+can import it, the optimizer puts this folder on the PYTHONPATH of every candidate:
+
+    from readiness import wait_for_server
+    server_thread.start()
+    wait_for_server("127.0.0.1", 8000)
+"""
+import http.client
+import os
+import socket
+import time
+from typing import Callable, Optional
+
+# Folder of the harness modules, added to the PYTHONPATH of the candidates.
+HARNESS_DIR = os.path.dirname(os.path.abspath(__file__))
+# Start-up hooks of the candidates (sitecustomize.py), on their PYTHONPATH when a simulator is enabled.
+HARNESS_SITE_DIR = os.path.join(HARNESS_DIR, 'harness_site')
+
+
+def wait_for_server(host: str, port: int, path: Optional[str] = None, timeout: float = 10.0,
+                    initial_delay: float = 0.001, max_delay: float = 0.1,
+                    alive: Optional[Callable[[], bool]] = None) -> bool:
+    """
+    Wait until a server accepts connections.
+
+    Args:
+        host (str): Server host.
+        port (int): Server port.
+        path (Optional[str]): Health path; if set, the server is ready once a GET of it returns a status below 500.
+        timeout (float): Seconds to wait at most.
+        initial_delay (float): First delay between attempts in seconds, doubled after every failed attempt.
+        max_delay (float): Maximum delay between attempts in seconds.
+        alive (Optional[Callable[[], bool]]): Returns False if the server is known to be dead (e.g. its process
+            exited), the wait is aborted then.
+
+    Returns:
+        bool: True if the server is ready, False on timeout or if it died.
+    """
+    deadline = time.monotonic() + timeout
+    delay = initial_delay
+    while alive is None or alive():
+        remaining = deadline - time.monotonic()
+        if remaining <= 0:
+            return False
+        try:
+            if path is None:
+                with socket.create_connection((host, port), timeout=min(1.0, remaining)):
+                    return True
+            connection = http.client.HTTPConnection(host, port, timeout=min(1.0, remaining))
+            try:
+                connection.request("GET", path)
+                if connection.getresponse().status < 500:
+                    return True
+            finally:
+                connection.close()
+        except (OSError, http.client.HTTPException):
+            pass
+        time.sleep(min(delay, max(0.0, deadline - time.monotonic())))
+        delay = min(delay * 2, max_delay)
+    return False
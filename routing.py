@@ -0,0 +1,158 @@
+import fcntl
+import json
+import os
+import threading
+from collections import deque
+from typing import Any, Dict, List
+
+# Escalations / runs of a model above which later runs of the same script family skip it.
+SKIP_ESCALATION_RATE = 0.5
+# Runs of a model before its escalation rate is trusted, a single unlucky run doesn't skip it.
+MIN_RUNS_TO_SKIP = 3
+# Every REPROBE_EVERY-th run of a family starts at the cheapest model again, skipped models get a new chance.
+REPROBE_EVERY = 10
+STATS_FIELDS = ("runs", "candidates", "failures", "improvements", "escalations")
+
+_stats_lock = threading.Lock()
+
+
+class ModelRouter:
+    """
+    Route iterations through a ladder of models, from cheap/fast to strong.
+
+    The current model is escalated to the next one when the best-so-far time doesn't improve
+    for escalate_after candidates or the failure rate of the last error_window candidates reaches
+    max_error_rate. Per-model statistics are persisted per script family, so later runs of the
+    family start at the model that wasn't escalated away from in most of the previous runs
+    (see _starting_tier()).
+    """
+    def __init__(self, tiers: List[Any], family: str, stats_path: str, escalate_after: int = 3,
+                 max_error_rate: float = 0.75, error_window: int = 4) -> None:
+        """
+        Initialize the router.
+
+        Args:
+            tiers (List[Any]): LLM interfaces ordered from the cheapest to the strongest.
+            family (str): Script family the statistics are kept for.
+            stats_path (str): JSON file with the persisted statistics.
+            escalate_after (int): Candidates without improvement before escalation.
+            max_error_rate (float): Failure rate of the last error_window candidates that triggers escalation.
+            error_window (int): Number of recent candidates the failure rate is computed over.
+        """
+        self.tiers = tiers
+        self.family = family
+        self.stats_path = stats_path
+        self.escalate_after = escalate_after
+        self.max_error_rate = max_error_rate
+        self.recent_failures = deque(maxlen=error_window)
+        self.steps_without_improvement = 0
+        self._unsaved = {tier.name: dict.fromkeys(STATS_FIELDS, 0) for tier in tiers}
+        self.current = self._starting_tier(self.load_stats().get(family, {}))
+        self._unsaved[self.tiers[self.current].name]["runs"] += 1
+        print(f"Routing: starting with {self.tiers[self.current].name}")
+
+    def _starting_tier(self, family_stats: Dict[str, Dict[str, int]]) -> int:
+        """
+        Pick the first tier that wasn't escalated away from in most of at least MIN_RUNS_TO_SKIP previous runs of
+        the family, or the cheapest one on every REPROBE_EVERY-th run.
+        """
+        # Every run starts at one tier, every escalation adds a run of the next one.
+        family_runs = sum(stats.get("runs", 0) - stats.get("escalations", 0) for stats in family_stats.values())
+        if family_runs and family_runs % REPROBE_EVERY == 0:
+            print(f"Routing: run {family_runs + 1} of {self.family}, probing the ladder from the cheapest model again")
+            return 0
+        for index, tier in enumerate(self.tiers[:-1]):
+            stats = family_stats.get(tier.name)
+            if not stats or stats["runs"] < MIN_RUNS_TO_SKIP \
+                    or stats["escalations"] / stats["runs"] < SKIP_ESCALATION_RATE:
+                return index
+        return len(self.tiers) - 1
+
+    def load_stats(self) -> Dict[str, Dict[str, Dict[str, int]]]:
+        """
+        Load the persisted statistics.
+
+        Returns:
+            Dict[str, Dict[str, Dict[str, int]]]: family -> model name -> counters.
+        """
+        if not os.path.exists(self.stats_path):
+            return {}
+        with open(self.stats_path, 'r') as file:
+            return json.load(file)
+
+    def save_stats(self) -> None:
+        """
+        Merge the counters collected since the last save into the statistics file. The read-modify-write holds
+        a lock file, so optimizer processes sharing the file don't lose each other's counters.
+        """
+        os.makedirs(os.path.dirname(self.stats_path) or '.', exist_ok=True)
+        with _stats_lock, open(f"{self.stats_path}.lock", 'a') as lock_file:
+            fcntl.flock(lock_file, fcntl.LOCK_EX)
+            all_stats = self.load_stats()
+            family_stats = all_stats.setdefault(self.family, {})
+            for name, counters in self._unsaved.items():
+                stats = family_stats.setdefault(name, dict.fromkeys(STATS_FIELDS, 0))
+                for field, value in counters.items():
+                    stats[field] = stats.get(field, 0) + value
+                    counters[field] = 0
+            tmp_path = f"{self.stats_path}.{os.getpid()}.{threading.get_ident()}.tmp"
+            with open(tmp_path, 'w') as file:
+                json.dump(all_stats, file, indent=2)
+            os.replace(tmp_path, self.stats_path)
+
+    def escalate(self, reason: str) -> bool:
+        """
+        Switch to the next, stronger model.
+
+        Args:
+            reason (str): Why the current model is abandoned.
+
+        Returns:
+            bool: False if the strongest model is already in use.
+        """
+        if self.current == len(self.tiers) - 1:
+            return False
+        self._unsaved[self.tiers[self.current].name]["escalations"] += 1
+        self.current += 1
+        self._unsaved[self.tiers[self.current].name]["runs"] += 1
+        self.steps_without_improvement = 0
+        self.recent_failures.clear()
+        print(f"Routing: {reason}, escalating to {self.tiers[self.current].name}")
+        return True
+
+    def generate(self, stream: bool, max_tokens: int, origin: Any = None, **kwargs: dict) -> Dict[str, Any]:
+        """
+        Ask the current model for a new script version, see LLMInterface.generate().
+        """
+        return self.tiers[self.current].generate(stream, max_tokens, origin, **kwargs)
+
+    def queued_responses(self) -> List[Dict[str, Any]]:
+        """
+        Responses that arrived outside of generate(), the router has none.
+
+        Returns:
+            List[Dict[str, Any]]: Always empty.
+        """
+        return []
+
+    def record(self, result: Dict[str, Any]) -> None:
+        """
+        Update the statistics with an evaluated candidate and escalate if needed.
+
+        Args:
+            result (Dict[str, Any]): An entry of the results list.
+        """
+        counters = self._unsaved[result["model"]]
+        failed = result["execution_error"] or result["output_issue"]
+        counters["candidates"] += 1
+        counters["failures"] += failed
+        counters["improvements"] += result["improved"]
+        if result["model"] == self.tiers[self.current].name:
+            self.recent_failures.append(failed)
+            self.steps_without_improvement = 0 if result["improved"] else self.steps_without_improvement + 1
+            if self.steps_without_improvement >= self.escalate_after:
+                self.escalate(f"no improvement for {self.steps_without_improvement} steps")
+            elif len(self.recent_failures) == self.recent_failures.maxlen \
+                    and sum(self.recent_failures) / len(self.recent_failures) >= self.max_error_rate:
+                self.escalate(f"{sum(self.recent_failures)} of the last {len(self.recent_failures)} candidates failed")
+        self.save_stats()
@@ -0,0 +1,127 @@
+"""
+Per-candidate isolation for concurrent evaluations (main.py --isolate).
+
+Every candidate runs in its own working directory, on tmpfs (/dev/shm) when available, that mirrors
+the original working directory (e.g. ./data) with real directories and symlinked files, so relative
+paths resolve as before and files the candidate creates don't collide. Existing files are shared
+read-only inputs, rewriting one in place changes the original (see sandbox_dir()). Fixed ports
+(e.g. 8000 of script_fapi.py) are either remapped to free ports by the harness_site/sitecustomize.py
+start-up hook, driven by
+
+    OPTIMIZER_PORT_MAP=8000:41234     loopback port -> port actually used, comma separated
+    OPTIMIZER_PORT=41234              the first remapped port, for scripts that read their port
+
+or left as they are inside a private network namespace (`unshare --net`) when it is available.
+"""
+import contextlib
+import functools
+import os
+import shutil
+import socket
+import subprocess
+import tempfile
+from typing import Dict, Iterator, List, Optional
+
+# tmpfs keeps the sandbox creation and the files written by candidates off the disk.
+SANDBOX_ROOT = '/dev/shm' if os.path.isdir('/dev/shm') and os.access('/dev/shm', os.W_OK) else None
+# Runs a command in new user and network namespaces with the loopback interface up.
+NETNS_COMMAND = ['unshare', '--user', '--map-root-user', '--net', 'sh', '-c', 'ip link set lo up && exec "$@"', 'sh']
+LOOPBACK_HOSTS = ('', '0.0.0.0', '::', 'localhost', '::1')
+# Top-level entries of the working directory that candidates never need.
+SANDBOX_EXCLUDE = ('run', '.git', '__pycache__')
+
+
+@contextlib.contextmanager
+def sandbox_dir(source_dir: str, root: Optional[str] = SANDBOX_ROOT) -> Iterator[str]:
+    """
+    Create a temporary working directory that mirrors source_dir, removed on exit.
+
+    Directories are recreated in the sandbox, so files a candidate creates anywhere in the tree (e.g.
+    data/out.csv or an output subfolder) are private to it. Files are symlinked: they are read-only
+    inputs, a candidate that rewrites an existing file in place still writes the shared original.
+    The SANDBOX_EXCLUDE entries of source_dir (the experiment folders in run/, .git, caches) are left out.
+
+    Args:
+        source_dir (str): Directory mirrored into the sandbox.
+        root (Optional[str]): Parent of the sandbox, /dev/shm by default, the system temporary folder without it.
+
+    Yields:
+        str: Path of the sandbox.
+    """
+    path = tempfile.mkdtemp(prefix='candidate_', dir=root)
+    source_dir = os.path.abspath(source_dir)
+    try:
+        for directory, subdirectories, files in os.walk(source_dir):
+            relative = os.path.relpath(directory, source_dir)
+            target = os.path.normpath(os.path.join(path, relative))
+            if relative == '.':
+                subdirectories[:] = [name for name in subdirectories if name not in SANDBOX_EXCLUDE]
+                files = [name for name in files if name not in SANDBOX_EXCLUDE]
+            else:
+                os.mkdir(target)
+            # os.walk doesn't descend into symlinked directories, they are linked as a whole like the files.
+            for name in [name for name in subdirectories if os.path.islink(os.path.join(directory, name))] + files:
+                os.symlink(os.path.join(directory, name), os.path.join(target, name))
+        yield path
+    finally:
+        # rmtree unlinks the symlinks, the linked files are left alone.
+        shutil.rmtree(path, ignore_errors=True)
+
+
+def allocate_ports(ports: List[int]) -> Dict[int, int]:
+    """Pick a free local TCP port for each of ports."""
+    sockets = []
+    try:
+        for _ in ports:
+            sock = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
+            sock.bind(('127.0.0.1', 0))
+            sockets.append(sock)
+        return {port: sock.getsockname()[1] for port, sock in zip(ports, sockets)}
+    finally:
+        for sock in sockets:
+            sock.close()
+
+
+def format_port_map(mapping: Dict[int, int]) -> str:
+    """Format a port map as OPTIMIZER_PORT_MAP, e.g. '8000:41234,8001:41235'."""
+    return ','.join(f"{port}:{target}" for port, target in mapping.items())
+
+
+def parse_port_map(value: str) -> Dict[int, int]:
+    """Parse an OPTIMIZER_PORT_MAP value."""
+    mapping = {}
+    for item in filter(None, value.split(',')):
+        port, target = item.split(':')
+        mapping[int(port)] = int(target)
+    return mapping
+
+
+@functools.lru_cache(maxsize=None)
+def netns_available() -> bool:
+    """Whether commands can run in a private network namespace (needs unshare, ip and user namespaces)."""
+    try:
+        return subprocess.run(NETNS_COMMAND + ['true'], capture_output=True, timeout=10).returncode == 0
+    except (OSError, subprocess.TimeoutExpired):
+        return False
+
+
+def install_port_map(mapping: Dict[int, int]) -> None:
+    """
+    Remap the ports of this process: bind(), connect() and connect_ex() of loopback and wildcard addresses with
+    a port of mapping use the mapped port instead.
+
+    Args:
+        mapping (Dict[int, int]): Port -> port actually used.
+    """
+    def remap(address: object) -> object:
+        if isinstance(address, tuple) and len(address) >= 2 and address[1] in mapping and isinstance(address[0], str) \
+                and (address[0] in LOOPBACK_HOSTS or address[0].startswith('127.')):
+            return (address[0], mapping[address[1]], *address[2:])
+        return address
+
+    original_bind = socket.socket.bind
+    original_connect = socket.socket.connect
+    original_connect_ex = socket.socket.connect_ex
+    socket.socket.bind = lambda self, address: original_bind(self, remap(address))
+    socket.socket.connect = lambda self, address: original_connect(self, remap(address))
+    socket.socket.connect_ex = lambda self, address: original_connect_ex(self, remap(address))
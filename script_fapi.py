@@ -3,7 +3,7 @@ from pydantic import BaseModel
 from threading import Thread
 import uvicorn
 import requests
-import time
+from readiness import wait_for_server
 
 # Define the FastAPI app
 app = FastAPI()
@@ -55,8 +55,8 @@ def run_server():
 server_thread = Thread(target=run_server, daemon=True)
 server_thread.start()
 
-# Allow some time for the server to start
-time.sleep(1)
+# Wait until the server accepts connections
+wait_for_server("127.0.0.1", 8000)
 
 # Client sends complex JSON to the API
 try:
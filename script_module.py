@@ -0,0 +1,117 @@
+"""
+Load a target script as a module without running its example code.
+
+Target scripts define their functions (or ASGI app) and then exercise them at the bottom: start a
+server thread, send client requests, sort an example list and print the result. The benchmarks
+(loadbench.py, sortbench.py) need the definitions only, so every top-level statement is kept
+(imports with their try/except ImportError fallbacks, assignments, app.include_router(...), ...)
+except:
+    * the `if __name__ == "__main__":` block,
+    * expression statements calling print() or a function/class defined by the script itself,
+    * statements calling one of the given names (exact dotted names, e.g. 'uvicorn.run') outside
+      of a function or class body,
+    * statements starting a thread, `Thread(...).start()` or `server_thread.start()`.
+"""
+import ast
+from typing import Iterable, Iterator, Optional, Set
+
+THREAD_CLASSES = ('Thread', 'threading.Thread')
+
+
+def dotted_name(node: ast.AST) -> str:
+    """Dotted name of a Name/Attribute chain, e.g. 'uvicorn.run', empty for anything else."""
+    parts = []
+    while isinstance(node, ast.Attribute):
+        parts.append(node.attr)
+        node = node.value
+    if not isinstance(node, ast.Name):
+        return ''
+    parts.append(node.id)
+    return '.'.join(reversed(parts))
+
+
+def _module_level_calls(node: ast.AST) -> Iterator[ast.Call]:
+    """Calls run when a statement runs, bodies of nested functions, classes and lambdas are skipped."""
+    if isinstance(node, ast.Call):
+        yield node
+    for child in ast.iter_child_nodes(node):
+        if not isinstance(child, (ast.FunctionDef, ast.AsyncFunctionDef, ast.ClassDef, ast.Lambda)):
+            yield from _module_level_calls(child)
+
+
+def is_main_guard(node: ast.stmt) -> bool:
+    """Check whether a statement is `if __name__ == "__main__":`."""
+    if not isinstance(node, ast.If) or not isinstance(node.test, ast.Compare):
+        return False
+    operands = [node.test.left, *node.test.comparators]
+    return any(isinstance(operand, ast.Name) and operand.id == '__name__' for operand in operands) and \
+        any(isinstance(operand, ast.Constant) and operand.value == '__main__' for operand in operands)
+
+
+def _is_thread_start(call: ast.Call, threads: Set[str]) -> bool:
+    """Check whether a call is `Thread(...).start()` or `<thread variable>.start()`."""
+    if not isinstance(call.func, ast.Attribute) or call.func.attr != 'start':
+        return False
+    target = call.func.value
+    if isinstance(target, ast.Call):
+        return dotted_name(target.func) in THREAD_CLASSES
+    return dotted_name(target) in threads
+
+
+def extract_module(code: str, skip_calls: Iterable[str] = ()) -> ast.Module:
+    """
+    Strip a script to the statements that define its module, see the module docstring.
+
+    Args:
+        code (str): The script.
+        skip_calls (Iterable[str]): Exact dotted names of calls whose top-level statements are dropped,
+            e.g. ('uvicorn.run', 'requests.post') or the function a benchmark calls itself.
+
+    Returns:
+        ast.Module: The stripped module.
+
+    Raises:
+        SyntaxError: If the script can't be parsed.
+    """
+    tree = ast.parse(code)
+    skip_calls = set(skip_calls)
+    defined = {node.name for node in tree.body
+               if isinstance(node, (ast.FunctionDef, ast.AsyncFunctionDef, ast.ClassDef))}
+    threads = {target.id for node in tree.body if isinstance(node, ast.Assign) and isinstance(node.value, ast.Call)
+               and dotted_name(node.value.func) in THREAD_CLASSES
+               for target in node.targets if isinstance(target, ast.Name)}
+    body = []
+    for node in tree.body:
+        if is_main_guard(node):
+            continue
+        if isinstance(node, ast.Expr):
+            value = node.value.value if isinstance(node.value, ast.Await) else node.value
+            if isinstance(value, ast.Call) and dotted_name(value.func) in ({'print'} | defined):
+                continue
+        if not isinstance(node, (ast.FunctionDef, ast.AsyncFunctionDef, ast.ClassDef)) and any(
+                dotted_name(call.func) in skip_calls or _is_thread_start(call, threads)
+                for call in _module_level_calls(node)):
+            continue
+        body.append(node)
+    tree.body = body
+    return tree
+
+
+def find_assigned_call(tree: ast.Module, class_names: Iterable[str]) -> Optional[str]:
+    """
+    Find the first top-level `X = <class>(...)` of one of the given class names (last part of the dotted name).
+
+    Args:
+        tree (ast.Module): Parsed module.
+        class_names (Iterable[str]): Class names, e.g. ('FastAPI', 'Starlette').
+
+    Returns:
+        Optional[str]: The variable name, None if there is no such assignment.
+    """
+    class_names = set(class_names)
+    for node in tree.body:
+        if isinstance(node, ast.Assign) and isinstance(node.value, ast.Call) \
+                and dotted_name(node.value.func).split('.')[-1] in class_names \
+                and isinstance(node.targets[0], ast.Name):
+            return node.targets[0].id
+    return None
@@ -0,0 +1,346 @@
+import ast
+import builtins
+import math
+import random
+from typing import List, Optional, Set, Tuple
+
+from preflight import code_fingerprint
+from script_module import is_main_guard
+
+# Model name of the candidates produced by crossover instead of an LLM.
+CROSSOVER_MODEL = 'crossover'
+
+# (parent, mate, code): an LLM expansion of parent when code is None, otherwise a crossover child of parent and mate.
+Proposal = Tuple['SearchNode', Optional['SearchNode'], Optional[str]]
+
+
+class SearchNode:
+    """An evaluated script version: the base code (iteration -1) or a candidate."""
+    def __init__(self, iteration: int, code: str, parent: Optional['SearchNode'], execution_time: int = 0,
+                 execution_error: bool = False, output_issue: bool = False, error_description: str = '',
+                 output: str = '', mate: Optional['SearchNode'] = None) -> None:
+        """
+        Initialize the node.
+
+        Args:
+            iteration (int): Iteration number, -1 for the base code.
+            code (str): The script content.
+            parent (Optional[SearchNode]): The node the prompt was built from, None for the base code.
+            execution_time (int): Execution time in microseconds.
+            execution_error (bool): The candidate was rejected or crashed.
+            output_issue (bool): The output didn't match the reference.
+            error_description (str): Error description sent to the next prompt.
+            output (str): Output of the script.
+            mate (Optional[SearchNode]): The second parent of a crossover child.
+        """
+        self.iteration = iteration
+        self.code = code
+        self.parent = parent
+        self.mate = mate
+        self.execution_time = execution_time
+        self.execution_error = execution_error
+        self.output_issue = output_issue
+        self.error_description = error_description
+        self.output = output
+        self.children: List['SearchNode'] = []
+        self.failed_children = 0
+        self.pruned = False
+
+    @property
+    def failed(self) -> bool:
+        """The candidate can't be used: rejected, crashed or with a wrong output."""
+        return self.execution_error or self.output_issue
+
+
+class LinearSearch:
+    """The original chain: every prompt is built from the latest candidate, failed or not."""
+    def __init__(self, root: SearchNode) -> None:
+        """
+        Initialize the search.
+
+        Args:
+            root (SearchNode): The base code node.
+        """
+        self.latest = root
+
+    def select(self, count: int) -> List[Proposal]:
+        """
+        Pick the nodes to build the next prompts from. The chain can't branch, so count is ignored.
+
+        Args:
+            count (int): Number of wanted parallel expansions.
+
+        Returns:
+            List[Proposal]: An expansion of the latest node.
+        """
+        return [(self.latest, None, None)]
+
+    def add(self, node: SearchNode) -> None:
+        """
+        Add an evaluated candidate.
+
+        Args:
+            node (SearchNode): The candidate.
+        """
+        node.parent.children.append(node)
+        self.latest = node
+
+
+class TreeSearch:
+    """
+    Best-first tree search over candidates.
+
+    Every evaluated candidate is a node. The next prompts are built from the nodes with the highest
+    UCB score: normalized speedup plus an exploration bonus for rarely expanded nodes. Failed candidates
+    are pruned, and so is a node whose children failed max_failed_children times (the base code never is).
+    """
+    def __init__(self, root: SearchNode, exploration: float = 1.0, max_failed_children: int = 2) -> None:
+        """
+        Initialize the search.
+
+        Args:
+            root (SearchNode): The base code node.
+            exploration (float): Weight of the exploration bonus.
+            max_failed_children (int): Failed expansions after which a node is pruned.
+        """
+        self.root = root
+        self.exploration = exploration
+        self.max_failed_children = max_failed_children
+        self.nodes = [root]
+
+    def score(self, node: SearchNode, best_time: int, total_expansions: int, pending: int = 0) -> float:
+        """
+        UCB score of a node.
+
+        Args:
+            node (SearchNode): A correct node.
+            best_time (int): Best execution time among the correct nodes, 0 if none of them has a measured time.
+            total_expansions (int): Number of expansions of all nodes.
+            pending (int): Expansions of the node already selected in this round.
+
+        Returns:
+            float: The score.
+        """
+        if best_time == 0:
+            # Nothing to compare yet, the exploration bonus alone decides.
+            reward = 1.0
+        else:
+            reward = best_time / node.execution_time if node.execution_time > 0 else 0.0
+        visits = len(node.children) + pending
+        return reward + self.exploration * math.sqrt(math.log(total_expansions + 1) / (visits + 1))
+
+    def select(self, count: int) -> List[Proposal]:
+        """
+        Pick the nodes to build the next prompts from, a node can be picked several times.
+
+        Args:
+            count (int): Number of parallel expansions.
+
+        Returns:
+            List[Proposal]: Expansions of the selected nodes.
+        """
+        candidates = [node for node in self.nodes if not node.failed and not node.pruned]
+        best_time = min((node.execution_time for node in candidates if node.execution_time > 0), default=0)
+        total_expansions = len(self.nodes) - 1
+        pending = {id(node): 0 for node in candidates}
+        selected = []
+        for _ in range(count):
+            node = max(candidates, key=lambda n: self.score(n, best_time, total_expansions, pending[id(n)]))
+            pending[id(node)] += 1
+            total_expansions += 1
+            selected.append((node, None, None))
+        return selected
+
+    def add(self, node: SearchNode) -> None:
+        """
+        Add an evaluated candidate, pruning failed branches.
+
+        Args:
+            node (SearchNode): The candidate.
+        """
+        parent = node.parent
+        parent.children.append(node)
+        self.nodes.append(node)
+        if node.failed:
+            node.pruned = True
+            parent.failed_children += 1
+            if parent.failed_children >= self.max_failed_children and parent is not self.root:
+                parent.pruned = True
+
+
+def _bound_names(node: ast.AST) -> Set[str]:
+    """Names a statement binds: defined functions and classes, assigned names, imports and exception names."""
+    if isinstance(node, (ast.FunctionDef, ast.AsyncFunctionDef, ast.ClassDef)):
+        return {node.name}
+    names = set()
+    for child in ast.walk(node):
+        if isinstance(child, ast.Name) and isinstance(child.ctx, (ast.Store, ast.Del)):
+            names.add(child.id)
+        elif isinstance(child, (ast.FunctionDef, ast.AsyncFunctionDef, ast.ClassDef)):
+            names.add(child.name)
+        elif isinstance(child, (ast.Import, ast.ImportFrom)):
+            names.update(alias.asname or alias.name.split('.')[0] for alias in child.names)
+        elif isinstance(child, ast.ExceptHandler) and child.name:
+            names.add(child.name)
+        elif isinstance(child, ast.arg):
+            names.add(child.arg)
+    return names
+
+
+def _free_names(node: ast.AST) -> Tuple[Set[str], Set[str]]:
+    """
+    Module-level names a top-level statement uses.
+
+    Returns:
+        Tuple[Set[str], Set[str]]: Names it loads but doesn't bind itself (builtins excluded), and the names it
+            declares global (they may be created by the statement itself at run time).
+    """
+    loaded = {child.id for child in ast.walk(node) if isinstance(child, ast.Name) and isinstance(child.ctx, ast.Load)}
+    declared = set().union(*(child.names for child in ast.walk(node) if isinstance(child, ast.Global)))
+    local = set().union(*(_bound_names(child) for child in ast.walk(node) if isinstance(child, (ast.stmt, ast.arg))))
+    return loaded - local - declared - set(dir(builtins)), declared
+
+
+def crossover(code: str, mate_code: str, rng: random.Random) -> Optional[str]:
+    """
+    Replace a random non-empty subset of the top-level functions of code with their versions from mate_code.
+    Top-level imports of mate_code missing in code are added after the imports of code, and top-level
+    statements of mate_code defining names the swapped functions need (e.g. `RX = re.compile(...)`, helper
+    functions) but code doesn't define are added before the first swapped function.
+
+    Args:
+        code (str): The script the child is based on.
+        mate_code (str): The script the functions are taken from.
+        rng (random.Random): Random generator.
+
+    Returns:
+        Optional[str]: The child script, None if the scripts have no differing functions with the same name or
+            the child would use names neither script defines.
+    """
+    tree = ast.parse(code)
+    mate_tree = ast.parse(mate_code)
+    function_types = (ast.FunctionDef, ast.AsyncFunctionDef)
+    import_types = (ast.Import, ast.ImportFrom)
+    mate_functions = {node.name: node for node in mate_tree.body if isinstance(node, function_types)}
+    swappable = [index for index, node in enumerate(tree.body) if isinstance(node, function_types)
+                 and node.name in mate_functions and ast.dump(node) != ast.dump(mate_functions[node.name])]
+    if not swappable:
+        return None
+    swapped = sorted(rng.sample(swappable, rng.randint(1, len(swappable))))
+    for index in swapped:
+        tree.body[index] = mate_functions[tree.body[index].name]
+
+    known_imports = {ast.dump(node) for node in tree.body if isinstance(node, import_types)}
+    missing_imports = [node for node in mate_tree.body
+                       if isinstance(node, import_types) and ast.dump(node) not in known_imports]
+    defined = set().union(*(_bound_names(node) for node in tree.body + missing_imports))
+
+    # Mate statements defining the names the swapped functions (and the copied statements) use.
+    mate_definitions = [node for node in mate_tree.body
+                        if not isinstance(node, import_types + (ast.Expr,)) and not is_main_guard(node)]
+    copied = set()
+    added = [tree.body[index] for index in swapped]
+    while added:
+        required, declared = set(), set()
+        for node in added:
+            node_required, node_declared = _free_names(node)
+            required |= node_required
+            declared |= node_declared
+        required -= defined
+        declared -= defined
+        added = [node for node in mate_definitions
+                 if id(node) not in copied and _bound_names(node) & (required | declared)]
+        for node in added:
+            copied.add(id(node))
+            defined |= _bound_names(node)
+        if required - defined:
+            # The child would raise NameError, don't spend an evaluation on it.
+            return None
+    first_swapped = tree.body[swapped[0]]
+    tree.body[swapped[0]:swapped[0]] = [node for node in mate_definitions if id(node) in copied]
+
+    position = 0
+    for index, node in enumerate(tree.body):
+        if node is first_swapped or id(node) in copied:
+            break
+        is_docstring = index == 0 and isinstance(node, ast.Expr) and isinstance(node.value, ast.Constant) \
+            and isinstance(node.value.value, str)
+        if is_docstring or isinstance(node, import_types):
+            position = index + 1
+    tree.body[position:position] = missing_imports
+    return ast.unparse(tree)
+
+
+class GeneticSearch:
+    """
+    Evolutionary search over a population of correct candidates.
+
+    The population holds the population_size fastest correct nodes. Parents are picked by tournament
+    selection; a child is either an LLM mutation of one parent or, with crossover_rate probability, a
+    crossover that takes top-level functions of a second parent (see crossover()). Crossover children
+    identical to an already evaluated script are replaced with LLM mutations.
+    """
+    def __init__(self, root: SearchNode, population_size: int = 6, crossover_rate: float = 0.3,
+                 seed: Optional[int] = None) -> None:
+        """
+        Initialize the search.
+
+        Args:
+            root (SearchNode): The base code node.
+            population_size (int): Number of correct nodes kept in the population.
+            crossover_rate (float): Probability that a child is produced by crossover instead of the LLM.
+            seed (Optional[int]): Seed of the random generator.
+        """
+        self.population_size = population_size
+        self.crossover_rate = crossover_rate
+        self.rng = random.Random(seed)
+        self.population = [root]
+        self.known = {code_fingerprint(ast.parse(root.code))}
+
+    def _tournament(self, exclude: Optional[SearchNode] = None) -> SearchNode:
+        """Pick the faster of two random population members."""
+        pool = [node for node in self.population if node is not exclude]
+        return min(self.rng.sample(pool, min(2, len(pool))), key=lambda node: node.execution_time)
+
+    def select(self, count: int) -> List[Proposal]:
+        """
+        Plan the next children.
+
+        Args:
+            count (int): Number of parallel children.
+
+        Returns:
+            List[Proposal]: LLM mutations and crossover children.
+        """
+        proposals = []
+        for _ in range(count):
+            parent = self._tournament()
+            if len(self.population) > 1 and self.rng.random() < self.crossover_rate:
+                mate = self._tournament(exclude=parent)
+                child_code = crossover(parent.code, mate.code, self.rng)
+                if child_code is not None:
+                    fingerprint = code_fingerprint(ast.parse(child_code))
+                    if fingerprint not in self.known:
+                        self.known.add(fingerprint)
+                        proposals.append((parent, mate, child_code))
+                        continue
+            proposals.append((parent, None, None))
+        return proposals
+
+    def add(self, node: SearchNode) -> None:
+        """
+        Add an evaluated child, correct children compete for a place in the population.
+
+        Args:
+            node (SearchNode): The child.
+        """
+        node.parent.children.append(node)
+        try:
+            self.known.add(code_fingerprint(ast.parse(node.code)))
+        except (SyntaxError, ValueError):
+            pass
+        if node.failed or node.execution_time <= 0:
+            return
+        self.population.append(node)
+        self.population.sort(key=lambda member: member.execution_time)
+        del self.population[self.population_size:]
@@ -0,0 +1,260 @@
+"""
+Parametric sort benchmark for sorting targets like script_sorting.py (main.py --bench sort).
+
+script_sorting.py sorts one fixed 8-element list, so its execution time says nothing about the
+algorithm. This suite calls the sort function of a candidate (very_inefficient_sort by default,
+loaded without the example run of the script) on seeded inputs of growing sizes and several
+distributions, and checks every result against sorted() through a SHA-256 digest instead of printing
+it. Every case has a time budget; a case over it, and the larger ones of its distribution, count as
+the budget, so the total time stays comparable between a quadratic base and a fast candidate.
+
+The suite runs in a subprocess of the candidate:
+    python3 sortbench.py script_sorting.py --sizes 1e2,1e3,1e4 --budget 5 --results results.json
+"""
+import argparse
+import gc
+import hashlib
+import itertools
+import json
+import os
+import random
+import signal
+import subprocess
+import sys
+import tempfile
+import time
+from array import array
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+from script_module import extract_module
+
+DISTRIBUTIONS = ('random', 'sorted', 'reversed', 'few_unique', 'nearly_sorted')
+DEFAULT_SIZES = '1e2,1e3,1e4,1e5,1e6,1e7'
+# Digests of the sorted inputs, sorting the reference of a 1e7 input costs as much as the fastest candidates.
+DIGEST_CACHE = os.path.join(tempfile.gettempdir(), 'sortbench_digests.json')
+
+
+class CaseTimeout(BaseException):
+    """
+    A case ran over its time budget. Raised from the SIGALRM handler inside the candidate's sort function, it
+    derives from BaseException like KeyboardInterrupt so a candidate's `except Exception` can't swallow it.
+    """
+
+
+def generate_case(distribution: str, size: int, seed: int = 0) -> List[int]:
+    """
+    Build the input of a case, the same for the same distribution, size and seed.
+
+    Args:
+        distribution (str): One of DISTRIBUTIONS.
+        size (int): Number of elements.
+        seed (int): Seed of the random generator.
+
+    Returns:
+        List[int]: The unsorted input.
+    """
+    rng = random.Random(f"{seed}:{distribution}:{size}")
+    if distribution == 'random':
+        return array('I', rng.randbytes(4 * size)).tolist()
+    if distribution == 'few_unique':
+        return [value % 10 for value in rng.randbytes(size)]
+    if distribution not in DISTRIBUTIONS:
+        raise ValueError(f"Unknown distribution '{distribution}', expected one of {', '.join(DISTRIBUTIONS)}")
+    # Sorted values built from random gaps, sorting random values would dominate the generation of large inputs.
+    data = list(itertools.accumulate(rng.randbytes(size)))
+    if distribution == 'reversed':
+        data.reverse()
+    elif distribution == 'nearly_sorted':
+        # 1% of the elements swapped with a random other one.
+        for _ in range(max(1, size // 100)):
+            i, j = rng.randrange(size), rng.randrange(size)
+            data[i], data[j] = data[j], data[i]
+    return data
+
+
+def digest(values: Any) -> str:
+    """SHA-256 of a sequence of integers."""
+    return hashlib.sha256(array('q', values).tobytes()).hexdigest()
+
+
+def load_digests(path: str) -> Dict[str, str]:
+    """Read the digest cache, empty if it doesn't exist yet."""
+    try:
+        with open(path, 'r') as file:
+            return json.load(file)
+    except (OSError, ValueError):
+        return {}
+
+
+def save_digests(path: str, digests: Dict[str, str]) -> None:
+    """Write the digest cache atomically, candidates may run concurrently."""
+    fd, temporary_path = tempfile.mkstemp(dir=os.path.dirname(path), prefix='.sortbench_digests_')
+    with os.fdopen(fd, 'w') as file:
+        json.dump(digests, file)
+    os.replace(temporary_path, path)
+
+
+def parse_sizes(value: str) -> List[int]:
+    """Parse comma separated sizes, e.g. '1e2,1e3,5000'."""
+    return [int(float(size)) for size in value.split(',') if size]
+
+
+def load_function(program_path: str, function_name: str) -> Callable[[List[int]], Any]:
+    """
+    Load the sort function of a script, without the example run at the bottom of it (see script_module.py).
+    Statements calling the sort function itself, e.g. `sorted_list = very_inefficient_sort(unsorted_list)`, are
+    dropped too.
+    """
+    with open(program_path, 'r') as file:
+        tree = extract_module(file.read(), (function_name,))
+    namespace: Dict[str, Any] = {"__name__": "sortbench_target", "__file__": os.path.abspath(program_path)}
+    exec(compile(tree, program_path, 'exec'), namespace)
+    if function_name not in namespace:
+        raise ValueError(f"{program_path} doesn't define the sort function {function_name}()")
+    return namespace[function_name]
+
+
+def _on_alarm(signum: int, frame: Any) -> None:
+    raise CaseTimeout()
+
+
+def run_suite(sort: Callable[[List[int]], Any], sizes: List[int], distributions: List[str], seed: int = 0,
+              budget: float = 10.0) -> List[Dict[str, Any]]:
+    """
+    Run every case of the suite in this process.
+
+    Args:
+        sort (Callable[[List[int]], Any]): The sort function, it gets a list and returns the sorted values (or
+            sorts the list in place and returns None).
+        sizes (List[int]): Input sizes, run in increasing order.
+        distributions (List[str]): Input distributions, see DISTRIBUTIONS.
+        seed (int): Seed of the inputs.
+        budget (float): Seconds per case.
+
+    Returns:
+        List[Dict[str, Any]]: Per case "distribution", "size", "seconds" and "status" (ok, wrong, error, timeout
+            or skipped, the budget is counted as seconds for the last two), and "error" for errors.
+    """
+    previous_handler = signal.signal(signal.SIGALRM, _on_alarm)
+    digests = load_digests(DIGEST_CACHE)
+    known_digests = len(digests)
+    cases = []
+    try:
+        for distribution in distributions:
+            over_budget = False
+            for size in sorted(sizes):
+                case = {"distribution": distribution, "size": size, "seconds": budget, "status": 'skipped'}
+                cases.append(case)
+                if over_budget:
+                    continue
+                data = generate_case(distribution, size, seed)
+                key = f"{seed}:{distribution}:{size}"
+                if key not in digests:
+                    digests[key] = digest(sorted(data))
+                result = None
+                gc.collect()
+                start = time.perf_counter()
+                try:
+                    # Repeats every second past the budget, in case the candidate swallows one alarm anyway.
+                    signal.setitimer(signal.ITIMER_REAL, budget, 1.0)
+                    try:
+                        result = sort(data)
+                    finally:
+                        signal.setitimer(signal.ITIMER_REAL, 0)
+                    case["seconds"] = time.perf_counter() - start
+                    case["status"] = 'ok' if digest(data if result is None else result) == digests[key] else 'wrong'
+                except CaseTimeout:
+                    case["status"] = 'timeout'
+                    over_budget = True
+                except Exception as e:
+                    case["status"] = 'error'
+                    case["error"] = f"{type(e).__name__}: {e}"
+                # Free the result here, not in the timed assignment of the next case.
+                del result, data
+    finally:
+        signal.signal(signal.SIGALRM, previous_handler)
+        if len(digests) > known_digests:
+            save_digests(DIGEST_CACHE, digests)
+    return cases
+
+
+def run_sort_benchmark(program_path: str, function_name: str = 'very_inefficient_sort', sizes: str = DEFAULT_SIZES,
+                       distributions: str = ','.join(DISTRIBUTIONS), seed: int = 0, budget: float = 10.0,
+                       timeout: Optional[float] = None, cwd: Optional[str] = None,
+                       env: Optional[Dict[str, str]] = None) -> Tuple[str, str, Dict[str, Any], bool]:
+    """
+    Run the suite against a script in a subprocess.
+
+    Args:
+        program_path (str): Path to the script.
+        function_name (str): Sort function of the script.
+        sizes (str): Comma separated input sizes.
+        distributions (str): Comma separated input distributions.
+        seed (int): Seed of the inputs.
+        budget (float): Seconds per case.
+        timeout (Optional[float]): Seconds after which the suite is killed and reported as failed.
+        cwd (Optional[str]): Working directory of the suite.
+        env (Optional[Dict[str, str]]): Environment of the suite.
+
+    Returns:
+        Tuple[str, str, Dict[str, Any], bool]: Output (the suite and its wrong cases, compared with the reference),
+            error message, statistics ("seconds" total with the budget for unfinished cases, "finished", "cases"
+            list) and error status.
+    """
+    fd, results_path = tempfile.mkstemp(prefix='sortbench_', suffix='.json')
+    os.close(fd)
+    try:
+        try:
+            result = subprocess.run(
+                ['python3', os.path.abspath(__file__), os.path.abspath(program_path), '--function', function_name,
+                 '--sizes', sizes, '--distributions', distributions, '--seed', str(seed), '--budget', str(budget),
+                 '--results', results_path],
+                capture_output=True, text=True, timeout=timeout, cwd=cwd, env=env
+            )
+        except subprocess.TimeoutExpired:
+            return '', f"Timeout: the sort suite was killed after {timeout} seconds", {}, True
+        if result.returncode != 0:
+            return result.stdout, result.stderr, {}, True
+        with open(results_path, 'r') as file:
+            cases = json.load(file)
+    finally:
+        os.remove(results_path)
+    failures = [case for case in cases if case["status"] in ('wrong', 'error')]
+    lines = [f"Sort suite: {len(cases)} cases, seed {seed}"]
+    lines += [f"{case['status']}: {case['distribution']} {case['size']} {case.get('error', '')}".rstrip()
+              for case in failures]
+    stats = {
+        "seconds": sum(case["seconds"] for case in cases),
+        "finished": sum(case["status"] == 'ok' for case in cases),
+        "cases": cases,
+    }
+    if failures:
+        return '\n'.join(lines), f"{len(failures)} of {len(cases)} cases returned a wrong result or failed", stats, True
+    return '\n'.join(lines), '', stats, False
+
+
+def main() -> None:
+    """Run the suite against a script and write the results (the subprocess side of run_sort_benchmark())."""
+    parser = argparse.ArgumentParser(description='Parametric sort benchmark.')
+    parser.add_argument('program', help='Script defining the sort function')
+    parser.add_argument('--function', default='very_inefficient_sort', help='Sort function of the script')
+    parser.add_argument('--sizes', default=DEFAULT_SIZES, help='Comma separated input sizes')
+    parser.add_argument('--distributions', default=','.join(DISTRIBUTIONS), help='Comma separated distributions')
+    parser.add_argument('--seed', type=int, default=0, help='Seed of the inputs')
+    parser.add_argument('--budget', type=float, default=10.0, help='Seconds per case')
+    parser.add_argument('--results', help='JSON results file, printed without it')
+    args = parser.parse_args()
+    # The script folder is importable like when the script runs itself.
+    sys.path.insert(0, os.path.dirname(os.path.abspath(args.program)))
+    sort = load_function(args.program, args.function)
+    cases = run_suite(sort, parse_sizes(args.sizes), args.distributions.split(','), args.seed, args.budget)
+    if args.results:
+        with open(args.results, 'w') as file:
+            json.dump(cases, file)
+    else:
+        for case in cases:
+            print(f"{case['distribution']:>13} {case['size']:>9}: {case['status']:>7} {case['seconds']:.4f} s")
+
+
+if __name__ == "__main__":
+    main()